@@ -0,0 +1,161 @@
+"""
+Amenity index for the amenity views.
+
+All amenities are loaded ONCE into a BallTree together with their canonical
+category (api/taxonomy.py). A report over several categories is then a
+single radius query whose hits are bucketed by category code — instead of
+one `amenity_type__icontains` table scan per type.
+
+Free-text types that are not a category name still work: they are matched
+(icontains) once per distinct amenity_type string, not once per row.
+"""
+
+import numpy as np
+
+from .spatial_index import LazyIndex, PointIndex, query_backend, table_stamp
+from .taxonomy import category_from_slug
+
+
+# ═══════════════════════════════════════════════════════════════════
+# AmenityIndex
+# PointIndex + category of every point + its amenity_type as a code into `types`
+# ═══════════════════════════════════════════════════════════════════
+class AmenityIndex(PointIndex):
+
+    def __init__(self, ids, lats, lngs, categories, type_codes, types):
+        super().__init__(ids, lats, lngs)
+        self.categories = np.asarray(categories, dtype=np.uint8)
+        self.type_codes = np.asarray(type_codes, dtype=np.intp)
+        self.types      = list(types)
+        self._folded    = [t.casefold() for t in self.types]
+
+    def type_matches(self, amenity_type):
+        """Boolean array over `types`: which type strings contain amenity_type (case-insensitive)."""
+        needle = amenity_type.casefold()
+        return np.array([needle in t for t in self._folded], dtype=bool)
+
+    def query_categories(self, lat, lng, radius_m, categories):
+        """
+        One radius query, bucketed by category.
+
+        Returns:
+            {category: (positions, distances_m)} — each sorted by distance
+        """
+        positions, distances = self.query_radius(lat, lng, radius_m)
+        hit_categories = self.categories[positions]
+        return {
+            category: (positions[hit_categories == category], distances[hit_categories == category])
+            for category in categories
+        }
+
+    def query_type(self, lat, lng, radius_m, amenity_type):
+        """
+        Points within radius_m whose amenity_type matches a free-text filter:
+        a category name is an exact category match, anything else icontains.
+        """
+        category = category_from_slug(amenity_type)
+        if category is not None:
+            return self.query_categories(lat, lng, radius_m, [category])[category]
+
+        positions, distances = self.query_radius(lat, lng, radius_m)
+        hit = self.type_matches(amenity_type)[self.type_codes[positions]]
+        return positions[hit], distances[hit]
+
+
+def _build_amenity_index():
+    from .models import Amenity
+
+    ids, lats, lngs, categories, codes = [], [], [], [], []
+    type_codes = {}
+    rows = Amenity.objects.values_list('id', 'latitude', 'longitude', 'category', 'amenity_type')
+    for amenity_id, lat, lng, category, amenity_type in rows.iterator():
+        ids.append(amenity_id)
+        lats.append(lat)
+        lngs.append(lng)
+        categories.append(category)
+        codes.append(type_codes.setdefault(amenity_type or '', len(type_codes)))
+    return AmenityIndex(ids, lats, lngs, categories, codes, list(type_codes))
+
+
+_amenity_index = LazyIndex('amenity', _build_amenity_index, stamp=table_stamp('Amenity'))
+
+
+def get_amenity_index():
+    return _amenity_index.get()
+
+
+def invalidate_amenity_index():
+    _amenity_index.invalidate()
+
+
+def _fetch(ids, distances):
+    """Amenity rows for ids (one query), in the given order, each with a `distance`."""
+    from .models import Amenity
+
+    ids = [int(i) for i in ids]
+    by_id = Amenity.objects.in_bulk(ids)
+
+    amenities = []
+    for amenity_id, distance in zip(ids, distances):
+        amenity = by_id.get(amenity_id)
+        if amenity is not None:  # deleted since the index was built
+            amenity.distance = float(distance)
+            amenities.append(amenity)
+    return amenities
+
+
+def report_from_hits(categories, ids, distances, hit_categories, top_n):
+    """
+    Bucket radius-query hits (sorted by distance) by category → amenity_report() result.
+    Full rows are fetched for the top_n hits of every category together.
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    distances = np.asarray(distances, dtype=np.float64)
+    hit_categories = np.asarray(hit_categories)
+
+    buckets = {category: np.flatnonzero(hit_categories == category) for category in categories}
+    top = np.concatenate([hits[:top_n] for hits in buckets.values()] + [np.empty(0, dtype=np.intp)])
+    fetched = {a.id: a for a in _fetch(ids[top], distances[top])}
+
+    report = {}
+    for category, hits in buckets.items():
+        report[category] = {
+            'count':              len(hits),
+            'nearest_distance_m': float(distances[hits[0]]) if len(hits) else None,
+            'amenities':          [fetched[i] for i in ids[hits[:top_n]].tolist() if i in fetched],
+        }
+    return report
+
+
+def amenities_within(lat, lng, radius_m, amenity_type=''):
+    """
+    Amenities within radius_m of (lat, lng), nearest first, optionally filtered
+    by type (a category name like 'bus_station', or any amenity_type substring).
+    """
+    backend = query_backend()
+    if backend is not None:
+        return backend.amenities_within(lat, lng, radius_m, amenity_type)
+
+    index = get_amenity_index()
+    if amenity_type:
+        positions, distances = index.query_type(lat, lng, radius_m, amenity_type)
+    else:
+        positions, distances = index.query_radius(lat, lng, radius_m)
+    return _fetch(index.ids[positions], distances)
+
+
+def amenity_report(lat, lng, radius_m, categories, top_n=20):
+    """
+    Counts, nearest distance and the top_n nearest amenities for each category.
+
+    Returns:
+        {category: {'count', 'nearest_distance_m', 'amenities'}} — full rows
+        are only fetched for the top_n hits of each category, in one query.
+    """
+    backend = query_backend()
+    if backend is not None:
+        return backend.amenity_report(lat, lng, radius_m, categories, top_n)
+
+    index = get_amenity_index()
+    positions, distances = index.query_radius(lat, lng, radius_m)
+    return report_from_hits(categories, index.ids[positions], distances, index.categories[positions], top_n)
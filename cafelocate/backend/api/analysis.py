@@ -0,0 +1,173 @@
+"""
+Suitability analysis for one or many candidate sites.
+
+Used by both /api/analyze/ (one site) and /api/analyze/batch/ (many sites),
+so a batch result is exactly what the single-site endpoint would return for
+each site. For a batch, the spatial lookups are done for all sites together
+(one BallTree query + one database query for the cafés, one vectorised ward
+lookup, one road R-tree query, one pass over the population surface) and
+the ML model runs ONCE on the full feature matrix.
+
+site_features() + score_sites() are the feature pipeline itself; the
+precomputed heatmap (api/heatmap.py) runs the same two functions for every
+grid cell, so its cells hold what /api/analyze/ returns there.
+"""
+
+import math
+
+import numpy as np
+
+from ml_engine.features import LOCATION_FEATURES, extract_location_features
+from ml_engine.predictor import FEATURE_NAMES, get_suitability_predictions, served_features
+
+from .population import catchment_population_many
+from .roads import road_length_within_many
+from .serializers import CafeSerializer
+from .spatial_index import nearby_cafes_many
+from .wards import locate_wards
+
+DEFAULT_POPULATION_DENSITY = 10000  # fallback when the point is outside every ward
+
+
+def suitability_score(competitors, road_m, pop_density):
+    """
+    Rule-based 0-100 score: few competitors (40), road length (30), ward
+    population density (30). Works on scalars and on NumPy arrays.
+    """
+    competitor_score = np.maximum(0, 1 - (np.asarray(competitors) / 20)) * 40
+    road_score       = np.minimum(1, np.asarray(road_m) / 3000) * 30
+    pop_score        = np.minimum(1, np.asarray(pop_density) / 15000) * 30
+    return np.round(competitor_score + road_score + pop_score)
+
+
+def site_features(lats, lngs, radii, competitor_ratings, with_location_features=True):
+    """
+    Model and score inputs of many sites.
+
+    Args:
+        radii:              radius (m) per site
+        competitor_ratings: per site, the ratings of the cafés within its
+                            radius, nearest first (None / NaN when unrated)
+        with_location_features: also compute the 17 training-schema features
+                            (ml_engine/features.py) — one more road query per site
+
+    Returns:
+        list of dicts, one per site: the FEATURE_NAMES values, plus
+        'road_length_by_type', 'roads_nearby', 'ward' and 'location_features'
+        (None when not computed)
+    """
+    # Ward of every site in one vectorised lookup, road length in one tree query
+    wards = locate_wards(lats, lngs)
+    roads = road_length_within_many(lats, lngs, radii)
+    location = extract_location_features(lats, lngs) if with_location_features else [None] * len(wards)
+
+    rows = []
+    for ratings, ward, (road_m, road_m_by_type, roads_nearby), location_features in zip(
+        competitor_ratings, wards, roads, location,
+    ):
+        # Summed in distance order, so every caller gets the same float
+        rated = [rating for rating in ratings if rating is not None and not math.isnan(rating)]
+        rows.append({
+            'competitor_count':      len(ratings),
+            'avg_competitor_rating': sum(rated) / len(rated) if rated else 0,
+            'road_length_m':         road_m,
+            'population_density':    ward['population_density'] if ward else DEFAULT_POPULATION_DENSITY,
+            'road_length_by_type':   road_m_by_type,
+            'roads_nearby':          roads_nearby,
+            'ward':                  ward,
+            'location_features':     location_features,
+        })
+    return rows
+
+
+def model_needs_location_features():
+    """True when the served model was trained on (some of) the 17 location features."""
+    return any(name in LOCATION_FEATURES for name in served_features())
+
+
+def score_sites(rows):
+    """
+    Rule-based score (0-100) and ML prediction of site_features() rows;
+    the model runs ONCE for all of them. Rows that carry location features
+    go to the model as {name: value} dicts (the predictor picks the columns
+    the served version lists in its manifest), the others as the legacy
+    four-value lists.
+
+    Returns:
+        (scores array, list of prediction dicts)
+    """
+    scores = suitability_score(
+        [row['competitor_count'] for row in rows],
+        [row['road_length_m'] for row in rows],
+        [row['population_density'] for row in rows],
+    )
+    predictions = get_suitability_predictions([_model_input(row) for row in rows])
+    return scores, predictions
+
+
+def _model_input(row):
+    if row['location_features'] is None:
+        return [row[name] for name in FEATURE_NAMES]
+    return {**{name: row[name] for name in FEATURE_NAMES}, **row['location_features']}
+
+
+def analyze_sites(sites):
+    """
+    Args:
+        sites: list of validated SuitabilityRequestSerializer data
+               ({'lat', 'lng', 'cafe_type', 'radius'})
+
+    Returns:
+        list of /api/analyze/ response dicts, in the same order
+    """
+    if not sites:
+        return []
+
+    lats  = np.array([site['lat'] for site in sites], dtype=np.float64)
+    lngs  = np.array([site['lng'] for site in sites], dtype=np.float64)
+    radii = np.array([site.get('radius', 500) for site in sites], dtype=np.float64)
+
+    # Step 1: Nearby cafes for every site at once
+    nearby_per_site = nearby_cafes_many(lats, lngs, radii)
+
+    # Steps 3-4: ward, road length and the 17 training-schema features of every site
+    rows = site_features(lats, lngs, radii, [[c.rating for c in nearby] for nearby in nearby_per_site])
+
+    # Steps 5-6: rule-based score and ML prediction — one model call for all sites
+    scores, predictions = score_sites(rows)
+
+    # People inside each radius itself (dasymetric surface when built)
+    catchments, _ = catchment_population_many(lats, lngs, radii)
+
+    results = []
+    for site, nearby, row, score, prediction, catchment in zip(
+        sites, nearby_per_site, rows, scores.tolist(), predictions, catchments,
+    ):
+        lat, lng = site['lat'], site['lng']
+
+        # Step 2: Top 5 cafes by score
+        top5 = sorted(
+            nearby,
+            key=lambda c: (c.rating or 0) * math.log(max(c.review_count, 1) + 1),
+            reverse=True
+        )[:5]
+
+        results.append({
+            'location':     {'lat': lat, 'lng': lng},
+            'nearby_count': row['competitor_count'],
+            'top5':         CafeSerializer(top5, many=True).data,
+            'suitability': {
+                'score':              int(score),
+                'level':              prediction.get('predicted_suitability', 'Unknown'),
+                'confidence':         prediction.get('confidence', 0),
+                'competitor_count':   row['competitor_count'],
+                'road_length_m':      round(row['road_length_m']),
+                'road_length_by_type': {k: round(v) for k, v in sorted(row['road_length_by_type'].items())},
+                'roads_nearby':       row['roads_nearby'],
+                'population_density': row['population_density'],
+                'catchment_population': round(catchment),
+            },
+            'location_features': row['location_features'],
+            'prediction': prediction,
+        })
+    return results
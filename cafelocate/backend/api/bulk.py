@@ -0,0 +1,88 @@
+"""
+Helpers for bulk data loads.
+
+bulk_create / bulk_update / QuerySet.update() write thousands of rows per
+statement but send no post_save / post_delete signals, so api/signals.py
+never sees them. A loader calls refresh_spatial_indexes() once at the end
+instead, which does for the whole table what the signal handlers do for
+one row: drop the in-memory index, refill the SQLite R*Tree table and (in
+SPATIAL_DB mode) rebuild the geometry mirror.
+"""
+
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+
+BATCH_SIZE = 2000   # rows per bulk_create / bulk_update statement group
+
+
+def batched(iterable, size=BATCH_SIZE):
+    """Lists of up to `size` items from any iterable."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def upsert(model, objects, unique_field, update_fields, batch_size=BATCH_SIZE):
+    """
+    bulk_create(update_conflicts=True) of model objects in batches, keyed
+    on unique_field; within a batch the last object wins for a repeated key.
+
+    Yields:
+        each batch as written, so the caller can count / report progress
+    """
+    for batch in batched(objects, batch_size):
+        batch = list({getattr(obj, unique_field): obj for obj in batch}.values())
+        model.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=[unique_field],
+            update_fields=update_fields,
+        )
+        yield batch
+
+
+def delete_missing(model, unique_field, keep):
+    """Delete the rows whose unique_field is not in `keep`; returns how many."""
+    missing = [pk for pk, key in model.objects.values_list('pk', unique_field).iterator() if key not in keep]
+    for batch in batched(missing, 500):
+        model.objects.filter(pk__in=batch).delete()
+    return len(missing)
+
+
+def refresh_spatial_indexes(*model_names):
+    """
+    Bring every spatial structure derived from the given api models
+    ('Cafe', 'Amenity', 'Road') up to date after a bulk load.
+
+    Returns:
+        {model name: R*Tree rows indexed} (empty when the R*Tree is not in use)
+    """
+    from . import rtree
+    from .amenities import invalidate_amenity_index
+    from .models import DataVersion
+    from .roads import invalidate_road_index
+    from .spatial_index import invalidate_cafe_index
+
+    invalidators = {
+        'Cafe':    invalidate_cafe_index,
+        'Amenity': invalidate_amenity_index,
+        'Road':    invalidate_road_index,
+    }
+    # Inside a transaction, only once it commits: a request served before
+    # that would rebuild the index from the old rows
+    for model_name in model_names:
+        transaction.on_commit(invalidators[model_name])
+        # ...and in the other processes, through their stamp check
+        DataVersion.bump(model_name)
+
+    counts = {}
+    if rtree.rtree_ready():
+        counts = rtree.rebuild(apps.get_model, only=model_names)
+
+    if settings.SPATIAL_DB:
+        from geodb.convert import copy_all
+        copy_all(apps.get_model, only=model_names)
+    return counts
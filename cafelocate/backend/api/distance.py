@@ -0,0 +1,131 @@
+"""
+Vectorised great-circle distances.
+
+Every function here works on whole NumPy arrays at once, so the views can
+compute distances from a point to thousands of coordinates in a single call
+instead of calling a scalar haversine function inside a Python loop.
+"""
+
+import math
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371 * 1000  # metres
+
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """
+    Calculate the great circle distance in meters between two points.
+    Scalar version — use haversine_distances() for arrays.
+    """
+    lon1, lat1, lon2, lat2 = map(math.radians, [lon1, lat1, lon2, lat2])
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
+    c = 2 * math.asin(math.sqrt(a))
+    return c * EARTH_RADIUS_M
+
+
+def haversine_distances(lat, lng, lats, lngs):
+    """
+    Distances in metres from query point(s) to an array of coordinates.
+
+    Args:
+        lat, lng:   a single point (scalars) or m points (1-D arrays)
+        lats, lngs: n target coordinates (1-D arrays)
+
+    Returns:
+        shape (n,) for a single query point, shape (m, n) for m query points
+    """
+    lat  = np.radians(np.asarray(lat, dtype=np.float64))
+    lng  = np.radians(np.asarray(lng, dtype=np.float64))
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lngs = np.radians(np.asarray(lngs, dtype=np.float64))
+
+    if lat.ndim:
+        # m query points → broadcast to an (m, n) matrix
+        lat = lat[:, np.newaxis]
+        lng = lng[:, np.newaxis]
+
+    dlat = lats - lat
+    dlng = lngs - lng
+    a = np.sin(dlat / 2)**2 + np.cos(lat) * np.cos(lats) * np.sin(dlng / 2)**2
+    return 2 * np.arcsin(np.sqrt(np.minimum(a, 1.0))) * EARTH_RADIUS_M
+
+
+def path_length(lats, lngs):
+    """Length in metres of the polyline through the given coordinates (great-circle legs)."""
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lngs = np.radians(np.asarray(lngs, dtype=np.float64))
+    if len(lats) < 2:
+        return 0.0
+
+    dlat = np.diff(lats)
+    dlng = np.diff(lngs)
+    a = np.sin(dlat / 2)**2 + np.cos(lats[:-1]) * np.cos(lats[1:]) * np.sin(dlng / 2)**2
+    return float(np.sum(2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))) * EARTH_RADIUS_M)
+
+
+def radius_mask(lat, lng, lats, lngs, radius_m):
+    """
+    Returns (mask, distances): mask[i] is True when point i is within radius_m.
+    Works for one or many query points, like haversine_distances().
+    """
+    distances = haversine_distances(lat, lng, lats, lngs)
+    return distances <= radius_m, distances
+
+
+def within_radius(lat, lng, lats, lngs, radius_m):
+    """
+    Indices of the coordinates within radius_m of a single point, nearest first.
+
+    Returns:
+        (indices, distances_m) — both sorted by distance
+    """
+    mask, distances = radius_mask(lat, lng, lats, lngs, radius_m)
+    indices = np.flatnonzero(mask)
+    order = np.argsort(distances[indices], kind='stable')
+    indices = indices[order]
+    return indices, distances[indices]
+
+
+def metres_per_degree(lat):
+    """
+    (metres per degree of latitude, metres per degree of longitude) at `lat`.
+    `lat` may be an array (one longitude scale per latitude).
+    """
+    m_per_deg_lat = EARTH_RADIUS_M * math.pi / 180
+    if np.ndim(lat):
+        return m_per_deg_lat, m_per_deg_lat * np.cos(np.radians(lat))
+    return m_per_deg_lat, m_per_deg_lat * math.cos(math.radians(lat))
+
+
+def degree_box(lat, lng, radius_m):
+    """
+    Bounding box (min_lng, min_lat, max_lng, max_lat) of a circle, in
+    degrees. Works for one circle or for arrays of them.
+    """
+    m_lat, m_lng = metres_per_degree(lat)
+    dlat = radius_m / m_lat
+    dlng = radius_m / np.maximum(m_lng, 1e-9)
+    return lng - dlng, lat - dlat, lng + dlng, lat + dlat
+
+
+def local_xy(lat0, lng0, lats, lngs):
+    """
+    Project coordinates to metres on a plane tangent at (lat0, lng0)
+    (equirectangular). Accurate to well under 0.1% across a city-sized area,
+    which is plenty for buffer clipping and area fractions.
+    """
+    m_lat, m_lng = metres_per_degree(lat0)
+    x = (np.asarray(lngs, dtype=np.float64) - lng0) * m_lng
+    y = (np.asarray(lats, dtype=np.float64) - lat0) * m_lat
+    return x, y
+
+
+def local_latlng(lat0, lng0, x, y):
+    """Inverse of local_xy(): metres on the tangent plane → (lats, lngs)."""
+    m_lat, m_lng = metres_per_degree(lat0)
+    lats = lat0 + np.asarray(y, dtype=np.float64) / m_lat
+    lngs = lng0 + np.asarray(x, dtype=np.float64) / m_lng
+    return lats, lngs
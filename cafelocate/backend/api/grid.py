@@ -0,0 +1,85 @@
+"""
+Regular metric grid over the Kathmandu analysis area.
+
+Shared by the precomputed rasters (ward lookup, population surface, ...).
+Cells are square in metres on the same local plane the ward locator uses,
+so a (lat, lng) → (row, col) lookup is two multiplications.
+"""
+
+import math
+
+import numpy as np
+
+from .distance import local_latlng, local_xy
+from .serializers import KATHMANDU_LAT_RANGE, KATHMANDU_LNG_RANGE
+
+# Origin of the metric plane (city centre) — shared by every metric structure
+CITY_ORIGIN = (27.7172, 85.3240)
+
+
+class MetricGrid:
+
+    def __init__(self, x_min, y_min, resolution_m, n_cols, n_rows):
+        self.x_min        = float(x_min)
+        self.y_min        = float(y_min)
+        self.resolution_m = float(resolution_m)
+        self.n_cols       = int(n_cols)
+        self.n_rows       = int(n_rows)
+
+    @classmethod
+    def for_bounds(cls, resolution_m, lat_range=KATHMANDU_LAT_RANGE, lng_range=KATHMANDU_LNG_RANGE):
+        """Grid covering lat_range × lng_range (defaults: the serializer bounds)."""
+        x, y = project(np.array(lat_range), np.array(lng_range))
+        n_cols = math.ceil((x[1] - x[0]) / resolution_m)
+        n_rows = math.ceil((y[1] - y[0]) / resolution_m)
+        return cls(x[0], y[0], resolution_m, n_cols, n_rows)
+
+    @property
+    def shape(self):
+        return (self.n_rows, self.n_cols)
+
+    def to_meta(self):
+        return {
+            'origin':       list(CITY_ORIGIN),
+            'x_min':        self.x_min,
+            'y_min':        self.y_min,
+            'resolution_m': self.resolution_m,
+            'n_cols':       self.n_cols,
+            'n_rows':       self.n_rows,
+        }
+
+    @classmethod
+    def from_meta(cls, meta):
+        if tuple(meta.get('origin', CITY_ORIGIN)) != CITY_ORIGIN:
+            raise ValueError('Grid was built on a different projection origin')
+        return cls(meta['x_min'], meta['y_min'], meta['resolution_m'], meta['n_cols'], meta['n_rows'])
+
+    def cells_xy(self, x, y):
+        """
+        (rows, cols, inside) for metric coordinates; rows/cols are only
+        meaningful where `inside` is True.
+        """
+        cols = np.floor((np.asarray(x) - self.x_min) / self.resolution_m).astype(np.intp)
+        rows = np.floor((np.asarray(y) - self.y_min) / self.resolution_m).astype(np.intp)
+        inside = (rows >= 0) & (rows < self.n_rows) & (cols >= 0) & (cols < self.n_cols)
+        return rows, cols, inside
+
+    def cells(self, lats, lngs):
+        return self.cells_xy(*project(lats, lngs))
+
+    def row_centers(self, row_start, row_stop):
+        """Metric (x, y) of the centres of every cell in rows [row_start, row_stop)."""
+        xs = self.x_min + (np.arange(self.n_cols) + 0.5) * self.resolution_m
+        ys = self.y_min + (np.arange(row_start, row_stop) + 0.5) * self.resolution_m
+        x, y = np.meshgrid(xs, ys)
+        return x, y
+
+
+def project(lats, lngs):
+    """(lat, lng) → metric (x, y) on the city plane."""
+    return local_xy(CITY_ORIGIN[0], CITY_ORIGIN[1], lats, lngs)
+
+
+def unproject(x, y):
+    """Metric (x, y) on the city plane → (lat, lng)."""
+    return local_latlng(CITY_ORIGIN[0], CITY_ORIGIN[1], x, y)
@@ -0,0 +1,299 @@
+"""
+Precomputed city-wide suitability grid (heatmap).
+
+The /api/analyze/ pipeline — competitors within the radius, their average
+rating, road length, ward population density, rule-based score and ML
+prediction (api/analysis.py site_features() + score_sites()) — is evaluated
+offline at the centre of every cell of a regular metric grid over the
+analysis area:
+
+    python manage.py build_suitability_grid --resolution 100 --workers 8
+
+Results are stored as one uint8 array of shape (3, n_rows, n_cols)
+
+    [0] score       0-100 rule-based suitability score
+    [1] level       index into LEVELS (Low / Medium / High Suitability)
+    [2] confidence  ML confidence in percent
+
+(NODATA = 255) in SPATIAL_CACHE_DIR/suitability_grid.npy + .json metadata,
+and memory-mapped by GET /api/heatmap/, so the map can show the whole city
+without one /api/analyze/ call per pixel.
+
+Rows are split into bands that worker processes evaluate in parallel. The
+indexes and the model are loaded BEFORE the workers are forked, so every
+worker shares them (copy-on-write) instead of loading its own.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .analysis import model_needs_location_features, score_sites, site_features
+from .grid import MetricGrid, unproject
+from .spatial_index import LazyIndex
+
+logger = logging.getLogger(__name__)
+
+LAYERS = ('score', 'level', 'confidence')
+LEVELS = ('Low Suitability', 'Medium Suitability', 'High Suitability')
+NODATA = 255
+
+BAND_ROWS = 8   # grid rows per worker task
+
+
+def grid_path():
+    return settings.SPATIAL_CACHE_DIR / 'suitability_grid.npy'
+
+
+# ═══════════════════════════════════════════════════════════════════
+# SuitabilityGrid
+# ═══════════════════════════════════════════════════════════════════
+class SuitabilityGrid:
+
+    def __init__(self, grid, values, meta):
+        self.grid   = grid
+        self.values = values   # (len(LAYERS), n_rows, n_cols) uint8
+        self.meta   = meta
+        self.mtime  = None     # of the metadata file this was loaded from
+
+    def __len__(self):
+        return self.grid.n_rows * self.grid.n_cols
+
+    def layer(self, name):
+        return self.values[LAYERS.index(name)]
+
+    def window(self, south, west, north, east):
+        """(row0, row1, col0, col1) of the cells covering a lat/lng box, clipped to the grid."""
+        rows, cols, _ = self.grid.cells(np.array([south, north]), np.array([west, east]))
+        row0, row1 = np.clip([rows[0], rows[1] + 1], 0, self.grid.n_rows)
+        col0, col1 = np.clip([cols[0], cols[1] + 1], 0, self.grid.n_cols)
+        return int(row0), int(row1), int(col0), int(col1)
+
+    def cells(self, layer, south, west, north, east, max_cells):
+        """
+        [lat, lng, value] of every cell in a lat/lng box. Large boxes are
+        averaged over stride × stride blocks so at most ~max_cells are returned.
+
+        Returns:
+            (cells, stride)
+        """
+        row0, row1, col0, col1 = self.window(south, west, north, east)
+        n_cells = (row1 - row0) * (col1 - col0)
+        if n_cells <= 0:
+            return [], 1
+
+        stride = max(1, int(np.ceil(np.sqrt(n_cells / max_cells))))
+        values = np.asarray(self.layer(layer)[row0:row1, col0:col1], dtype=np.float64)
+        values[values == NODATA] = np.nan
+
+        # Pad to whole blocks, then average each block (ignoring NODATA)
+        n_rows = -(-values.shape[0] // stride) * stride
+        n_cols = -(-values.shape[1] // stride) * stride
+        padded = np.full((n_rows, n_cols), np.nan)
+        padded[:values.shape[0], :values.shape[1]] = values
+        blocks = padded.reshape(n_rows // stride, stride, n_cols // stride, stride)
+        counts = np.sum(~np.isnan(blocks), axis=(1, 3))
+        means  = np.divide(np.nansum(blocks, axis=(1, 3)), counts, out=np.full(counts.shape, np.nan), where=counts > 0)
+
+        # Block centres (blocks at the edge may be partial: use the centre of their real cells)
+        res = self.grid.resolution_m
+        block_rows = np.arange(means.shape[0])
+        block_cols = np.arange(means.shape[1])
+        row_mid = row0 + (block_rows * stride + np.minimum(stride, (row1 - row0) - block_rows * stride) / 2)
+        col_mid = col0 + (block_cols * stride + np.minimum(stride, (col1 - col0) - block_cols * stride) / 2)
+        x, y = np.meshgrid(self.grid.x_min + col_mid * res, self.grid.y_min + row_mid * res)
+        lats, lngs = unproject(x, y)
+
+        valid = ~np.isnan(means)
+        cells = np.column_stack([
+            np.round(lats[valid], 6), np.round(lngs[valid], 6), np.round(means[valid], 1),
+        ])
+        return cells.tolist(), stride
+
+    def save(self, path=None):
+        path = path or grid_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written next to the target and renamed: a server that has the old
+        # file memory-mapped keeps reading the old file until it reloads
+        for target, write in (
+            (path, lambda f: np.save(f, np.ascontiguousarray(self.values, dtype=np.uint8))),
+            (path.with_suffix('.json'), lambda f: f.write(json.dumps({**self.grid.to_meta(), **self.meta}, indent=2).encode())),
+        ):
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{target.name}.')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    write(f)
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, target)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+    @classmethod
+    def load(cls, path=None):
+        """Memory-map a saved grid; None when it has not been built."""
+        path = path or grid_path()
+        meta_path = path.with_suffix('.json')
+        if not (path.exists() and meta_path.exists()):
+            return None
+
+        mtime  = meta_path.stat().st_mtime_ns
+        meta   = json.loads(meta_path.read_text())
+        grid   = MetricGrid.from_meta(meta)
+        values = np.load(path, mmap_mode='r')
+        if values.shape != (len(LAYERS), *grid.shape):
+            raise ValueError(f'{path} has shape {values.shape}, metadata says {(len(LAYERS), *grid.shape)}')
+
+        suitability_grid = cls(grid, values, meta)
+        suitability_grid.mtime = mtime
+        return suitability_grid
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Building (offline)
+# ═══════════════════════════════════════════════════════════════════
+# Indexes shared with the forked workers (set by build_suitability_grid)
+_job = {}
+
+
+def evaluate_points(lats, lngs, radius_m):
+    """
+    analyze_sites()'s features, score and prediction for many points at one
+    radius. The competitors come from the café index + ratings in _job
+    (no database query per band); everything else from site_features().
+
+    Returns:
+        uint8 array (len(LAYERS), n_points)
+    """
+    cafe_index, ratings = _job['cafe_index'], _job['cafe_ratings']
+
+    competitor_ratings = [ratings[positions].tolist() for positions, _ in cafe_index.query_radius_many(lats, lngs, radius_m)]
+    rows = site_features(lats, lngs, np.full(len(lats), radius_m, dtype=np.float64), competitor_ratings,
+                         with_location_features=_job['location_features'])
+    scores, predictions = score_sites(rows)
+
+    out = np.full((len(LAYERS), len(lats)), NODATA, dtype=np.uint8)
+    out[0] = scores
+    for i, prediction in enumerate(predictions):
+        level = prediction.get('predicted_suitability')
+        if level in LEVELS:
+            out[1, i] = LEVELS.index(level)
+            out[2, i] = round(prediction.get('confidence', 0) * 100)
+    return out
+
+
+def _evaluate_band(band):
+    row_start, row_stop = band
+    grid = _job['grid']
+    x, y = grid.row_centers(row_start, row_stop)
+    lats, lngs = unproject(x.ravel(), y.ravel())
+    values = evaluate_points(lats, lngs, _job['radius_m'])
+    return row_start, values.reshape(len(LAYERS), row_stop - row_start, grid.n_cols)
+
+
+def build_suitability_grid(resolution_m, radius_m=500, workers=None, progress=None):
+    """
+    Evaluate the analysis at every cell centre of a resolution_m grid.
+
+    Args:
+        workers:  processes to use (default: all CPU cores; 1 = no pool)
+        progress: optional callback(done_rows, total_rows)
+    """
+    from django.db import connections
+
+    from ml_engine.predictor import load_model, model_status
+    from .amenities import get_amenity_index
+    from .models import Cafe
+    from .roads import get_road_index
+    from .spatial_index import get_cafe_index, query_backend
+    from .wards import get_ward_locator
+
+    grid = MetricGrid.for_bounds(resolution_m)
+
+    # Everything the workers need is loaded here, once, before forking
+    cafe_index = get_cafe_index()
+    by_id = dict(Cafe.objects.filter(id__in=cafe_index.ids.tolist()).values_list('id', 'rating'))
+    _job.update(
+        grid=grid,
+        radius_m=radius_m,
+        cafe_index=cafe_index,
+        cafe_ratings=np.array([np.nan if by_id.get(i) is None else by_id[i] for i in cafe_index.ids.tolist()]),
+    )
+    load_model()
+    # The 17 location features cost a road query per cell: only when the model takes them
+    _job['location_features'] = model_needs_location_features()
+    if query_backend() is None:
+        # site_features() queries the in-memory indexes: build them in the parent
+        get_road_index()
+        get_ward_locator()
+        if _job['location_features']:
+            get_amenity_index()
+    connections.close_all()   # forked workers must not share the parent's DB connection
+
+    values = np.full((len(LAYERS), *grid.shape), NODATA, dtype=np.uint8)
+    bands = [(start, min(start + BAND_ROWS, grid.n_rows)) for start in range(0, grid.n_rows, BAND_ROWS)]
+    workers = workers or os.cpu_count() or 1
+
+    started, done = time.time(), 0
+    try:
+        if workers > 1:
+            pool = multiprocessing.get_context('fork').Pool(workers)
+            results = pool.imap_unordered(_evaluate_band, bands)
+        else:
+            pool, results = None, map(_evaluate_band, bands)
+        for row_start, band_values in results:
+            values[:, row_start:row_start + band_values.shape[1]] = band_values
+            done += band_values.shape[1]
+            if progress:
+                progress(done, grid.n_rows)
+        if pool is not None:
+            pool.close()
+            pool.join()
+    finally:
+        _job.clear()
+
+    status = model_status()
+    meta = {
+        'layers':        list(LAYERS),
+        'levels':        list(LEVELS),
+        'nodata':        NODATA,
+        'radius_m':      radius_m,
+        'model_version': status.get('version'),
+        'built_at':      time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'build_seconds': round(time.time() - started, 1),
+    }
+    return SuitabilityGrid(grid, values, meta)
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Serving
+# ═══════════════════════════════════════════════════════════════════
+def _load_suitability_grid():
+    try:
+        return SuitabilityGrid.load()
+    except (OSError, ValueError) as e:
+        logger.warning(f'Could not load suitability grid: {e}')
+        return None
+
+
+_suitability_grid = LazyIndex('suitability grid', _load_suitability_grid)
+
+
+def get_suitability_grid():
+    """The loaded SuitabilityGrid (reloaded after a rebuild), or None when it has not been built."""
+    suitability_grid = _suitability_grid.get()
+    if suitability_grid is not None:
+        try:
+            mtime = grid_path().with_suffix('.json').stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != suitability_grid.mtime:
+            _suitability_grid.invalidate()
+            suitability_grid = _suitability_grid.get()
+    return suitability_grid
@@ -0,0 +1,70 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from api.models import Amenity
+from api.population import AMENITY_WEIGHT, ROAD_WEIGHT, build_population_surface, surface_path
+from api.roads import get_road_index
+from api.wards import get_ward_locator
+
+
+class Command(BaseCommand):
+    help = 'Precompute the dasymetric population surface (summed-area table) used for catchment population'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolution',
+            type=float,
+            default=50.0,
+            help='Cell size in metres (default: 50)'
+        )
+        parser.add_argument(
+            '--road-weight',
+            type=float,
+            default=ROAD_WEIGHT,
+            help=f'Extra weight per cell-side of road in a cell (default: {ROAD_WEIGHT})'
+        )
+        parser.add_argument(
+            '--amenity-weight',
+            type=float,
+            default=AMENITY_WEIGHT,
+            help=f'Extra weight per amenity in the 3×3 neighbourhood (default: {AMENITY_WEIGHT})'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Where to write the .npy file (default: SPATIAL_CACHE_DIR/population_sat.npy)'
+        )
+
+    def handle(self, *args, **options):
+        locator = get_ward_locator()
+        if not len(locator):
+            self.stdout.write(self.style.ERROR('No ward boundaries in the database — run ml/load_wards.py first'))
+            return
+
+        started = time.time()
+        amenities = list(Amenity.objects.values_list('latitude', 'longitude'))
+        surface = build_population_surface(
+            locator,
+            get_road_index(),
+            [lat for lat, _ in amenities],
+            [lng for _, lng in amenities],
+            options['resolution'],
+            road_weight=options['road_weight'],
+            amenity_weight=options['amenity_weight'],
+        )
+
+        output = Path(options['output']) if options['output'] else surface_path()
+        surface.save(
+            output,
+            road_weight=options['road_weight'],
+            amenity_weight=options['amenity_weight'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Population surface {surface.grid.n_rows}×{surface.grid.n_cols} '
+            f'({options["resolution"]:g} m cells, {surface.total:,.0f} people) written to {output} '
+            f'in {time.time() - started:.1f}s'
+        ))
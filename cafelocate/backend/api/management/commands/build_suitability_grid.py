@@ -0,0 +1,63 @@
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from api.heatmap import build_suitability_grid, grid_path
+
+
+class Command(BaseCommand):
+    help = 'Precompute the city-wide suitability grid served by /api/heatmap/'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolution',
+            type=float,
+            default=100.0,
+            help='Cell size in metres (default: 100)'
+        )
+        parser.add_argument(
+            '--radius',
+            type=int,
+            default=500,
+            help='Analysis radius in metres, as in /api/analyze/ (default: 500)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help=f'Worker processes (default: all {os.cpu_count()} CPU cores)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Where to write the .npy file (default: SPATIAL_CACHE_DIR/suitability_grid.npy)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.time()
+        last_report = [0.0]
+
+        def progress(done, total):
+            if time.time() - last_report[0] > 5 or done == total:
+                last_report[0] = time.time()
+                self.stdout.write(f'  {done}/{total} rows ({time.time() - started:.0f}s)')
+
+        suitability_grid = build_suitability_grid(
+            options['resolution'],
+            radius_m=options['radius'],
+            workers=options['workers'],
+            progress=progress,
+        )
+
+        output = Path(options['output']) if options['output'] else grid_path()
+        suitability_grid.save(output)
+
+        grid = suitability_grid.grid
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Suitability grid {grid.n_rows}×{grid.n_cols} '
+            f'({options["resolution"]:g} m cells, {options["radius"]} m radius) written to {output} '
+            f'in {time.time() - started:.1f}s'
+        ))
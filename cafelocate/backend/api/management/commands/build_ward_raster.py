@@ -0,0 +1,44 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from api.ward_raster import EXACT, build_ward_raster, raster_path
+from api.wards import get_ward_locator
+
+
+class Command(BaseCommand):
+    help = 'Precompute the uint8 point → ward lookup raster used by the ward locator'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolution',
+            type=float,
+            default=10.0,
+            help='Cell size in metres (default: 10)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            default=None,
+            help='Where to write the .npy file (default: SPATIAL_CACHE_DIR/ward_raster.npy)'
+        )
+
+    def handle(self, *args, **options):
+        locator = get_ward_locator()
+        if not len(locator):
+            self.stdout.write(self.style.ERROR('No ward boundaries in the database — run ml/load_wards.py first'))
+            return
+
+        started = time.time()
+        raster = build_ward_raster(locator, options['resolution'])
+
+        output = Path(options['output']) if options['output'] else raster_path()
+        raster.save(output)
+
+        exact = (raster.codes == EXACT).mean() * 100
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Ward raster {raster.grid.n_rows}×{raster.grid.n_cols} '
+            f'({options["resolution"]:g} m cells, {exact:.1f}% boundary) written to {output} '
+            f'in {time.time() - started:.1f}s'
+        ))
@@ -2,11 +2,44 @@ import csv
 import os
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from api.bulk import BATCH_SIZE, batched, delete_missing, refresh_spatial_indexes
 from api.models import Amenity
+from api.taxonomy import categorize
+
+# Fields compared / written by the bulk path
+AMENITY_FIELDS = ('amenity_type', 'category', 'name', 'latitude', 'longitude')
+
+
+def parse_row(row):
+    """
+    (osm_id, field dict) of one CSV row.
+
+    Raises:
+        ValueError / KeyError for rows that cannot be loaded
+    """
+    # combined_amenities_clean.csv writes ids as "relation/2025798"
+    osm_id = int(str(row['osm_id']).rsplit('/', 1)[-1])
+    # ... and the type as `amenity` (or `type`) instead of `amenity_type`
+    amenity_type = (row.get('amenity_type') or row.get('amenity') or row.get('type') or '').strip()
+    if not amenity_type:
+        raise ValueError('missing amenity type')
+    name = (row.get('name') or '').strip() or None
+    latitude = float(row['latitude'])
+    longitude = float(row['longitude'])
+    return osm_id, {
+        'amenity_type': amenity_type,
+        'name': name,
+        'latitude': latitude,
+        'longitude': longitude,
+        'location': {
+            'type': 'Point',
+            'coordinates': [longitude, latitude]
+        }
+    }
 
 
 class Command(BaseCommand):
-    help = 'Load amenities from osm_amenities_kathmandu.csv'
+    help = 'Load amenities from osm_amenities_kathmandu.csv (or combined_amenities_clean.csv)'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -15,6 +48,22 @@ class Command(BaseCommand):
             default='cafelocate/data/osm_amenities_kathmandu.csv',
             help='Path to the CSV file'
         )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Diff against the table once and write in batches (bulk_create / bulk_update)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Rows per batch in --bulk mode'
+        )
+        parser.add_argument(
+            '--delete-missing',
+            action='store_true',
+            help='Delete amenities whose osm_id is not in the CSV'
+        )
 
     @transaction.atomic
     def handle(self, *args, **options):
@@ -25,45 +74,96 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'File not found: {csv_path}'))
             return
 
-        loaded_count = 0
-        skipped_count = 0
-        updated_count = 0
-
         with open(csv_path, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
+            if options['bulk']:
+                counts, seen = self.load_bulk(reader, options['batch_size'])
+            else:
+                counts, seen = self.load_rows(reader)
 
-            for row in reader:
-                try:
-                    osm_id = int(row['osm_id'])
-                    amenity_type = row['amenity_type'].strip()
-                    name = row.get('name', '').strip() or None
-                    latitude = float(row['latitude'])
-                    longitude = float(row['longitude'])
-
-                    # Check if already exists
-                    amenity, created = Amenity.objects.update_or_create(
-                        osm_id=osm_id,
-                        defaults={
-                            'amenity_type': amenity_type,
-                            'name': name,
-                            'latitude': latitude,
-                            'longitude': longitude,
-                            'location': {
-                                'type': 'Point',
-                                'coordinates': [longitude, latitude]
-                            }
-                        }
-                    )
-
-                    if created:
-                        loaded_count += 1
-                    else:
-                        updated_count += 1
-
-                except (ValueError, KeyError) as e:
-                    skipped_count += 1
-                    continue
+        deleted_count = 0
+        if options['delete_missing']:
+            deleted_count = delete_missing(Amenity, 'osm_id', seen)
+
+        if options['bulk']:
+            refresh_spatial_indexes('Amenity')   # bulk writes send no signals
 
         self.stdout.write(self.style.SUCCESS(
-            f'✅ Amenities loaded: {loaded_count}, Updated: {updated_count}, Skipped: {skipped_count}'
+            f"✅ Amenities loaded: {counts['created']}, Updated: {counts['updated']}, "
+            f"Unchanged: {counts['unchanged']}, Skipped: {counts['skipped']}, Deleted: {deleted_count}"
         ))
+
+    def load_rows(self, reader):
+        """One update_or_create per row (sends the model signals for every row)."""
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+        seen = set()
+
+        for row in reader:
+            try:
+                osm_id, fields = parse_row(row)
+            except (ValueError, KeyError):
+                counts['skipped'] += 1
+                continue
+
+            # Check if already exists (Amenity.save() sets the canonical category)
+            amenity, created = Amenity.objects.update_or_create(osm_id=osm_id, defaults=fields)
+            seen.add(osm_id)
+
+            if created:
+                counts['created'] += 1
+            else:
+                counts['updated'] += 1
+
+        return counts, seen
+
+    def load_bulk(self, reader, batch_size):
+        """
+        Existing rows are read ONCE; each batch of CSV rows is then split into
+        new (bulk_create), changed (bulk_update) and unchanged rows (skipped).
+        """
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+
+        # osm_id → (pk, values in AMENITY_FIELDS order); pk None = created by this run
+        current = {
+            osm_id: (pk, tuple(values))
+            for osm_id, pk, *values in Amenity.objects.values_list('osm_id', 'pk', *AMENITY_FIELDS).iterator()
+        }
+        seen = set()
+
+        for batch in batched(reader, batch_size):
+            parsed = {}
+            for row in batch:
+                try:
+                    osm_id, fields = parse_row(row)
+                except (ValueError, KeyError):
+                    counts['skipped'] += 1
+                    continue
+                # bulk writes skip Amenity.save(), so the category is set here
+                fields['category'] = categorize(fields['amenity_type'])
+                parsed[osm_id] = fields   # the last row wins for a repeated osm_id
+
+            to_create, to_update = [], []
+            for osm_id, fields in parsed.items():
+                values = tuple(fields[name] for name in AMENITY_FIELDS)
+                pk, old_values = current.get(osm_id, (None, None))
+                if old_values == values:
+                    counts['unchanged'] += 1
+                elif pk is None:
+                    to_create.append(Amenity(osm_id=osm_id, **fields))
+                    counts['updated' if old_values else 'created'] += 1
+                else:
+                    to_update.append(Amenity(pk=pk, osm_id=osm_id, **fields))
+                    counts['updated'] += 1
+                current[osm_id] = (pk, values)
+            seen.update(parsed)
+
+            # update_conflicts also covers osm_ids created by an earlier batch of this run
+            Amenity.objects.bulk_create(
+                to_create,
+                update_conflicts=True,
+                unique_fields=['osm_id'],
+                update_fields=[*AMENITY_FIELDS, 'location'],
+            )
+            Amenity.objects.bulk_update(to_update, [*AMENITY_FIELDS, 'location'])
+
+        return counts, seen
@@ -0,0 +1,21 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api import rtree
+
+
+class Command(BaseCommand):
+    help = 'Refill the SQLite R*Tree tables (cafes, amenities, roads) after bulk loads'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stdout.write(self.style.ERROR('R*Tree tables only exist on SQLite (use SPATIAL_DB on PostgreSQL)'))
+            return
+
+        rtree.create_tables()
+        for model_name, count in rtree.rebuild(apps.get_model).items():
+            self.stdout.write(f'  {model_name:<8} {count:>7} boxes')
+
+        self.stdout.write(self.style.SUCCESS('✅ R*Tree tables rebuilt'))
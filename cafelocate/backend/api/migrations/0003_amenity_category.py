@@ -0,0 +1,59 @@
+# Generated by Django 4.2.13 on 2026-10-17 04:19
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of the api/taxonomy.py mapping this migration was written
+# with: later taxonomy changes must not change what an applied migration does.
+RAW_TYPE_CATEGORIES = {
+    'school': 1, 'prep_school': 1, 'kindergarten': 1, 'edu': 1, 'education': 1,
+    'educational_institution': 1,
+    'college': 2, 'university': 2,
+    'hospital': 3,
+    'health_post': 4, 'clinic': 4, 'doctors': 4,
+    'pharmacy': 5, 'chemist': 5,
+    'bus_station': 6, 'bus_stop': 6,
+    'cafe': 7, 'coffee_shop': 7,
+    'restaurant': 8, 'fast_food': 8, 'food_court': 8,
+    'bank': 9, 'atm': 9,
+    'place_of_worship': 10, 'temple': 10, 'monastery': 10,
+}
+OTHER = 0
+
+_SEPARATORS = re.compile(r'[\s\-]+')
+
+
+def categorize(raw_type):
+    for part in _SEPARATORS.sub('_', (raw_type or '').strip().lower()).split(';'):
+        category = RAW_TYPE_CATEGORIES.get(part.strip('_'))
+        if category is not None:
+            return category
+    return OTHER
+
+
+def set_categories(apps, schema_editor):
+    Amenity = apps.get_model('api', 'Amenity')
+    types = Amenity.objects.values_list('amenity_type', flat=True).distinct()
+    for amenity_type in list(types):
+        Amenity.objects.filter(amenity_type=amenity_type).update(category=categorize(amenity_type))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_amenity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='amenity',
+            name='category',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'School'), (2, 'College / University'), (3, 'Hospital'), (4, 'Health post / Clinic'), (5, 'Pharmacy'), (6, 'Bus station / stop'), (7, 'Café'), (8, 'Restaurant / Fast food'), (9, 'Bank / ATM'), (10, 'Place of worship')], default=0),
+        ),
+        migrations.AddIndex(
+            model_name='amenity',
+            index=models.Index(fields=['category', 'latitude', 'longitude'], name='amenities_categor_0d5b82_idx'),
+        ),
+        migrations.RunPython(set_categories, migrations.RunPython.noop),
+    ]
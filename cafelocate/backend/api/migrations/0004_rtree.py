@@ -0,0 +1,85 @@
+from django.db import migrations
+
+# Frozen copy of the api/rtree.py code this migration was written with:
+# the live module follows the current models and must not change what an
+# applied migration does.
+RTREE_TABLES = {
+    'Cafe':    'rtree_cafes',
+    'Amenity': 'rtree_amenities',
+    'Road':    'rtree_roads',
+}
+
+
+def cafe_box(location, latitude, longitude):
+    if location and isinstance(location, dict):
+        coords = location.get('coordinates', [None, None])
+        if len(coords) >= 2 and coords[0] is not None and coords[1] is not None:
+            return coords[0], coords[0], coords[1], coords[1]
+    if latitude and longitude:
+        return longitude, longitude, latitude, latitude
+    return None
+
+
+def amenity_box(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return longitude, longitude, latitude, latitude
+
+
+def road_box(geometry):
+    lines = []
+    if geometry and isinstance(geometry, dict):
+        coordinates = geometry.get('coordinates', [])
+        if geometry.get('type') == 'LineString':
+            lines = [coordinates] if coordinates else []
+        elif geometry.get('type') == 'MultiLineString':
+            lines = [line for line in coordinates if line]
+    coords = [c for line in lines for c in line if len(c) >= 2]
+    if not coords:
+        return None
+    lngs = [c[0] for c in coords]
+    lats = [c[1] for c in coords]
+    return min(lngs), max(lngs), min(lats), max(lats)
+
+
+BOX_SOURCES = {
+    'Cafe':    (('location', 'latitude', 'longitude'), cafe_box),
+    'Amenity': (('latitude', 'longitude'),             amenity_box),
+    'Road':    (('geometry',),                          road_box),
+}
+
+
+def create_rtree_tables(apps, schema_editor):
+    # R*Tree virtual tables are SQLite-only; other backends use geodb (SPATIAL_DB)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for model_name, table in RTREE_TABLES.items():
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} '
+                f'USING rtree(id, min_lng, max_lng, min_lat, max_lat)'
+            )
+            fields, box = BOX_SOURCES[model_name]
+            rows = apps.get_model('api', model_name).objects.values_list('pk', *fields).iterator()
+            entries = [(pk, *b) for pk, *values in rows if (b := box(*values)) is not None]
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.executemany(f'INSERT INTO {table} VALUES (%s, %s, %s, %s, %s)', entries)
+
+
+def drop_rtree_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in RTREE_TABLES.values():
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_amenity_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_rtree_tables, drop_rtree_tables),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 4.2.13 on 2026-10-17 04:48
+
+import json
+
+import numpy as np
+from django.db import migrations, models
+
+EXTENT_FIELDS = ['geometry', 'min_lng', 'min_lat', 'max_lng', 'max_lat', 'length_m']
+
+EARTH_RADIUS_M = 6371 * 1000
+
+
+# Frozen copies of api/distance.path_length and api/roads.road_extent as
+# this migration was written: the live code must not change what an
+# applied migration does.
+def path_length(lats, lngs):
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lngs = np.radians(np.asarray(lngs, dtype=np.float64))
+    if len(lats) < 2:
+        return 0.0
+
+    dlat = np.diff(lats)
+    dlng = np.diff(lngs)
+    a = np.sin(dlat / 2)**2 + np.cos(lats[:-1]) * np.cos(lats[1:]) * np.sin(dlng / 2)**2
+    return float(np.sum(2 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))) * EARTH_RADIUS_M)
+
+
+def road_extent(geometry):
+    lines = []
+    if geometry and isinstance(geometry, dict):
+        coordinates = geometry.get('coordinates', [])
+        if geometry.get('type') == 'LineString':
+            lines = [coordinates] if coordinates else []
+        elif geometry.get('type') == 'MultiLineString':
+            lines = [line for line in coordinates if line]
+    lines = [np.array([c[:2] for c in line if len(c) >= 2], dtype=np.float64).reshape(-1, 2)
+             for line in lines]
+    lines = [line for line in lines if len(line)]
+    if not lines:
+        return dict.fromkeys(('min_lng', 'min_lat', 'max_lng', 'max_lat', 'length_m'))
+
+    coords = np.concatenate(lines)
+    return {
+        'min_lng':  float(coords[:, 0].min()),
+        'min_lat':  float(coords[:, 1].min()),
+        'max_lng':  float(coords[:, 0].max()),
+        'max_lat':  float(coords[:, 1].max()),
+        'length_m': sum(path_length(line[:, 1], line[:, 0]) for line in lines),
+    }
+
+
+def fill_road_extents(apps, schema_editor):
+    """
+    Set the extent columns of every road. Roads imported by the old
+    ml/load_roads.py hold their geometry as a JSON *string*; they are
+    decoded to the GeoJSON object the rest of the code expects.
+    """
+    Road = apps.get_model('api', 'Road')
+    batch = []
+    for road in Road.objects.only('id', 'geometry').iterator(chunk_size=2000):
+        if isinstance(road.geometry, str):
+            try:
+                road.geometry = json.loads(road.geometry)
+            except ValueError:
+                pass
+        for field, value in road_extent(road.geometry).items():
+            setattr(road, field, value)
+        batch.append(road)
+        if len(batch) >= 2000:
+            Road.objects.bulk_update(batch, EXTENT_FIELDS)
+            batch = []
+    Road.objects.bulk_update(batch, EXTENT_FIELDS)
+
+    # The R*Tree road boxes now come from these columns
+    if schema_editor.connection.vendor == 'sqlite':
+        boxes = Road.objects.exclude(min_lng=None).values_list('pk', 'min_lng', 'max_lng', 'min_lat', 'max_lat')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS rtree_roads '
+                'USING rtree(id, min_lng, max_lng, min_lat, max_lat)'
+            )
+            cursor.execute('DELETE FROM rtree_roads')
+            cursor.executemany('INSERT INTO rtree_roads VALUES (%s, %s, %s, %s, %s)', list(boxes.iterator()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_rtree'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='road',
+            name='length_m',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='road',
+            name='max_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='road',
+            name='max_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='road',
+            name='min_lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='road',
+            name='min_lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_road_extents, migrations.RunPython.noop),
+    ]
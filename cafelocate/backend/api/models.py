@@ -89,12 +89,29 @@ class Road(models.Model):
     # Temporarily using JSONField until GDAL is properly configured
     geometry    = models.JSONField()  # Will store GeoJSON LineString or MultiLineString
 
+    # Bounding box and length of the geometry, set from it at import time
+    # (api/roads.py road_extent) so queries never have to re-derive them
+    min_lng     = models.FloatField(null=True, blank=True)
+    min_lat     = models.FloatField(null=True, blank=True)
+    max_lng     = models.FloatField(null=True, blank=True)
+    max_lat     = models.FloatField(null=True, blank=True)
+    length_m    = models.FloatField(null=True, blank=True)
+
     class Meta:
         db_table = 'roads'
 
+    def save(self, *args, **kwargs):
+        for field, value in road_extent(self.geometry).items():
+            setattr(self, field, value)
+        super().save(*args, **kwargs)
+
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+
+from .roads import road_extent
+from .taxonomy import AmenityCategory, categorize
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -105,6 +122,8 @@ class Amenity(models.Model):
 
     osm_id        = models.BigIntegerField(unique=True)
     amenity_type  = models.CharField(max_length=100)  # "school", "hospital", "bus_station", etc.
+    # Canonical category (api/taxonomy.py), set from amenity_type at import time
+    category      = models.PositiveSmallIntegerField(choices=AmenityCategory.choices, default=AmenityCategory.OTHER)
     name          = models.CharField(max_length=255, null=True, blank=True)
     latitude      = models.FloatField()
     longitude     = models.FloatField()
@@ -119,8 +138,13 @@ class Amenity(models.Model):
         indexes = [
             models.Index(fields=['amenity_type']),
             models.Index(fields=['latitude', 'longitude']),
+            models.Index(fields=['category', 'latitude', 'longitude']),
         ]
 
+    def save(self, *args, **kwargs):
+        self.category = categorize(self.amenity_type)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.amenity_type}: {self.name or 'Unnamed'}"
 
@@ -144,4 +168,33 @@ class UserProfile(AbstractUser):
         db_table = 'user_profiles'
 
     def __str__(self):
-        return f"{self.username} ({self.email})"
\ No newline at end of file
+        return f"{self.username} ({self.email})"
+
+# ═══════════════════════════════════════════════════════════════════
+# TABLE 6: DataVersion
+# One counter per api table, bumped on every change, so that worker
+# processes can tell their in-memory spatial indexes are out of date
+# ═══════════════════════════════════════════════════════════════════
+class DataVersion(models.Model):
+
+    # Model name: "Cafe", "Amenity", "Road" or "Ward"
+    name    = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'data_versions'
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    @classmethod
+    def bump(cls, name):
+        """Increment the version of one table (creating its row on first use)."""
+        if not cls.objects.filter(name=name).update(version=models.F('version') + 1, updated=timezone.now()):
+            cls.objects.get_or_create(name=name)
+            cls.objects.filter(name=name).update(version=models.F('version') + 1)
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
@@ -0,0 +1,304 @@
+"""
+Reading local OpenStreetMap extracts.
+
+iter_elements() streams the nodes, ways and relations of an extract (.osm /
+.osm.bz2 / .osm.gz XML, or .osm.pbf when pyosmium is installed) with their
+tags, in file order. Extracts are expected to be sorted the standard way
+(all nodes, then ways, then relations — as Geofabrik and osmium write them).
+
+The Overpass exports in data/ (osm_roads_kathmandu.csv) list each way as
+node ids only. To turn them into geometries the node coordinates come from
+a local extract, read once into a NodeStore:
+
+    SPATIAL_CACHE_DIR/osm_nodes/ids.bin      int64, sorted node ids
+                               /coords.bin   int32 (lat, lon) per id, in 1e-7 degrees
+                               /meta.json    {"count": ..., "source": ..., "coord_scale": ...}
+
+Coordinates are kept the way OSM itself stores them: fixed-point integers
+of 1e-7 degrees. That is as compact as float32 but exact — a node at
+85.31 comes back as 85.31, not 85.309998 — so road geometries resolved
+through the store carry the extract's own 7-decimal coordinates.
+
+Both arrays are memory-mapped, so a lookup is a binary search over file
+pages the OS can drop again — no Python dict of a million nodes. Building
+the store is an external merge sort: nodes are buffered CHUNK_NODES at a
+time, each chunk is sorted into a run file, and the runs are merged block
+by block, so memory is bounded by the chunk size for any extract, up to a
+whole country.
+"""
+
+import bz2
+import gzip
+import json
+import logging
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+try:
+    import osmium
+    OSMIUM_AVAILABLE = True
+except ImportError:
+    OSMIUM_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# pyosmium relation member type → XML spelling
+MEMBER_TYPES = {'n': 'node', 'w': 'way', 'r': 'relation'}
+
+CHUNK_NODES = 4_000_000   # nodes sorted in memory at a time (~64 MB of arrays)
+
+ID_DTYPE    = np.int64
+COORD_DTYPE = np.int32        # fixed-point degrees ...
+COORD_SCALE = 10_000_000      # ... × 1e7: OSM's own precision, so lat/lon round-trip exactly
+
+
+def node_store_path():
+    return settings.SPATIAL_CACHE_DIR / 'osm_nodes'
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Extract reading
+# ═══════════════════════════════════════════════════════════════════
+def open_extract(path):
+    """Binary file object for an .osm XML extract, compressed or not."""
+    path = str(path)
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def iter_elements(path):
+    """
+    Every element of an OSM extract, in file order (nodes, then ways, then
+    relations in any sorted extract):
+
+        ('node',     id, (lat, lon),                  tags)
+        ('way',      id, [node ids],                  tags)
+        ('relation', id, [(type, ref, role), ...],    tags)
+
+    XML is parsed with iterparse and every element is cleared as soon as it
+    has been read, so memory does not grow with the file.
+    """
+    if str(path).endswith('.pbf'):
+        if not OSMIUM_AVAILABLE:
+            raise ImportError('Reading .osm.pbf extracts needs pyosmium (pip install osmium); '
+                              'convert the extract to .osm XML otherwise')
+        for obj in osmium.FileProcessor(str(path)):
+            tags = {tag.k: tag.v for tag in obj.tags}
+            if obj.is_node():
+                if obj.location.valid():
+                    yield 'node', obj.id, (obj.location.lat, obj.location.lon), tags
+            elif obj.is_way():
+                yield 'way', obj.id, [node.ref for node in obj.nodes], tags
+            elif obj.is_relation():
+                members = [(MEMBER_TYPES[m.type], m.ref, m.role) for m in obj.members]
+                yield 'relation', obj.id, members, tags
+        return
+
+    with open_extract(path) as f:
+        root = None
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if root is None:
+                root = elem
+                continue
+            if event != 'end' or elem.tag not in ('node', 'way', 'relation'):
+                continue
+
+            tags = {child.get('k'): child.get('v') for child in elem if child.tag == 'tag'}
+            if elem.tag == 'node':
+                lat, lon = elem.get('lat'), elem.get('lon')
+                if lat is not None and lon is not None:
+                    yield 'node', int(elem.get('id')), (float(lat), float(lon)), tags
+            elif elem.tag == 'way':
+                refs = [int(child.get('ref')) for child in elem if child.tag == 'nd']
+                yield 'way', int(elem.get('id')), refs, tags
+            else:
+                members = [(child.get('type'), int(child.get('ref')), child.get('role') or '')
+                           for child in elem if child.tag == 'member']
+                yield 'relation', int(elem.get('id')), members, tags
+            # Top-level element done: drop it (and its children) from the tree
+            root.clear()
+
+
+def iter_nodes(path):
+    """(node_id, lat, lon) of every node in an OSM extract, in file order."""
+    for kind, osm_id, location, _ in iter_elements(path):
+        if kind == 'node':
+            yield osm_id, *location
+        else:
+            return   # sorted extract: no nodes after the first way
+
+
+# ═══════════════════════════════════════════════════════════════════
+# NodeStore
+# ═══════════════════════════════════════════════════════════════════
+class NodeStore:
+
+    def __init__(self, ids, coords, meta=None):
+        self.ids    = ids      # (n,) int64, sorted, unique
+        self.coords = coords   # (n, 2) lat, lon — int32 × 1e-7 degrees (float32 in old stores)
+        self.meta   = meta or {}
+        self.scale  = self.meta.get('coord_scale', COORD_SCALE if coords.dtype == COORD_DTYPE else 1)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, node_ids):
+        """
+        Coordinates of the given node ids.
+
+        Returns:
+            (n, 2) float64 array of lat, lon — NaN for ids not in the store
+        """
+        node_ids = np.asarray(node_ids, dtype=ID_DTYPE).ravel()
+        result = np.full((len(node_ids), 2), np.nan)
+        if not (len(node_ids) and len(self.ids)):
+            return result
+
+        positions = np.minimum(np.searchsorted(self.ids, node_ids), len(self.ids) - 1)
+        found = self.ids[positions] == node_ids
+        result[found] = self.coords[positions[found]] / self.scale
+        return result
+
+    @classmethod
+    def load(cls, path=None):
+        """Memory-map a saved store; None when it has not been built."""
+        path = Path(path or node_store_path())
+        meta_path = path / 'meta.json'
+        if not meta_path.exists():
+            return None
+
+        meta  = json.loads(meta_path.read_text())
+        count = meta['count']
+        # Stores written before the fixed-point format hold float32 degrees
+        dtype = np.dtype(meta.get('coord_dtype', 'float32'))
+        meta.setdefault('coord_scale', 1)
+        if not count:
+            return cls(np.empty(0, ID_DTYPE), np.empty((0, 2), dtype), meta)
+        ids    = np.memmap(path / 'ids.bin', dtype=ID_DTYPE, mode='r', shape=(count,))
+        coords = np.memmap(path / 'coords.bin', dtype=dtype, mode='r', shape=(count, 2))
+        return cls(ids, coords, meta)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, ID_DTYPE), np.empty((0, 2), COORD_DTYPE), {'coord_scale': COORD_SCALE})
+
+    @classmethod
+    def build(cls, nodes, path=None, chunk_nodes=CHUNK_NODES, source=None):
+        """
+        Write a store from an iterable of (node_id, lat, lon) in any order
+        (iter_nodes() of an extract) and return it memory-mapped. A node id
+        that appears twice keeps its last coordinates.
+        """
+        path = Path(path or node_store_path())
+        path.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.TemporaryDirectory(dir=path, prefix='.runs.') as run_dir:
+            runs = _write_runs(nodes, Path(run_dir), chunk_nodes)
+            # Merged into temporary files next to the targets, then renamed:
+            # a process that has the old store mapped keeps its old pages
+            ids_tmp, coords_tmp = Path(run_dir) / 'ids.bin', Path(run_dir) / 'coords.bin'
+            with open(ids_tmp, 'wb') as ids_file, open(coords_tmp, 'wb') as coords_file:
+                count = _merge_runs(runs, ids_file, coords_file, chunk_nodes)
+
+            meta_tmp = Path(run_dir) / 'meta.json'
+            meta_tmp.write_text(json.dumps({
+                'count': count,
+                'source': str(source) if source else None,
+                'coord_dtype': np.dtype(COORD_DTYPE).name,
+                'coord_scale': COORD_SCALE,
+            }, indent=2))
+
+            for tmp in (ids_tmp, coords_tmp, meta_tmp):
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, path / tmp.name)
+
+        logger.info(f"Node store built: {count} nodes in {len(runs)} runs → {path}")
+        return cls.load(path)
+
+    @classmethod
+    def from_extract(cls, extract_path, path=None, chunk_nodes=CHUNK_NODES):
+        return cls.build(iter_nodes(extract_path), path, chunk_nodes, source=extract_path)
+
+
+def _sorted_unique(ids, coords):
+    """Sort by id; for repeated ids keep the LAST occurrence."""
+    order = np.argsort(ids, kind='stable')
+    ids, coords = ids[order], coords[order]
+    last = np.r_[ids[1:] != ids[:-1], True]
+    return ids[last], coords[last]
+
+
+def _write_runs(nodes, run_dir, chunk_nodes):
+    """Sorted run files ([(ids path, coords path, count), ...]) of chunk_nodes nodes each."""
+    runs = []
+    ids    = np.empty(chunk_nodes, dtype=ID_DTYPE)
+    coords = np.empty((chunk_nodes, 2), dtype=COORD_DTYPE)
+    filled = 0
+
+    def flush():
+        chunk_ids, chunk_coords = _sorted_unique(ids[:filled], coords[:filled])
+        name = run_dir / f'run{len(runs):05d}'
+        chunk_ids.tofile(f'{name}.ids')
+        chunk_coords.tofile(f'{name}.coords')
+        runs.append((f'{name}.ids', f'{name}.coords', len(chunk_ids)))
+
+    for node_id, lat, lon in nodes:
+        ids[filled] = node_id
+        coords[filled] = round(lat * COORD_SCALE), round(lon * COORD_SCALE)
+        filled += 1
+        if filled == chunk_nodes:
+            flush()
+            filled = 0
+    if filled:
+        flush()
+    return runs
+
+
+def _merge_runs(runs, ids_file, coords_file, chunk_nodes):
+    """
+    k-way merge of the sorted runs into the output files, one block per run
+    at a time. Each step takes, from every run, the ids up to the smallest
+    last id of the blocks that do not end their run — everything at or
+    below that bound is in memory — and sorts just those.
+
+    Returns:
+        number of (unique) nodes written
+    """
+    runs = [
+        (np.memmap(ids_path, dtype=ID_DTYPE, mode='r', shape=(n,)),
+         np.memmap(coords_path, dtype=COORD_DTYPE, mode='r', shape=(n, 2)))
+        for ids_path, coords_path, n in runs if n
+    ]
+    block = max(4096, chunk_nodes // max(len(runs), 1))
+    positions = [0] * len(runs)
+    count = 0
+
+    while True:
+        active = [i for i, (ids, _) in enumerate(runs) if positions[i] < len(ids)]
+        if not active:
+            return count
+
+        blocks = {i: runs[i][0][positions[i]:positions[i] + block] for i in active}
+        bounds = [blocks[i][-1] for i in active if positions[i] + block < len(runs[i][0])]
+        bound = min(bounds) if bounds else None
+
+        # Runs are in file order, so a stable sort keeps the last file position last
+        step_ids, step_coords = [], []
+        for i in active:
+            take = len(blocks[i]) if bound is None else int(np.searchsorted(blocks[i], bound, side='right'))
+            step_ids.append(blocks[i][:take])
+            step_coords.append(runs[i][1][positions[i]:positions[i] + take])
+            positions[i] += take
+
+        step_ids, step_coords = _sorted_unique(np.concatenate(step_ids), np.concatenate(step_coords))
+        ids_file.write(step_ids.tobytes())
+        coords_file.write(step_coords.tobytes())
+        count += len(step_ids)
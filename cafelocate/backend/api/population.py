@@ -0,0 +1,373 @@
+"""
+Dasymetric population surface with a summed-area table.
+
+Each ward's census population is spread over a fine grid, not evenly but
+in proportion to how "built up" each cell looks (road length and amenity
+count in and around the cell). The grid is stored as a summed-area table
+(integral image), so the population of any rectangle is four array reads
+and a circle is one rectangle per grid row — independent of how complex
+the ward polygons are.
+
+Built offline:
+
+    python manage.py build_population_surface --resolution 50
+
+and saved as SPATIAL_CACHE_DIR/population_sat.npy (+ .json metadata).
+Views use catchment_population() (or catchment_breakdown() for the split
+by ward), which fall back to the area-weighted ward intersection when no
+(matching) surface has been built.
+"""
+
+import hashlib
+import json
+import logging
+
+import numpy as np
+from django.conf import settings
+
+from .grid import MetricGrid, project
+from .spatial_index import LazyIndex, table_stamp
+
+logger = logging.getLogger(__name__)
+
+# Default weighting of a cell: 1 + ROAD_WEIGHT × road metres per cell side
+#                                 + AMENITY_WEIGHT × amenities (3×3 neighbourhood)
+ROAD_WEIGHT    = 1.0
+AMENITY_WEIGHT = 0.5
+
+
+def surface_path():
+    return settings.SPATIAL_CACHE_DIR / 'population_sat.npy'
+
+
+# Tables a surface is built from: wards (boundaries + census) and the roads
+# and amenities that weight its cells
+SURFACE_INPUTS = ('Ward', 'Road', 'Amenity')
+
+
+def input_stamps():
+    """table_stamp() of every SURFACE_INPUTS table."""
+    return tuple(table_stamp(model_name)() for model_name in SURFACE_INPUTS)
+
+
+def census_fingerprint(locator):
+    """
+    Identifies the ward boundaries + populations a surface was built from,
+    and the input_stamps() of its tables — so a road or amenity reload
+    makes the surface stale too.
+    """
+    populations = [[ward['ward_number'], ward['population']] for ward in locator.wards]
+    payload = json.dumps([locator.fingerprint, populations, input_stamps()])
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def summed_area_table(values):
+    """Integral image with a leading row and column of zeros."""
+    sat = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(values, axis=0, dtype=np.float64), axis=1, out=sat[1:, 1:])
+    return sat
+
+
+def box_sum_3x3(values):
+    """Sum of every cell's 3×3 neighbourhood (zero-padded), via a summed-area table."""
+    sat = summed_area_table(np.pad(values, 1))
+    return sat[3:, 3:] - sat[:-3, 3:] - sat[3:, :-3] + sat[:-3, :-3]
+
+
+# ═══════════════════════════════════════════════════════════════════
+# PopulationSurface
+# ═══════════════════════════════════════════════════════════════════
+class PopulationSurface:
+
+    def __init__(self, grid, sat, fingerprint):
+        self.grid        = grid
+        self.sat         = sat
+        self.fingerprint = fingerprint
+        self.stale       = False
+
+    def __len__(self):
+        return self.grid.n_rows * self.grid.n_cols
+
+    @property
+    def total(self):
+        return float(self.sat[-1, -1])
+
+    def rect_sum(self, row0, row1, col0, col1):
+        """Population of cells [row0, row1) × [col0, col1) — O(1). Works on arrays too."""
+        s = self.sat
+        return s[row1, col1] - s[row0, col1] - s[row1, col0] + s[row0, col0]
+
+    def _circle_spans(self, lat, lng, radius_m):
+        """
+        (rows, col0, col1) of the cells whose centre lies within radius_m of
+        (lat, lng): columns [col0, col1) of every grid row the circle spans.
+        """
+        _, rows, col0, col1 = self._circle_spans_many([lat], [lng], [radius_m])
+        return rows, col0, col1
+
+    def _circle_spans_many(self, lats, lngs, radii_m):
+        """
+        _circle_spans() of many circles at once.
+
+        Returns:
+            (sites, rows, col0, col1) — one entry per (circle, grid row) pair
+        """
+        grid = self.grid
+        radii_m = np.asarray(radii_m, dtype=np.float64)
+        x, y = project(np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64))
+        res = grid.resolution_m
+
+        # Rows whose centre line is inside each circle
+        row0 = np.maximum(np.ceil((y - radii_m - grid.y_min) / res - 0.5), 0).astype(np.intp)
+        row1 = np.minimum(np.floor((y + radii_m - grid.y_min) / res - 0.5), grid.n_rows - 1).astype(np.intp)
+        counts = np.maximum(row1 - row0 + 1, 0)
+        sites = np.repeat(np.arange(len(counts)), counts)
+        rows = row0[sites] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        dy = grid.y_min + (rows + 0.5) * res - y[sites]
+        half = np.sqrt(np.maximum(radii_m[sites] * radii_m[sites] - dy * dy, 0.0))
+
+        # Columns whose centre lies in [x - half, x + half]
+        col0 = np.clip(np.ceil((x[sites] - half - grid.x_min) / res - 0.5), 0, grid.n_cols).astype(np.intp)
+        col1 = np.clip(np.floor((x[sites] + half - grid.x_min) / res - 0.5) + 1, 0, grid.n_cols).astype(np.intp)
+        return sites, rows, col0, np.maximum(col1, col0)
+
+    def _sub_cell(self, lat, lng, radius_m):
+        """
+        For a circle smaller than one cell (which may hold no cell centre at
+        all): (row, col, fraction) of the cell containing (lat, lng) and the
+        circle's share of that cell's area. None for larger circles; the
+        row is -1 when the point is off the grid.
+        """
+        res = self.grid.resolution_m
+        if np.pi * radius_m * radius_m >= res * res:
+            return None
+        rows, cols, inside = self.grid.cells(lat, lng)
+        if not inside:
+            return -1, -1, 0.0
+        return int(rows), int(cols), np.pi * radius_m * radius_m / (res * res)
+
+    def circle_sum(self, lat, lng, radius_m):
+        """
+        Population of the cells whose centre lies within radius_m of (lat, lng):
+        one rect_sum per grid row the circle spans. A circle smaller than
+        one cell takes its area's share of the cell it lies in.
+        """
+        return float(self.circle_sum_many([lat], [lng], [radius_m])[0])
+
+    def circle_sum_many(self, lats, lngs, radii_m):
+        """
+        circle_sum() of many circles: the rect_sums of every (circle, row)
+        pair in one array operation.
+
+        Returns:
+            (n,) float64 array of populations
+        """
+        lats, lngs, radii_m = (np.asarray(a, dtype=np.float64).ravel() for a in (lats, lngs, radii_m))
+        res = self.grid.resolution_m
+        totals = np.zeros(len(lats))
+
+        # Circles smaller than one cell: their area's share of the cell they lie in
+        small = np.pi * radii_m * radii_m < res * res
+        if small.any():
+            rows, cols, inside = self.grid.cells(lats[small], lngs[small])
+            cell = np.zeros(len(rows))
+            cell[inside] = self.rect_sum(rows[inside], rows[inside] + 1, cols[inside], cols[inside] + 1)
+            totals[small] = cell * np.pi * radii_m[small] * radii_m[small] / (res * res)
+
+        large = np.flatnonzero(~small)
+        if len(large):
+            sites, rows, col0, col1 = self._circle_spans_many(lats[large], lngs[large], radii_m[large])
+            totals[large] = np.bincount(sites, weights=self.rect_sum(rows, rows + 1, col0, col1), minlength=len(large))
+        return totals
+
+    def circle_by_ward(self, lat, lng, radius_m, locator):
+        """
+        circle_sum() split by the ward each cell centre lies in.
+
+        Returns:
+            {ward position in locator: population} — the values add up to circle_sum()
+        """
+        sub_cell = self._sub_cell(lat, lng, radius_m)
+        if sub_cell is not None:
+            row, col, fraction = sub_cell
+            cell_rows, cell_cols = np.array([row]), np.array([col])
+            if row < 0:
+                return {}
+        else:
+            rows, col0, col1 = self._circle_spans(lat, lng, radius_m)
+            widths = col1 - col0
+            cell_rows = np.repeat(rows, widths)
+            cell_cols = np.repeat(col0 - np.cumsum(widths) + widths, widths) + np.arange(widths.sum())
+            fraction = 1.0
+        population = self.rect_sum(cell_rows, cell_rows + 1, cell_cols, cell_cols + 1) * fraction
+
+        res = self.grid.resolution_m
+        wards = locator.lookup_xy(self.grid.x_min + (cell_cols + 0.5) * res,
+                                  self.grid.y_min + (cell_rows + 0.5) * res)
+        # Cells outside every ward hold no population
+        inside = (wards >= 0) & (population > 0)
+        totals = np.bincount(wards[inside], weights=population[inside], minlength=len(locator))
+        return {int(position): float(totals[position]) for position in np.flatnonzero(totals)}
+
+    def save(self, path=None, **extra_meta):
+        path = path or surface_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, self.sat)
+        meta = {**self.grid.to_meta(), 'fingerprint': self.fingerprint, **extra_meta}
+        path.with_suffix('.json').write_text(json.dumps(meta, indent=2))
+
+    @classmethod
+    def load(cls, path=None):
+        """Memory-map a saved surface; None when it has not been built."""
+        path = path or surface_path()
+        meta_path = path.with_suffix('.json')
+        if not (path.exists() and meta_path.exists()):
+            return None
+
+        meta = json.loads(meta_path.read_text())
+        grid = MetricGrid.from_meta(meta)
+        sat  = np.load(path, mmap_mode='r')
+        if sat.shape != (grid.n_rows + 1, grid.n_cols + 1):
+            raise ValueError(f'{path} has shape {sat.shape}, metadata says {grid.shape} (+1)')
+        return cls(grid, sat, meta.get('fingerprint'))
+
+
+def build_population_surface(locator, road_index, amenity_lats, amenity_lngs, resolution_m,
+                             road_weight=ROAD_WEIGHT, amenity_weight=AMENITY_WEIGHT):
+    """
+    Distribute every ward's population over a grid of resolution_m cells.
+
+    Args:
+        locator:      WardLocator (which ward each cell belongs to + populations)
+        road_index:   RoadIndex (road segments, for road length per cell)
+        amenity_lats, amenity_lngs: amenity coordinates
+    """
+    grid = MetricGrid.for_bounds(resolution_m)
+
+    # Which ward every cell centre is in
+    wards = np.empty(grid.shape, dtype=np.intp)
+    for start in range(0, grid.n_rows, 256):
+        stop = min(start + 256, grid.n_rows)
+        x, y = grid.row_centers(start, stop)
+        wards[start:stop] = locator.lookup_xy(x.ravel(), y.ravel()).reshape(x.shape)
+
+    # Road metres per cell: walk each segment in sub-cell steps and drop its length into cells
+    road_m = np.zeros(grid.shape)
+    if len(road_index):
+        x0, y0 = project(road_index.lat0, road_index.lng0)
+        x1, y1 = project(road_index.lat1, road_index.lng1)
+        lengths = np.hypot(x1 - x0, y1 - y0)
+        steps = np.maximum(np.ceil(lengths / (resolution_m / 2)).astype(np.intp), 1)
+        seg   = np.repeat(np.arange(len(steps)), steps)
+        first = np.repeat(np.cumsum(steps) - steps, steps)
+        t     = (np.arange(len(seg)) - first + 0.5) / steps[seg]  # midpoints of the pieces
+        rows, cols, inside = grid.cells_xy(x0[seg] + t * (x1 - x0)[seg], y0[seg] + t * (y1 - y0)[seg])
+        np.add.at(road_m, (rows[inside], cols[inside]), (lengths / steps)[seg][inside])
+
+    # Amenities per cell
+    amenities = np.zeros(grid.shape)
+    rows, cols, inside = grid.cells(amenity_lats, amenity_lngs)
+    np.add.at(amenities, (rows[inside], cols[inside]), 1.0)
+
+    weights = 1.0 + road_weight * road_m / resolution_m + amenity_weight * box_sum_3x3(amenities)
+
+    # Each ward's population ∝ weight of its cells
+    in_ward = wards >= 0
+    ward_weight = np.bincount(wards[in_ward], weights=weights[in_ward], minlength=len(locator))
+    populations = np.array([ward['population'] for ward in locator.wards], dtype=np.float64)
+    per_weight  = np.divide(populations, ward_weight, out=np.zeros_like(populations), where=ward_weight > 0)
+
+    density = np.zeros(grid.shape)
+    density[in_ward] = weights[in_ward] * per_weight[wards[in_ward]]
+
+    return PopulationSurface(grid, summed_area_table(density), census_fingerprint(locator))
+
+
+def _load_population_surface():
+    from .wards import get_ward_locator
+
+    try:
+        surface = PopulationSurface.load()
+    except (OSError, ValueError) as e:
+        logger.warning(f'Could not load population surface: {e}')
+        return None
+
+    if surface is not None and surface.fingerprint != census_fingerprint(get_ward_locator()):
+        logger.warning('Population surface is stale (wards, census, roads or amenities changed) — run build_population_surface. Ignoring it.')
+        surface.stale = True
+    return surface
+
+
+_population_surface = LazyIndex('population surface', _load_population_surface, stamp=input_stamps)
+
+
+def get_population_surface():
+    """The loaded PopulationSurface, or None when it is missing or stale."""
+    surface = _population_surface.get()
+    if surface is None or surface.stale:
+        return None
+    return surface
+
+
+def invalidate_population_surface():
+    _population_surface.invalidate()
+
+
+def catchment_population(lat, lng, radius_m):
+    """
+    People living within radius_m of (lat, lng).
+
+    Returns:
+        (population, method) — method is 'dasymetric' (population surface)
+        or 'area_weighted' (ward ∩ circle fallback)
+    """
+    surface = get_population_surface()
+    if surface is not None:
+        return surface.circle_sum(lat, lng, radius_m), 'dasymetric'
+
+    from .wards import get_ward_locator
+    population, _ = get_ward_locator().catchment_population(lat, lng, radius_m)
+    return population, 'area_weighted'
+
+
+def catchment_population_many(lats, lngs, radii_m):
+    """
+    catchment_population() of many circles: one circle_sum_many() on the
+    surface, or the area-weighted fallback circle by circle.
+
+    Returns:
+        (list of populations, method)
+    """
+    surface = get_population_surface()
+    if surface is not None:
+        return surface.circle_sum_many(lats, lngs, radii_m).tolist(), 'dasymetric'
+
+    from .wards import get_ward_locator
+    locator = get_ward_locator()
+    return [locator.catchment_population(lat, lng, r)[0] for lat, lng, r in zip(lats, lngs, radii_m)], 'area_weighted'
+
+
+def catchment_breakdown(lat, lng, radius_m):
+    """
+    catchment_population() together with its split by ward, both from the
+    same method, so the ward populations add up to the total.
+
+    Returns:
+        (population, method, [(ward_dict, share, population_in_area), ...])
+        — share is the fraction of the ward's residents inside the circle
+        (for 'area_weighted' that is the fraction of its area)
+    """
+    from .wards import get_ward_locator
+
+    locator = get_ward_locator()
+    surface = get_population_surface()
+    if surface is None:
+        population, breakdown = locator.catchment_population(lat, lng, radius_m)
+        return population, 'area_weighted', breakdown
+
+    breakdown = []
+    for position, population in sorted(surface.circle_by_ward(lat, lng, radius_m, locator).items()):
+        ward = locator.wards[position]
+        share = min(1.0, population / ward['population']) if ward['population'] else 0.0
+        breakdown.append((ward, share, population))
+    return sum(population for _, _, population in breakdown), 'dasymetric', breakdown
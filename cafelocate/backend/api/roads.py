@@ -0,0 +1,306 @@
+"""
+Road network index for the suitability analysis.
+
+All Road geometries are split into straight segments ONCE and their
+bounding boxes are put in an STRtree (R-tree). A radius query then only
+touches the segments whose box overlaps the buffer circle, and each of
+those is clipped exactly against the circle, so the result is the true
+length of road inside the buffer — broken down by road_type.
+"""
+
+import logging
+
+import numpy as np
+
+from .distance import degree_box, local_xy, path_length
+from .spatial_index import LazyIndex, query_backend, table_stamp
+
+try:
+    import shapely
+    from shapely import STRtree
+    SHAPELY_AVAILABLE = True
+except ImportError:
+    SHAPELY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def geometry_lines(geometry):
+    """List of coordinate lists ([[lng, lat], ...]) in a GeoJSON (Multi)LineString."""
+    if not (geometry and isinstance(geometry, dict)):
+        return []
+
+    geom_type = geometry.get('type')
+    coordinates = geometry.get('coordinates', [])
+    if geom_type == 'LineString':
+        return [coordinates] if coordinates else []
+    if geom_type == 'MultiLineString':
+        return [line for line in coordinates if line]
+    return []
+
+
+def road_extent(geometry):
+    """
+    Bounding box and length of a GeoJSON (Multi)LineString — the Road
+    columns filled at import time (all None when it has no usable line).
+
+    Returns:
+        {'min_lng', 'min_lat', 'max_lng', 'max_lat', 'length_m'}
+    """
+    lines = [np.array([c[:2] for c in line if len(c) >= 2], dtype=np.float64).reshape(-1, 2)
+             for line in geometry_lines(geometry)]
+    lines = [line for line in lines if len(line)]
+    if not lines:
+        return dict.fromkeys(('min_lng', 'min_lat', 'max_lng', 'max_lat', 'length_m'))
+
+    coords = np.concatenate(lines)
+    return {
+        'min_lng':  float(coords[:, 0].min()),
+        'min_lat':  float(coords[:, 1].min()),
+        'max_lng':  float(coords[:, 0].max()),
+        'max_lat':  float(coords[:, 1].max()),
+        'length_m': sum(path_length(line[:, 1], line[:, 0]) for line in lines),
+    }
+
+
+def clipped_lengths(x0, y0, x1, y1, radius_m):
+    """
+    Length of each segment (x0, y0)-(x1, y1) that lies inside a circle of
+    radius_m centred on the origin. All inputs are arrays in metres.
+
+    Solves |P0 + t·(P1 - P0)|² = r² for t and keeps the part of [0, 1]
+    between the two roots.
+    """
+    dx = x1 - x0
+    dy = y1 - y0
+    a = dx * dx + dy * dy
+    b = 2 * (x0 * dx + y0 * dy)
+    c = x0 * x0 + y0 * y0 - radius_m * radius_m
+
+    disc = b * b - 4 * a * c
+    hit = (a > 0) & (disc > 0)
+
+    lengths = np.zeros_like(a)
+    if hit.any():
+        root = np.sqrt(disc[hit])
+        t_in  = np.clip((-b[hit] - root) / (2 * a[hit]), 0.0, 1.0)
+        t_out = np.clip((-b[hit] + root) / (2 * a[hit]), 0.0, 1.0)
+        lengths[hit] = (t_out - t_in) * np.sqrt(a[hit])
+    return lengths
+
+
+def segment_distances(x0, y0, x1, y1):
+    """Distance from the origin to each segment (x0, y0)-(x1, y1); arrays in metres."""
+    dx = x1 - x0
+    dy = y1 - y0
+    a = dx * dx + dy * dy
+    t = np.clip(np.divide(-(x0 * dx + y0 * dy), a, out=np.zeros_like(a), where=a > 0), 0.0, 1.0)
+    return np.hypot(x0 + t * dx, y0 + t * dy)
+
+
+# ═══════════════════════════════════════════════════════════════════
+# RoadIndex
+# Flat arrays of road segments (lng/lat endpoints) + an R-tree over their boxes
+# ═══════════════════════════════════════════════════════════════════
+class RoadIndex:
+
+    def __init__(self, road_ids, road_types, segments, segment_roads):
+        self.road_ids   = np.asarray(road_ids, dtype=np.int64)
+        self.road_types = list(road_types)
+
+        # segments: shape (n, 4) → lng0, lat0, lng1, lat1
+        segments = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+        self.lng0, self.lat0, self.lng1, self.lat1 = segments.T
+        self.segment_roads = np.asarray(segment_roads, dtype=np.intp)
+
+        self.min_lng = np.minimum(self.lng0, self.lng1)
+        self.max_lng = np.maximum(self.lng0, self.lng1)
+        self.min_lat = np.minimum(self.lat0, self.lat1)
+        self.max_lat = np.maximum(self.lat0, self.lat1)
+
+        # Road type of each road as a code into type_names, for grouping in bulk
+        self.type_names, self.type_codes = np.unique(
+            np.array([road_type or 'unknown' for road_type in self.road_types], dtype=object).astype(str),
+            return_inverse=True,
+        )
+
+        self._tree = None
+        if SHAPELY_AVAILABLE and len(segments):
+            self._tree = STRtree(shapely.box(self.min_lng, self.min_lat, self.max_lng, self.max_lat))
+
+    def __len__(self):
+        return len(self.segment_roads)
+
+    def candidate_segments(self, lat, lng, radius_m):
+        """Segments whose bounding box overlaps the bounding box of the circle."""
+        if not len(self):
+            return np.empty(0, dtype=np.intp)
+
+        min_lng, min_lat, max_lng, max_lat = degree_box(lat, lng, radius_m)
+        if self._tree is not None:
+            return np.sort(self._tree.query(shapely.box(min_lng, min_lat, max_lng, max_lat)))
+
+        # No shapely → same box test as one vectorised scan
+        return np.flatnonzero(
+            (self.max_lng >= min_lng) & (self.min_lng <= max_lng) &
+            (self.max_lat >= min_lat) & (self.min_lat <= max_lat)
+        )
+
+    def candidate_pairs(self, lats, lngs, radii_m):
+        """
+        candidate_segments() for many circles in one tree query.
+
+        Returns:
+            (sites, segments) — every (circle position, segment) pair whose
+            boxes overlap, sorted by circle, then segment
+        """
+        lats, lngs, radii_m = (np.asarray(a, dtype=np.float64).ravel() for a in (lats, lngs, radii_m))
+        if not (len(self) and len(lats)):
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+
+        min_lng, min_lat, max_lng, max_lat = degree_box(lats, lngs, radii_m)
+        if self._tree is not None:
+            sites, segments = self._tree.query(shapely.box(min_lng, min_lat, max_lng, max_lat))
+        else:
+            # No shapely → the same box test, one vectorised scan per circle
+            hits = [np.flatnonzero(
+                        (self.max_lng >= min_lng[i]) & (self.min_lng <= max_lng[i]) &
+                        (self.max_lat >= min_lat[i]) & (self.min_lat <= max_lat[i]))
+                    for i in range(len(lats))]
+            sites = np.repeat(np.arange(len(lats)), [len(h) for h in hits])
+            segments = np.concatenate(hits)
+
+        order = np.lexsort((segments, sites))
+        return sites[order].astype(np.intp), segments[order].astype(np.intp)
+
+    def length_within(self, lat, lng, radius_m):
+        """
+        Road length inside the circle of radius_m around (lat, lng).
+
+        Returns:
+            (total_m, {road_type: metres}, number_of_roads_touched)
+        """
+        return self.length_within_many([lat], [lng], [radius_m])[0]
+
+    def length_within_many(self, lats, lngs, radii_m):
+        """
+        length_within() for many circles: one tree query for all of them,
+        then every candidate segment clipped against its circle at once.
+
+        Returns:
+            list of (total_m, {road_type: metres}, number_of_roads_touched), one per circle
+        """
+        lats, lngs, radii_m = (np.asarray(a, dtype=np.float64).ravel() for a in (lats, lngs, radii_m))
+        n = len(lats)
+        sites, candidates = self.candidate_pairs(lats, lngs, radii_m)
+        if not len(candidates):
+            return [(0.0, {}, 0) for _ in range(n)]
+
+        x0, y0 = local_xy(lats[sites], lngs[sites], self.lat0[candidates], self.lng0[candidates])
+        x1, y1 = local_xy(lats[sites], lngs[sites], self.lat1[candidates], self.lng1[candidates])
+        lengths = clipped_lengths(x0, y0, x1, y1, radii_m[sites])
+
+        inside = lengths > 0
+        sites, roads, lengths = sites[inside], self.segment_roads[candidates[inside]], lengths[inside]
+
+        totals = np.bincount(sites, weights=lengths, minlength=n)
+        # Roads touched per circle: distinct (circle, road) pairs
+        touched = np.bincount(np.unique(sites * len(self.road_ids) + roads) // len(self.road_ids), minlength=n)
+        # Metres per (circle, road type)
+        n_types = len(self.type_names)
+        groups, group_of = np.unique(sites * n_types + self.type_codes[roads], return_inverse=True)
+        group_m = np.bincount(group_of, weights=lengths)
+
+        by_type = [{} for _ in range(n)]
+        for group, metres in zip(groups.tolist(), group_m.tolist()):
+            by_type[group // n_types][str(self.type_names[group % n_types])] = metres
+
+        return [(float(total), types, int(count)) for total, types, count in zip(totals.tolist(), by_type, touched.tolist())]
+
+    def distances_within(self, lat, lng, radius_m):
+        """
+        Distance (metres) from (lat, lng) to the closest point of every road
+        that comes within radius_m.
+
+        Returns:
+            (road_positions, distances_m) — sorted by distance
+        """
+        candidates = self.candidate_segments(lat, lng, radius_m)
+        if not len(candidates):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        x0, y0 = local_xy(lat, lng, self.lat0[candidates], self.lng0[candidates])
+        x1, y1 = local_xy(lat, lng, self.lat1[candidates], self.lng1[candidates])
+        distances = segment_distances(x0, y0, x1, y1)
+
+        inside = distances <= radius_m
+        roads, distances = self.segment_roads[candidates[inside]], distances[inside]
+        if not len(roads):
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        # Closest segment of each road: group by road, minimum of each run
+        order = np.argsort(roads, kind='stable')
+        roads, distances = roads[order], distances[order]
+        starts = np.flatnonzero(np.r_[True, roads[1:] != roads[:-1]])
+        roads, distances = roads[starts], np.minimum.reduceat(distances, starts)
+
+        order = np.argsort(distances, kind='stable')
+        return roads[order], distances[order]
+
+
+def road_index_from_rows(rows):
+    """RoadIndex from (id, road_type, geometry) rows."""
+    road_ids, road_types, segments, segment_roads = [], [], [], []
+    for road_id, road_type, geometry in rows:
+        lines = geometry_lines(geometry)
+        if not lines:
+            continue
+
+        position = len(road_ids)
+        road_ids.append(road_id)
+        road_types.append(road_type)
+        for line in lines:
+            coords = [c[:2] for c in line if len(c) >= 2]
+            for (lng0, lat0), (lng1, lat1) in zip(coords, coords[1:]):
+                segments.append((lng0, lat0, lng1, lat1))
+                segment_roads.append(position)
+
+    return RoadIndex(road_ids, road_types, segments, segment_roads)
+
+
+def _build_road_index():
+    from .models import Road
+
+    return road_index_from_rows(Road.objects.values_list('id', 'road_type', 'geometry').iterator())
+
+
+_road_index = LazyIndex('road', _build_road_index, stamp=table_stamp('Road'))
+
+
+def get_road_index():
+    return _road_index.get()
+
+
+def invalidate_road_index():
+    _road_index.invalidate()
+
+
+def road_length_within(lat, lng, radius_m):
+    """get_road_index().length_within(...), or the same query through query_backend()."""
+    backend = query_backend()
+    if backend is not None:
+        return backend.road_length_within(lat, lng, radius_m)
+
+    return get_road_index().length_within(lat, lng, radius_m)
+
+
+def road_length_within_many(lats, lngs, radii_m):
+    """
+    road_length_within() for many circles: get_road_index().length_within_many(),
+    or one query_backend() call per circle.
+    """
+    backend = query_backend()
+    if backend is not None:
+        return [backend.road_length_within(lat, lng, r) for lat, lng, r in zip(lats, lngs, radii_m)]
+
+    return get_road_index().length_within_many(lats, lngs, radii_m)
@@ -0,0 +1,236 @@
+"""
+SQLite R*Tree mirrors of the Cafe, Amenity and Road bounding boxes.
+
+For the default db.sqlite3 deployment (no GDAL): every cafe / amenity point
+and every road's bounding box is kept in an R*Tree virtual table
+
+    rtree_cafes / rtree_amenities / rtree_roads (id, min_lng, max_lng, min_lat, max_lat)
+
+so a radius query is ONE indexed SQL query for the rows whose box overlaps
+the circle's box, followed by exact distances (or road clipping) for just
+those candidates — no full-table scan and no in-memory index to build.
+
+The tables are created by migration 0004 (SQLite only), kept in sync by
+api/signals.py and rebuilt with `python manage.py rebuild_rtree` after bulk
+loads. With settings.SPATIAL_INDEX = 'rtree' the functions at the bottom of
+this module answer the views' radius queries (see query_backend()).
+"""
+
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from .distance import degree_box, within_radius
+from .roads import road_index_from_rows
+from .spatial_index import objects_within_radius, point_coordinates
+
+logger = logging.getLogger(__name__)
+
+# api model → R*Tree table
+RTREE_TABLES = {
+    'Cafe':    'rtree_cafes',
+    'Amenity': 'rtree_amenities',
+    'Road':    'rtree_roads',
+}
+
+_ready = False
+_checked = None    # time.monotonic() of the last failed check
+
+
+def cafe_box(location, latitude, longitude):
+    lat, lng = point_coordinates(location, latitude, longitude)
+    if lat is None:
+        return None
+    return lng, lng, lat, lat
+
+
+def amenity_box(latitude, longitude):
+    if latitude is None or longitude is None:
+        return None
+    return longitude, longitude, latitude, latitude
+
+
+def road_box(min_lng, max_lng, min_lat, max_lat):
+    # Columns set from the geometry at import time (Road.save / road_extent)
+    if None in (min_lng, max_lng, min_lat, max_lat):
+        return None
+    return min_lng, max_lng, min_lat, max_lat
+
+
+# api model → (source fields, box function)
+BOX_SOURCES = {
+    'Cafe':    (('location', 'latitude', 'longitude'), cafe_box),
+    'Amenity': (('latitude', 'longitude'),             amenity_box),
+    'Road':    (('min_lng', 'max_lng', 'min_lat', 'max_lat'), road_box),
+}
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Table maintenance
+# ═══════════════════════════════════════════════════════════════════
+def create_tables(conn=connection):
+    with conn.cursor() as cursor:
+        for table in RTREE_TABLES.values():
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} '
+                f'USING rtree(id, min_lng, max_lng, min_lat, max_lat)'
+            )
+
+
+def drop_tables(conn=connection):
+    with conn.cursor() as cursor:
+        for table in RTREE_TABLES.values():
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+
+def rebuild(get_model, conn=connection, only=None):
+    """
+    Refill every R*Tree table from its source table.
+
+    Args:
+        get_model: (app_label, model_name) → model class — `apps.get_model`
+                   in a migration, django.apps.apps.get_model elsewhere.
+        only:      optional model names ('Cafe', ...) to refill; default all
+
+    Returns:
+        {model name: rows indexed}
+    """
+    counts = {}
+    with conn.cursor() as cursor:
+        for model_name, table in RTREE_TABLES.items():
+            if only is not None and model_name not in only:
+                continue
+            fields, box = BOX_SOURCES[model_name]
+            rows = get_model('api', model_name).objects.values_list('pk', *fields).iterator()
+            entries = [(pk, *b) for pk, *values in rows if (b := box(*values)) is not None]
+
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.executemany(f'INSERT INTO {table} VALUES (%s, %s, %s, %s, %s)', entries)
+            counts[model_name] = len(entries)
+    return counts
+
+
+def rtree_ready():
+    """
+    True on SQLite once the R*Tree tables exist. A positive answer is kept
+    for the process; a negative one is re-checked at most every
+    SPATIAL_INDEX_CHECK_INTERVAL seconds (never when 0), so running
+    migrate is picked up without a restart.
+    """
+    global _ready, _checked
+    if _ready or connection.vendor != 'sqlite':
+        return _ready
+    now, interval = time.monotonic(), settings.SPATIAL_INDEX_CHECK_INTERVAL
+    if _checked is not None and (interval <= 0 or now - _checked < interval):
+        return False
+    _ready = set(RTREE_TABLES.values()) <= set(connection.introspection.table_names())
+    if not _ready:
+        if _checked is None:
+            logger.warning('R*Tree tables missing — run migrate; using the in-memory indexes instead.')
+        _checked = now
+    return _ready
+
+
+def sync(instance, deleted=False):
+    """Update the R*Tree entry of one saved / deleted Cafe, Amenity or Road."""
+    model_name = type(instance).__name__
+    if model_name not in RTREE_TABLES or not rtree_ready():
+        return
+
+    table = RTREE_TABLES[model_name]
+    fields, box = BOX_SOURCES[model_name]
+    entry = None if deleted else box(*(getattr(instance, field) for field in fields))
+
+    with connection.cursor() as cursor:
+        if entry is None:
+            cursor.execute(f'DELETE FROM {table} WHERE id = %s', [instance.pk])
+        else:
+            cursor.execute(f'INSERT OR REPLACE INTO {table} VALUES (%s, %s, %s, %s, %s)', [instance.pk, *entry])
+
+
+def in_box(queryset, lat, lng, radius_m):
+    """Restrict a Cafe / Amenity / Road queryset to rows whose R*Tree box overlaps the circle's box."""
+    table = RTREE_TABLES[queryset.model.__name__]
+    min_lng, min_lat, max_lng, max_lat = degree_box(lat, lng, radius_m)
+    return queryset.extra(
+        where=[
+            f'"{queryset.model._meta.db_table}"."id" IN (SELECT id FROM {table} '
+            f'WHERE max_lng >= %s AND min_lng <= %s AND max_lat >= %s AND min_lat <= %s)'
+        ],
+        params=[min_lng, max_lng, min_lat, max_lat],
+    )
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Radius queries (same results as the in-memory indexes)
+# ═══════════════════════════════════════════════════════════════════
+def nearby_cafes(lat, lng, radius_m):
+    from .models import Cafe
+
+    return objects_within_radius(in_box(Cafe.objects.filter(is_open=True), lat, lng, radius_m), lat, lng, radius_m)
+
+
+def amenities_within(lat, lng, radius_m, amenity_type=''):
+    from .models import Amenity
+    from .taxonomy import category_from_slug
+
+    amenities = Amenity.objects.all()
+    if amenity_type:
+        category = category_from_slug(amenity_type)
+        if category is not None:
+            amenities = amenities.filter(category=category)
+        else:
+            amenities = amenities.filter(amenity_type__icontains=amenity_type)
+    return objects_within_radius(in_box(amenities, lat, lng, radius_m), lat, lng, radius_m)
+
+
+def amenity_report(lat, lng, radius_m, categories, top_n=20):
+    from .amenities import report_from_hits
+    from .models import Amenity
+
+    rows = in_box(Amenity.objects.filter(category__in=list(categories)), lat, lng, radius_m)
+    rows = np.array(list(rows.values_list('id', 'latitude', 'longitude', 'category')), dtype=np.float64).reshape(-1, 4)
+
+    indices, distances = within_radius(lat, lng, rows[:, 1], rows[:, 2], radius_m)
+    return report_from_hits(categories, rows[indices, 0].astype(np.int64), distances, rows[indices, 3].astype(np.intp), top_n)
+
+
+def road_length_within(lat, lng, radius_m):
+    from .models import Road
+
+    rows = in_box(Road.objects.all(), lat, lng, radius_m).values_list('id', 'road_type', 'geometry')
+    return road_index_from_rows(rows).length_within(lat, lng, radius_m)
+
+
+def location_distances(lat, lng, radius_m, categories):
+    """
+    Ascending distances (m) of everything ml_engine.features.location_features()
+    counts: open cafés, amenities of the given categories (with their
+    categories) and roads (closest point of each).
+
+    Returns:
+        (cafe distances, amenity distances, amenity categories, road distances)
+    """
+    from .models import Amenity, Cafe, Road
+
+    cafes = in_box(Cafe.objects.filter(is_open=True), lat, lng, radius_m).values_list('latitude', 'longitude')
+    cafes = np.array(list(cafes), dtype=np.float64).reshape(-1, 2)
+    _, cafe_d = within_radius(lat, lng, cafes[:, 0], cafes[:, 1], radius_m)
+
+    amenities = in_box(Amenity.objects.filter(category__in=list(categories)), lat, lng, radius_m)
+    amenities = np.array(list(amenities.values_list('latitude', 'longitude', 'category')), dtype=np.float64).reshape(-1, 3)
+    indices, amenity_d = within_radius(lat, lng, amenities[:, 0], amenities[:, 1], radius_m)
+
+    roads = in_box(Road.objects.all(), lat, lng, radius_m).values_list('id', 'road_type', 'geometry')
+    _, road_d = road_index_from_rows(roads).distances_within(lat, lng, radius_m)
+    return cafe_d, amenity_d, amenities[indices, 2].astype(np.intp), road_d
+
+
+def locate_ward(lat, lng):
+    # 32 ward polygons: the in-memory locator (raster + exact test) is already O(1)
+    from .wards import get_ward_locator
+
+    return get_ward_locator().locate(lat, lng)
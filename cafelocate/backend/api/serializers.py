@@ -1,5 +1,10 @@
 from rest_framework import serializers
 from .models import Cafe, Ward, UserProfile, Amenity
+from .taxonomy import AmenityCategory
+
+# Area the analysis endpoints accept — also the extent of the precomputed rasters
+KATHMANDU_LAT_RANGE = (27.6, 27.8)
+KATHMANDU_LNG_RANGE = (85.2, 85.5)
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -48,17 +53,24 @@ class CafeSerializer(serializers.ModelSerializer):
 # ═══════════════════════════════════════════════════════════════════
 class AmenitySerializer(serializers.ModelSerializer):
 
+    # Canonical category name ('school', 'bus_station', ...) instead of the integer code
+    category = serializers.SerializerMethodField()
+
     class Meta:
         model  = Amenity
         fields = [
             'id',
             'osm_id',
             'amenity_type',
+            'category',
             'name',
             'latitude',
             'longitude',
         ]
 
+    def get_category(self, obj):
+        return AmenityCategory(obj.category).slug
+
 
 # ═══════════════════════════════════════════════════════════════════
 # SuitabilityRequestSerializer
@@ -68,11 +80,11 @@ class SuitabilityRequestSerializer(serializers.Serializer):
     # Frontend sends: { "lat": 27.7172, "lng": 85.3240, "cafe_type": "bakery", "radius": 500 }
 
     lat       = serializers.FloatField(
-        min_value=27.6, max_value=27.8,  # Kathmandu latitude range
+        min_value=KATHMANDU_LAT_RANGE[0], max_value=KATHMANDU_LAT_RANGE[1],  # Kathmandu latitude range
         error_messages={'min_value': 'Location must be within Kathmandu.'}
     )
     lng       = serializers.FloatField(
-        min_value=85.2, max_value=85.5,  # Kathmandu longitude range
+        min_value=KATHMANDU_LNG_RANGE[0], max_value=KATHMANDU_LNG_RANGE[1],  # Kathmandu longitude range
     )
     cafe_type = serializers.ChoiceField(
         choices=['coffee_shop', 'bakery', 'dessert_shop', 'restaurant']
@@ -83,6 +95,45 @@ class SuitabilityRequestSerializer(serializers.Serializer):
     )
 
 
+# ═══════════════════════════════════════════════════════════════════
+# BatchSuitabilityRequestSerializer
+# Many candidate sites in one request: { "sites": [ {lat, lng, cafe_type, radius}, ... ] }
+# ═══════════════════════════════════════════════════════════════════
+MAX_BATCH_SITES = 1000
+
+
+class BatchSuitabilityRequestSerializer(serializers.Serializer):
+
+    sites = SuitabilityRequestSerializer(many=True, allow_empty=False, max_length=MAX_BATCH_SITES)
+
+
+# ═══════════════════════════════════════════════════════════════════
+# HeatmapRequestSerializer
+# Viewport query for the precomputed suitability grid:
+# ?south=27.68&west=85.28&north=27.74&east=85.36&layer=score&cafe_type=bakery
+# ═══════════════════════════════════════════════════════════════════
+MAX_HEATMAP_CELLS = 20000
+
+
+class HeatmapRequestSerializer(serializers.Serializer):
+
+    south     = serializers.FloatField(default=KATHMANDU_LAT_RANGE[0])
+    west      = serializers.FloatField(default=KATHMANDU_LNG_RANGE[0])
+    north     = serializers.FloatField(default=KATHMANDU_LAT_RANGE[1])
+    east      = serializers.FloatField(default=KATHMANDU_LNG_RANGE[1])
+    cafe_type = serializers.ChoiceField(
+        choices=['coffee_shop', 'bakery', 'dessert_shop', 'restaurant'],
+        required=False
+    )
+    layer     = serializers.ChoiceField(choices=['score', 'level', 'confidence'], default='score')  # api/heatmap.py LAYERS
+    max_cells = serializers.IntegerField(min_value=100, max_value=MAX_HEATMAP_CELLS, default=5000)
+
+    def validate(self, data):
+        if data['south'] >= data['north'] or data['west'] >= data['east']:
+            raise serializers.ValidationError('Viewport must have south < north and west < east.')
+        return data
+
+
 # ═══════════════════════════════════════════════════════════════════
 # UserProfileSerializer
 # ═══════════════════════════════════════════════════════════════════
@@ -0,0 +1,49 @@
+"""
+Signal handlers that keep the in-memory spatial indexes in sync with the database.
+
+Every change also bumps the table's DataVersion row, which tells the other
+worker processes to rebuild their copies (LazyIndex stamp check).
+
+Bulk operations (bulk_create, bulk_update, QuerySet.update) do NOT send these
+signals — code that uses them must call bulk.refresh_spatial_indexes() (or the
+matching invalidate_*() and `manage.py rebuild_rtree`) itself.
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .amenities import invalidate_amenity_index
+from .models import Amenity, Cafe, DataVersion, Road, Ward
+from .population import invalidate_population_surface
+from .roads import invalidate_road_index
+from .rtree import sync as sync_rtree
+from .spatial_index import invalidate_cafe_index
+from .wards import invalidate_ward_locator
+
+
+@receiver([post_save, post_delete], sender=Cafe)
+def cafe_changed(sender, instance, signal, **kwargs):
+    DataVersion.bump('Cafe')
+    invalidate_cafe_index()
+    sync_rtree(instance, deleted=signal is post_delete)
+
+
+@receiver([post_save, post_delete], sender=Amenity)
+def amenity_changed(sender, instance, signal, **kwargs):
+    DataVersion.bump('Amenity')
+    invalidate_amenity_index()
+    sync_rtree(instance, deleted=signal is post_delete)
+
+
+@receiver([post_save, post_delete], sender=Road)
+def road_changed(sender, instance, signal, **kwargs):
+    DataVersion.bump('Road')
+    invalidate_road_index()
+    sync_rtree(instance, deleted=signal is post_delete)
+
+
+@receiver([post_save, post_delete], sender=Ward)
+def ward_changed(sender, **kwargs):
+    DataVersion.bump('Ward')
+    invalidate_ward_locator()
+    invalidate_population_surface()
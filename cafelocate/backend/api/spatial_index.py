@@ -0,0 +1,303 @@
+"""
+In-memory spatial indexes used by the API views.
+
+Instead of loading every Cafe row and computing haversine distances in a
+Python loop on each request, the coordinates are loaded ONCE into a
+BallTree (haversine metric, radian coordinates). Radius queries then cost
+O(log n + k) and come back already sorted by distance.
+
+The index is process-wide and rebuilt lazily after the underlying table
+changes (see api/signals.py, which calls invalidate_cafe_index(), and
+LazyIndex's stamp check for changes made by other processes).
+"""
+
+import copy
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError
+from sklearn.neighbors import BallTree
+
+from .distance import EARTH_RADIUS_M, within_radius
+
+logger = logging.getLogger(__name__)
+
+
+def point_coordinates(location, latitude, longitude):
+    """
+    Return (lat, lng) for a row that stores a GeoJSON point in `location`
+    and plain latitude/longitude columns as a fallback.
+    Returns (None, None) when neither is usable.
+    """
+    if location and isinstance(location, dict):
+        coords = location.get('coordinates', [None, None])
+        if len(coords) >= 2 and coords[0] is not None and coords[1] is not None:
+            return coords[1], coords[0]
+    if latitude and longitude:
+        return latitude, longitude
+    return None, None
+
+
+# ═══════════════════════════════════════════════════════════════════
+# PointIndex
+# BallTree over (lat, lng) points + the primary keys they belong to
+# ═══════════════════════════════════════════════════════════════════
+class PointIndex:
+
+    def __init__(self, ids, lats, lngs):
+        self.ids  = np.asarray(ids, dtype=np.int64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+
+        # BallTree's haversine metric expects [lat, lng] in radians
+        self._tree = None
+        if len(self.ids):
+            self._tree = BallTree(np.radians(np.column_stack([self.lats, self.lngs])), metric='haversine')
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query_radius(self, lat, lng, radius_m):
+        """
+        Find all points within radius_m metres of (lat, lng).
+
+        Returns:
+            (positions, distances_m) — positions into this index, sorted by distance
+        """
+        if self._tree is None:
+            return np.empty(0, dtype=np.intp), np.empty(0)
+
+        query = np.radians([[lat, lng]])
+        positions, distances = self._tree.query_radius(
+            query, r=radius_m / EARTH_RADIUS_M, return_distance=True, sort_results=True
+        )
+        return positions[0], distances[0] * EARTH_RADIUS_M
+
+    def query_radius_many(self, lats, lngs, radii_m):
+        """
+        query_radius() for many points (each with its own radius) in one tree call.
+
+        Returns:
+            list of (positions, distances_m) per point, each sorted by distance
+        """
+        lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+        if self._tree is None:
+            return [(np.empty(0, dtype=np.intp), np.empty(0)) for _ in range(len(lats))]
+
+        query = np.radians(np.column_stack([lats, np.atleast_1d(lngs)]))
+        radii = np.broadcast_to(np.asarray(radii_m, dtype=np.float64), lats.shape) / EARTH_RADIUS_M
+        positions, distances = self._tree.query_radius(query, r=radii, return_distance=True, sort_results=True)
+        return [(p, d * EARTH_RADIUS_M) for p, d in zip(positions, distances)]
+
+
+# ═══════════════════════════════════════════════════════════════════
+# LazyIndex
+# Builds an index on first use and keeps it until invalidate() is called.
+# A builder may return None (nothing to build yet); it is retried next time.
+#
+# invalidate() only reaches the process it runs in. With a `stamp`
+# callable (table_stamp()), the index also remembers the stamp it was
+# built from and, at most every SPATIAL_INDEX_CHECK_INTERVAL seconds,
+# compares it with the database: a change made by another worker or a
+# loader script triggers a rebuild.
+# ═══════════════════════════════════════════════════════════════════
+class LazyIndex:
+
+    def __init__(self, name, builder, stamp=None):
+        self.name     = name
+        self._builder = builder
+        self._stamp   = stamp
+        self._index   = None
+        self._built_from = None
+        self._checked    = 0.0
+        self._lock    = threading.Lock()
+
+    def get(self):
+        index = self._index
+        if index is not None and self._is_stale():
+            logger.info(f'{self.name} data changed in another process — rebuilding the spatial index.')
+            self.invalidate()
+            index = None
+        if index is None:
+            with self._lock:
+                # Another thread may have built it while we were waiting
+                if self._index is None:
+                    # Stamp read BEFORE building: a change made during the
+                    # build shows up as a new stamp on the next check
+                    stamp = self._read_stamp()
+                    self._index = self._builder()
+                    self._built_from = stamp
+                    self._checked = time.monotonic()
+                    if self._index is not None:
+                        logger.info(f'Built {self.name} spatial index ({len(self._index)} entries).')
+                index = self._index
+        return index
+
+    def invalidate(self):
+        self._index = None
+
+    def _read_stamp(self):
+        if self._stamp is None:
+            return None
+        try:
+            return self._stamp()
+        except DatabaseError as e:
+            logger.warning(f'Could not check whether the {self.name} data changed: {e}')
+            return self._built_from
+
+    def _is_stale(self):
+        interval = settings.SPATIAL_INDEX_CHECK_INTERVAL
+        if self._stamp is None or interval <= 0:
+            return False
+        now = time.monotonic()
+        if now - self._checked < interval:
+            return False
+        self._checked = now
+        return self._read_stamp() != self._built_from
+
+
+def table_stamp(model_name):
+    """
+    Stamp callable for LazyIndex: (DataVersion counter, row count, max pk)
+    of one api table. The counter catches edits of existing rows (bumped
+    by api/signals.py and bulk.refresh_spatial_indexes()); count and max
+    pk catch inserts and deletes made without either.
+    """
+    def stamp():
+        from django.apps import apps
+        from django.db.models import Count, Max
+
+        from .models import DataVersion
+
+        rows = apps.get_model('api', model_name).objects.aggregate(count=Count('pk'), last=Max('pk'))
+        return DataVersion.current(model_name), rows['count'], rows['last']
+    return stamp
+
+
+def query_backend():
+    """
+    Module that answers radius queries instead of the in-memory indexes, or
+    None for the in-memory indexes themselves:
+
+        geodb.queries  — spatial database mode (settings.SPATIAL_DB)
+        api.rtree      — SQLite R*Tree tables (settings.SPATIAL_INDEX = 'rtree')
+
+    Both expose the same functions (nearby_cafes, amenities_within, ...).
+    """
+    if settings.SPATIAL_DB:
+        from geodb import queries
+        return queries
+    if settings.SPATIAL_INDEX == 'rtree':
+        from . import rtree
+        if rtree.rtree_ready():
+            return rtree
+    return None
+
+
+def _build_cafe_index():
+    from .models import Cafe
+
+    ids, lats, lngs = [], [], []
+    rows = Cafe.objects.filter(is_open=True).values_list('id', 'location', 'latitude', 'longitude')
+    for cafe_id, location, latitude, longitude in rows.iterator():
+        lat, lng = point_coordinates(location, latitude, longitude)
+        if lat is not None:
+            ids.append(cafe_id)
+            lats.append(lat)
+            lngs.append(lng)
+    return PointIndex(ids, lats, lngs)
+
+
+_cafe_index = LazyIndex('cafe', _build_cafe_index, stamp=table_stamp('Cafe'))
+
+
+def get_cafe_index():
+    return _cafe_index.get()
+
+
+def invalidate_cafe_index():
+    _cafe_index.invalidate()
+
+
+def nearby_cafes(lat, lng, radius_m):
+    """
+    Open cafés within radius_m metres of (lat, lng), nearest first.
+    Each returned Cafe gets a `distance` attribute in metres.
+    """
+    backend = query_backend()
+    if backend is not None:
+        return backend.nearby_cafes(lat, lng, radius_m)
+
+    from .models import Cafe
+
+    index = get_cafe_index()
+    positions, distances = index.query_radius(lat, lng, radius_m)
+    if not len(positions):
+        return []
+
+    cafe_ids = index.ids[positions].tolist()
+    by_id = Cafe.objects.in_bulk(cafe_ids)
+
+    cafes = []
+    for cafe_id, distance in zip(cafe_ids, distances):
+        cafe = by_id.get(cafe_id)
+        if cafe is not None:  # deleted since the index was built
+            cafe.distance = float(distance)
+            cafes.append(cafe)
+    return cafes
+
+
+def nearby_cafes_many(lats, lngs, radii_m):
+    """
+    nearby_cafes() for many points: one tree query and one database query for
+    all of them. Returns a list (per point) of Cafe lists, nearest first.
+    """
+    from .models import Cafe
+
+    backend = query_backend()
+    if backend is not None:
+        return [backend.nearby_cafes(lat, lng, r) for lat, lng, r in zip(lats, lngs, radii_m)]
+
+    index = get_cafe_index()
+    hits = index.query_radius_many(lats, lngs, radii_m)
+    all_positions = np.concatenate([positions for positions, _ in hits] + [np.empty(0, dtype=np.intp)])
+    by_id = Cafe.objects.in_bulk(np.unique(index.ids[all_positions]).tolist())
+
+    results = []
+    for positions, distances in hits:
+        cafes = []
+        for cafe_id, distance in zip(index.ids[positions].tolist(), distances):
+            if cafe_id in by_id:
+                # Own copy per point: the same café has a different distance from each
+                cafe = copy.copy(by_id[cafe_id])
+                cafe.distance = float(distance)
+                cafes.append(cafe)
+        results.append(cafes)
+    return results
+
+
+def objects_within_radius(queryset, lat, lng, radius_m):
+    """
+    Objects of a queryset with latitude/longitude columns that lie within
+    radius_m metres of (lat, lng), nearest first, each with a `distance`.
+
+    Only (id, latitude, longitude) is loaded for the distance check; full
+    rows are fetched afterwards for the hits alone.
+    """
+    rows = np.array(list(queryset.values_list('id', 'latitude', 'longitude')), dtype=np.float64)
+    if not len(rows):
+        return []
+
+    indices, distances = within_radius(lat, lng, rows[:, 1], rows[:, 2], radius_m)
+    ids = rows[indices, 0].astype(np.int64).tolist()
+    by_id = queryset.in_bulk(ids)
+
+    objects = []
+    for obj_id, distance in zip(ids, distances):
+        obj = by_id[obj_id]
+        obj.distance = float(distance)
+        objects.append(obj)
+    return objects
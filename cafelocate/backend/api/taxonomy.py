@@ -0,0 +1,100 @@
+"""
+Canonical amenity categories.
+
+OpenStreetMap exports (osm_amenities_kathmandu.csv, combined_amenities_clean.csv)
+use many spellings for the same kind of place: "bus_stop" vs "bus_station",
+"doctors;clinic", "Educational Institution", ... Every Amenity is given one
+integer category at import time, so type filters are indexed equality
+lookups (and array look-ups in the amenity index) instead of
+`amenity_type__icontains` substring scans.
+"""
+
+import re
+
+from django.db import models
+
+
+class AmenityCategory(models.IntegerChoices):
+    OTHER            = 0,  'Other'
+    SCHOOL           = 1,  'School'
+    COLLEGE          = 2,  'College / University'
+    HOSPITAL         = 3,  'Hospital'
+    HEALTH_POST      = 4,  'Health post / Clinic'
+    PHARMACY         = 5,  'Pharmacy'
+    BUS_STATION      = 6,  'Bus station / stop'
+    CAFE             = 7,  'Café'
+    RESTAURANT       = 8,  'Restaurant / Fast food'
+    BANK             = 9,  'Bank / ATM'
+    PLACE_OF_WORSHIP = 10, 'Place of worship'
+
+    @property
+    def slug(self):
+        """Canonical lower-case name used in the API, e.g. 'bus_station'."""
+        return self.name.lower()
+
+
+# Normalised OSM amenity values → category (anything not listed is OTHER)
+RAW_TYPE_CATEGORIES = {
+    'school':                  AmenityCategory.SCHOOL,
+    'prep_school':             AmenityCategory.SCHOOL,
+    'kindergarten':            AmenityCategory.SCHOOL,
+    'edu':                     AmenityCategory.SCHOOL,
+    'education':               AmenityCategory.SCHOOL,
+    'educational_institution': AmenityCategory.SCHOOL,
+
+    'college':                 AmenityCategory.COLLEGE,
+    'university':              AmenityCategory.COLLEGE,
+
+    'hospital':                AmenityCategory.HOSPITAL,
+
+    'health_post':             AmenityCategory.HEALTH_POST,
+    'clinic':                  AmenityCategory.HEALTH_POST,
+    'doctors':                 AmenityCategory.HEALTH_POST,
+
+    'pharmacy':                AmenityCategory.PHARMACY,
+    'chemist':                 AmenityCategory.PHARMACY,
+
+    'bus_station':             AmenityCategory.BUS_STATION,
+    'bus_stop':                AmenityCategory.BUS_STATION,
+
+    'cafe':                    AmenityCategory.CAFE,
+    'coffee_shop':             AmenityCategory.CAFE,
+
+    'restaurant':              AmenityCategory.RESTAURANT,
+    'fast_food':               AmenityCategory.RESTAURANT,
+    'food_court':              AmenityCategory.RESTAURANT,
+
+    'bank':                    AmenityCategory.BANK,
+    'atm':                     AmenityCategory.BANK,
+
+    'place_of_worship':        AmenityCategory.PLACE_OF_WORSHIP,
+    'temple':                  AmenityCategory.PLACE_OF_WORSHIP,
+    'monastery':               AmenityCategory.PLACE_OF_WORSHIP,
+}
+
+_SEPARATORS = re.compile(r'[\s\-]+')
+
+
+def normalize_type(raw_type):
+    """'Educational Institution' → 'educational_institution'."""
+    return _SEPARATORS.sub('_', (raw_type or '').strip().lower())
+
+
+def categorize(raw_type):
+    """
+    Category of a raw OSM amenity value. Multi-valued tags ("doctors;clinic")
+    take the first part that has a category.
+    """
+    for part in normalize_type(raw_type).split(';'):
+        category = RAW_TYPE_CATEGORIES.get(part.strip('_'))
+        if category is not None:
+            return category
+    return AmenityCategory.OTHER
+
+
+def category_from_slug(slug):
+    """AmenityCategory for a canonical name like 'bus_station', or None."""
+    try:
+        return AmenityCategory[normalize_type(slug).upper()]
+    except KeyError:
+        return None
@@ -1,3 +1,49 @@
-from django.test import TestCase
+import tempfile
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from .osm import COORD_SCALE, NodeStore
+
+
+class NodeStoreBuildTests(SimpleTestCase):
+    """NodeStore.build() — sorted runs merged into one store — against a plain dict."""
+
+    def random_nodes(self, rng, n, id_range):
+        ids = rng.integers(1, id_range, n)   # repeats within and across runs
+        lat = rng.integers(26 * COORD_SCALE, 31 * COORD_SCALE, n)
+        lon = rng.integers(80 * COORD_SCALE, 89 * COORD_SCALE, n)
+        return [(int(i), int(a) / COORD_SCALE, int(o) / COORD_SCALE) for i, a, o in zip(ids, lat, lon)]
+
+    def assert_matches_reference(self, nodes, chunk_nodes):
+        reference = {}
+        for node_id, lat, lon in nodes:
+            reference[node_id] = (round(lat * COORD_SCALE), round(lon * COORD_SCALE))   # last one wins
+
+        with tempfile.TemporaryDirectory() as path:
+            store = NodeStore.build(iter(nodes), path, chunk_nodes=chunk_nodes)
+            ids = np.array(sorted(reference))
+            expected = np.array([reference[i] for i in ids.tolist()])
+
+            np.testing.assert_array_equal(store.ids, ids)
+            np.testing.assert_array_equal(store.coords, expected)
+            # Fixed-point values come back as the exact degrees that went in
+            np.testing.assert_array_equal(store.lookup(ids), expected / COORD_SCALE)
+
+            missing = store.lookup([0, ids.max() + 1])
+            self.assertTrue(np.isnan(missing).all())
+
+    def test_many_small_runs(self):
+        rng = np.random.default_rng(1)
+        self.assert_matches_reference(self.random_nodes(rng, 3000, 1000), chunk_nodes=7)
+
+    def test_runs_longer_than_a_merge_block(self):
+        # Runs of more than 4096 nodes are merged over several bounded steps
+        rng = np.random.default_rng(2)
+        self.assert_matches_reference(self.random_nodes(rng, 60000, 40000), chunk_nodes=9000)
+
+    def test_empty(self):
+        with tempfile.TemporaryDirectory() as path:
+            store = NodeStore.build(iter([]), path, chunk_nodes=7)
+            self.assertEqual(len(store), 0)
+            self.assertTrue(np.isnan(store.lookup([1, 2])).all())
@@ -0,0 +1,332 @@
+"""
+XYZ raster tiles (256×256 PNG, Web Mercator) rendered from the precomputed grids.
+
+    /api/tiles/suitability/{z}/{x}/{y}.png   ← suitability score grid (api/heatmap.py)
+    /api/tiles/population/{z}/{x}/{y}.png    ← dasymetric population surface (api/population.py)
+    /api/tiles/competitors/{z}/{x}/{y}.png   ← open cafés per km² (from the cafe index)
+
+Every layer is first turned into a uint8 "code" raster on its MetricGrid
+(0-254 = colour ramp position, 255 = transparent). A tile is then: the
+grid cell under each pixel centre (two array ops), one lookup into the
+colour table, and a zlib-compressed PNG — no image library needed.
+
+Tiles are cached in memory (LRU, bounded in bytes) and on disk
+(TILE_CACHE_DIR/<layer>/<version>/<z>/<x>/<y>.png). The version is a hash
+of the dataset the layer was rendered from (and the model version for the
+suitability layer), so a rebuilt grid gets new cache entries and ETags
+instead of stale tiles.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .grid import MetricGrid, project, unproject
+from .population import summed_area_table
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE   = 256
+MAX_ZOOM    = 20
+TRANSPARENT = 255
+
+COMPETITOR_CELL_M   = 100   # resolution of the competitor density raster
+COMPETITOR_RADIUS_M = 500   # cafés counted within ± this many metres of a cell
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Colour tables and PNG encoding
+# ═══════════════════════════════════════════════════════════════════
+def colour_ramp(stops, alpha=170):
+    """
+    (256, 4) uint8 RGBA table: codes 0-254 interpolate between the RGB
+    stops, code 255 is fully transparent.
+    """
+    stops = np.asarray(stops, dtype=np.float64)
+    positions = np.linspace(0, 254, len(stops))
+    codes = np.arange(255)
+    table = np.zeros((256, 4), dtype=np.uint8)
+    for channel in range(3):
+        table[:255, channel] = np.round(np.interp(codes, positions, stops[:, channel]))
+    table[:255, 3] = alpha
+    return table
+
+
+# red → yellow → green
+DIVERGING  = colour_ramp([(215, 48, 39), (252, 141, 89), (254, 224, 139), (145, 207, 96), (26, 152, 80)])
+# pale yellow → dark red
+SEQUENTIAL = colour_ramp([(255, 255, 178), (254, 204, 92), (253, 141, 60), (240, 59, 32), (189, 0, 38)])
+
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def encode_png(rgba):
+    """PNG bytes of an (h, w, 4) uint8 RGBA array."""
+    height, width, _ = rgba.shape
+    # Every scanline starts with filter type 0 (None)
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)   # 8-bit RGBA
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + _png_chunk(b'IHDR', header)
+        + _png_chunk(b'IDAT', zlib.compress(raw.tobytes(), 6))
+        + _png_chunk(b'IEND', b'')
+    )
+
+
+EMPTY_TILE = encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+
+def tile_pixel_centres(z, x, y):
+    """(lats, lngs) of the 256 pixel-row and 256 pixel-column centres of a Web Mercator tile."""
+    n = 2 ** z
+    offsets = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    lngs = (x + offsets) / n * 360.0 - 180.0
+    lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + offsets) / n))))
+    return lats, lngs
+
+
+def scale_codes(values, vmax):
+    """Map non-negative values to codes 0-254 (square-root scale up to vmax); zeros are transparent."""
+    values = np.asarray(values, dtype=np.float64)
+    codes = np.full(values.shape, TRANSPARENT, dtype=np.uint8)
+    if vmax > 0:
+        positive = values > 0
+        codes[positive] = np.round(254 * np.sqrt(np.minimum(values[positive] / vmax, 1.0)))
+    return codes
+
+
+# ═══════════════════════════════════════════════════════════════════
+# TileLayer
+# ═══════════════════════════════════════════════════════════════════
+class TileLayer:
+
+    def __init__(self, name, grid, codes, colours, version, legend=None):
+        self.name    = name
+        self.grid    = grid
+        self.codes   = codes     # (n_rows, n_cols) uint8 on `grid`
+        self.colours = colours   # (256, 4) uint8 RGBA per code
+        self.version = version   # changes whenever the rendered data changes
+        self.legend  = legend or {}
+
+        # Lat/lng box of the grid, to skip tiles that cannot touch it
+        x_max = grid.x_min + grid.n_cols * grid.resolution_m
+        y_max = grid.y_min + grid.n_rows * grid.resolution_m
+        (self.south, self.north), (self.west, self.east) = unproject(np.array([grid.x_min, x_max]), np.array([grid.y_min, y_max]))
+
+    def render(self, z, x, y):
+        """PNG bytes of tile z/x/y (EMPTY_TILE when it does not touch the grid)."""
+        lats, lngs = tile_pixel_centres(z, x, y)
+        if lats[0] < self.south or lats[-1] > self.north or lngs[-1] < self.west or lngs[0] > self.east:
+            return EMPTY_TILE
+
+        # Pixel rows share a latitude and pixel columns a longitude, and on the
+        # city plane y depends only on latitude, x only on longitude
+        x_px, y_px = project(lats, lngs)
+        rows, cols, _ = self.grid.cells_xy(x_px, y_px)
+        row_ok = (rows >= 0) & (rows < self.grid.n_rows)
+        col_ok = (cols >= 0) & (cols < self.grid.n_cols)
+
+        codes = np.full((TILE_SIZE, TILE_SIZE), TRANSPARENT, dtype=np.uint8)
+        codes[np.ix_(row_ok, col_ok)] = self.codes[np.ix_(rows[row_ok], cols[col_ok])]
+        if (codes == TRANSPARENT).all():
+            return EMPTY_TILE
+        return encode_png(self.colours[codes])
+
+
+# ── Layer builders: source object → TileLayer ─────────────────────────────────
+def _digest(*parts):
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else repr(part).encode())
+    return digest.hexdigest()[:16]
+
+
+def _suitability_layer(suitability_grid):
+    meta = suitability_grid.meta
+    # Scores 0-100 are stretched over the ramp; NODATA (255) stays transparent
+    score = np.asarray(suitability_grid.layer('score'))
+    codes = np.where(score <= 100, np.round(score * 2.54), TRANSPARENT).astype(np.uint8)
+    version = _digest(meta.get('built_at'), meta.get('model_version'), suitability_grid.grid.to_meta())
+    return TileLayer('suitability', suitability_grid.grid, codes, DIVERGING, version,
+                     legend={'min': 0, 'max': 100, 'unit': 'score', 'model_version': meta.get('model_version')})
+
+
+def _population_layer(surface):
+    grid = surface.grid
+    sat = np.asarray(surface.sat)
+    people = sat[1:, 1:] - sat[:-1, 1:] - sat[1:, :-1] + sat[:-1, :-1]
+    density = people / (grid.resolution_m ** 2 / 1e6)   # people per km²
+    vmax = float(np.percentile(density[density > 0], 99)) if (density > 0).any() else 0.0
+    version = _digest(surface.fingerprint, grid.to_meta(), surface.total)
+    return TileLayer('population', grid, scale_codes(density, vmax), SEQUENTIAL, version,
+                     legend={'min': 0, 'max': round(vmax), 'unit': 'people/km²'})
+
+
+def _competitor_layer(cafe_index):
+    grid = MetricGrid.for_bounds(COMPETITOR_CELL_M)
+    counts = np.zeros(grid.shape)
+    rows, cols, inside = grid.cells(cafe_index.lats, cafe_index.lngs)
+    np.add.at(counts, (rows[inside], cols[inside]), 1.0)
+
+    # Cafés in the (2k+1)×(2k+1) cell square around each cell, per km²
+    k = COMPETITOR_RADIUS_M // COMPETITOR_CELL_M
+    sat = summed_area_table(np.pad(counts, k))
+    size = 2 * k + 1
+    window = sat[size:, size:] - sat[:-size, size:] - sat[size:, :-size] + sat[:-size, :-size]
+    density = window / ((size * COMPETITOR_CELL_M) ** 2 / 1e6)
+
+    vmax = float(density.max())
+    version = _digest(cafe_index.ids.tobytes(), cafe_index.lats.tobytes(), cafe_index.lngs.tobytes())
+    return TileLayer('competitors', grid, scale_codes(density, vmax), SEQUENTIAL, version,
+                     legend={'min': 0, 'max': round(vmax, 1), 'unit': 'cafés/km²'})
+
+
+def _suitability_source():
+    from .heatmap import get_suitability_grid
+    return get_suitability_grid()
+
+
+def _population_source():
+    from .population import get_population_surface
+    return get_population_surface()
+
+
+def _competitor_source():
+    from .spatial_index import get_cafe_index
+    return get_cafe_index()
+
+
+# layer name → (source getter, builder); a layer is rebuilt whenever its getter returns a new object
+LAYERS = {
+    'suitability': (_suitability_source, _suitability_layer),
+    'population':  (_population_source,  _population_layer),
+    'competitors': (_competitor_source,  _competitor_layer),
+}
+
+_layers      = {}   # name → (source, TileLayer)
+_layers_lock = threading.Lock()
+
+
+def get_tile_layer(name):
+    """Current TileLayer for a layer name, or None when its dataset has not been built."""
+    getter, builder = LAYERS[name]
+    source = getter()
+    if source is None:
+        return None
+
+    cached = _layers.get(name)
+    if cached is not None and cached[0] is source:
+        return cached[1]
+
+    with _layers_lock:
+        cached = _layers.get(name)
+        if cached is None or cached[0] is not source:
+            layer = builder(source)
+            _layers[name] = (source, layer)
+            _prune_disk_cache(name, layer.version)
+            logger.info(f'Built {name} tile layer (version {layer.version}).')
+        return _layers[name][1]
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Tile cache: memory LRU (bounded in bytes) + disk
+# ═══════════════════════════════════════════════════════════════════
+class TileCache:
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.n_bytes   = 0
+        self._tiles    = OrderedDict()
+        self._lock     = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._tiles.get(key)
+            if png is not None:
+                self._tiles.move_to_end(key)
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._tiles.pop(key, None)
+            if previous is not None:
+                self.n_bytes -= len(previous)
+            self._tiles[key] = png
+            self.n_bytes += len(png)
+            while self.n_bytes > self.max_bytes:
+                _, evicted = self._tiles.popitem(last=False)
+                self.n_bytes -= len(evicted)
+
+
+_memory_cache = TileCache(settings.TILE_MEMORY_CACHE_MB * 1024 * 1024)
+
+
+def _disk_path(name, version, z, x, y):
+    if not settings.TILE_CACHE_DIR:
+        return None
+    return settings.TILE_CACHE_DIR / name / version / str(z) / str(x) / f'{y}.png'
+
+
+def _prune_disk_cache(name, version):
+    """Delete tiles of older versions of a layer."""
+    if not settings.TILE_CACHE_DIR:
+        return
+    layer_dir = settings.TILE_CACHE_DIR / name
+    if layer_dir.is_dir():
+        for old in layer_dir.iterdir():
+            if old.name != version:
+                shutil.rmtree(old, ignore_errors=True)
+
+
+def _write_disk(path, png):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(png)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f'Could not write tile {path}: {e}')
+
+
+def valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def etag(layer, z, x, y):
+    return f'"{layer.name}-{layer.version}-{z}-{x}-{y}"'
+
+
+def get_tile(layer, z, x, y):
+    """PNG bytes of a tile: memory cache → disk cache → render (and store in both)."""
+    key = (layer.name, layer.version, z, x, y)
+    png = _memory_cache.get(key)
+    if png is not None:
+        return png
+
+    path = _disk_path(layer.name, layer.version, z, x, y)
+    if path is not None and path.is_file():
+        png = path.read_bytes()
+    else:
+        png = layer.render(z, x, y)
+        if path is not None and png is not EMPTY_TILE:
+            _write_disk(path, png)
+
+    _memory_cache.put(key, png)
+    return png
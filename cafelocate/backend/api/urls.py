@@ -18,6 +18,18 @@ urlpatterns = [
     # Main analysis: nearby + top5 + suitability score + ML prediction
     path('analyze/',      views.SuitabilityAnalysisView.as_view(), name='analyze'),
 
+    # POST /api/analyze/batch/
+    # Same analysis for many candidate sites: { "sites": [{lat, lng, cafe_type, radius}, ...] }
+    path('analyze/batch/', views.BatchSuitabilityAnalysisView.as_view(), name='analyze-batch'),
+
+    # GET /api/heatmap/?south=27.68&west=85.28&north=27.74&east=85.36&layer=score
+    # Precomputed suitability grid values inside the map viewport
+    path('heatmap/', views.HeatmapView.as_view(), name='heatmap'),
+
+    # GET /api/tiles/suitability/13/6051/3432.png
+    # PNG map tiles of the suitability, population and competitor density layers
+    path('tiles/<str:layer>/<int:z>/<int:x>/<int:y>.png', views.TileView.as_view(), name='tiles'),
+
     # GET /api/amenities/?lat=27.71&lng=85.32&radius=500&type=school
     # Returns amenities (schools, hospitals, bus stops, etc.) within radius
     path('amenities/', views.AmenitiesView.as_view(), name='amenities'),
@@ -27,7 +39,7 @@ urlpatterns = [
     path('amenities-report/', views.AmenitiesReportView.as_view(), name='amenities-report'),
 
     # GET /api/area-population/?lat=27.71&lng=85.32&radius=500
-    # Calculates exact population within the area based on ward boundaries
+    # Estimates population inside the circle (ward population × share of ward area covered)
     path('area-population/', views.AreaPopulationView.as_view(), name='area-population'),
 ]
 
@@ -36,6 +48,9 @@ urlpatterns = [
 #   /api/auth/login/      ← user login
 #   /api/cafes/nearby/    ← nearby cafes within radius
 #   /api/analyze/         ← main suitability analysis
+#   /api/analyze/batch/   ← suitability analysis for many sites at once
+#   /api/heatmap/         ← precomputed suitability grid for a viewport
+#   /api/tiles/           ← PNG map tiles (suitability, population, competitors)
 #   /api/amenities/       ← amenities by type within radius
 #   /api/amenities-report/ ← summary report of key amenities
-#   /api/area-population/ ← exact population for area
\ No newline at end of file
+#   /api/area-population/ ← area-weighted population for area
\ No newline at end of file
@@ -1,77 +1,30 @@
 from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-import jwt, math, logging, json
-
-from .models import Cafe, Ward, Road, UserProfile, Amenity
-from .serializers import CafeSerializer, SuitabilityRequestSerializer, UserProfileSerializer, AmenitySerializer
-from ml_engine.predictor import get_suitability_prediction
-
-try:
-    from shapely.wkt import loads as wkt_loads
-    from shapely.geometry import Point
-    SHAPELY_AVAILABLE = True
-except ImportError:
-    SHAPELY_AVAILABLE = False
+import jwt, math, logging
+
+from .models import UserProfile
+from .serializers import (
+    CafeSerializer, SuitabilityRequestSerializer, BatchSuitabilityRequestSerializer,
+    HeatmapRequestSerializer, UserProfileSerializer, AmenitySerializer,
+)
+from .analysis import analyze_sites
+from .amenities import amenities_within, amenity_report
+from .heatmap import get_suitability_grid
+from .tiles import LAYERS as TILE_LAYERS, etag, get_tile, get_tile_layer, valid_tile
+from .population import catchment_breakdown
+from .spatial_index import nearby_cafes
+from .taxonomy import AmenityCategory
 
 logger = logging.getLogger(__name__)
 
 
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """
-    Calculate the great circle distance in meters between two points.
-    """
-    lon1, lat1, lon2, lat2 = map(math.radians, [lon1, lat1, lon2, lat2])
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    return c * 6371 * 1000  # metres
-
-
-def point_in_polygon(point_lng, point_lat, polygon_geojson):
-    """
-    Ray-casting algorithm to check if a point is inside a GeoJSON polygon.
-    """
-    if not polygon_geojson:
-        return False
-
-    geom_type = polygon_geojson.get('type')
-    coordinates = polygon_geojson.get('coordinates', [])
-
-    if not coordinates:
-        return False
-
-    # Handle both Polygon and MultiPolygon
-    rings = []
-    if geom_type == 'Polygon':
-        rings = [coordinates[0]] if coordinates else []
-    elif geom_type == 'MultiPolygon':
-        for polygon in coordinates:
-            if polygon:
-                rings.append(polygon[0])
-    else:
-        return False
-
-    for exterior_ring in rings:
-        n = len(exterior_ring)
-        inside = False
-        p1x, p1y = exterior_ring[0]
-        for i in range(1, n + 1):
-            p2x, p2y = exterior_ring[i % n]
-            if point_lat > min(p1y, p2y):
-                if point_lat <= max(p1y, p2y):
-                    if point_lng <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (point_lat - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or point_lng <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-        if inside:
-            return True
-
-    return False
+def valid_circle(lat, lng, radius):
+    """True when a parsed query circle is finite and has a non-negative radius."""
+    return math.isfinite(lat) and math.isfinite(lng) and math.isfinite(radius) and radius >= 0
 
 
 # ═══════════════════════════════════════════════════════════════════
@@ -200,25 +153,15 @@ class NearbyCafesView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        cafes = []
-        for cafe in Cafe.objects.filter(is_open=True):
-            if not (cafe.location and isinstance(cafe.location, dict)):
-                # Fall back to latitude/longitude fields
-                if cafe.latitude and cafe.longitude:
-                    distance = haversine_distance(lat, lng, cafe.latitude, cafe.longitude)
-                    if distance <= radius:
-                        cafe.distance = distance
-                        cafes.append(cafe)
-            else:
-                coords = cafe.location.get('coordinates', [None, None])
-                cafe_lng, cafe_lat = coords[0], coords[1]
-                if cafe_lng is not None and cafe_lat is not None:
-                    distance = haversine_distance(lat, lng, cafe_lat, cafe_lng)
-                    if distance <= radius:
-                        cafe.distance = distance
-                        cafes.append(cafe)
-
-        cafes.sort(key=lambda c: getattr(c, 'distance', 0))
+        # float() accepts "nan" / "inf", which the spatial index cannot query
+        if not valid_circle(lat, lng, radius):
+            return Response(
+                {'error': 'lat, lng and radius must be finite numbers (radius >= 0)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Spatial index answers the radius query; results come back nearest first
+        cafes = nearby_cafes(lat, lng, radius)
 
         serializer = CafeSerializer(cafes, many=True)
         return Response({
@@ -239,113 +182,106 @@ class SuitabilityAnalysisView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        lat       = serializer.validated_data['lat']
-        lng       = serializer.validated_data['lng']
-        cafe_type = serializer.validated_data['cafe_type']
-        radius    = serializer.validated_data.get('radius', 500)
-
-        # Step 1: Find nearby cafes using haversine distance
-        nearby_cafes = []
-        for cafe in Cafe.objects.filter(is_open=True):
-            cafe_lat, cafe_lng = None, None
-
-            if cafe.location and isinstance(cafe.location, dict):
-                coords = cafe.location.get('coordinates', [None, None])
-                if len(coords) >= 2:
-                    cafe_lng, cafe_lat = coords[0], coords[1]
-            elif cafe.latitude and cafe.longitude:
-                cafe_lat, cafe_lng = cafe.latitude, cafe.longitude
-
-            if cafe_lat is not None and cafe_lng is not None:
-                distance = haversine_distance(lat, lng, cafe_lat, cafe_lng)
-                if distance <= radius:
-                    cafe.distance = distance
-                    nearby_cafes.append(cafe)
-
-        total_competitors = len(nearby_cafes)
-
-        # Step 2: Top 5 cafes by score
-        top5_qs = sorted(
-            nearby_cafes,
-            key=lambda c: (c.rating or 0) * math.log(max(c.review_count, 1) + 1),
-            reverse=True
-        )[:5]
-
-        # Step 3: Population density from ward
-        pop_density = 10000  # fallback
-        for ward in Ward.objects.all():
-            if ward.boundary and isinstance(ward.boundary, dict):
-                if point_in_polygon(lng, lat, ward.boundary):
-                    pop_density = ward.population_density
-                    break
-
-        # Step 4: Road length estimate within radius
-        road_segments_nearby = 0
-        for road in Road.objects.all():
-            if not (road.geometry and isinstance(road.geometry, dict)):
-                continue
-
-            geom_type = road.geometry.get('type')
-            coordinates = road.geometry.get('coordinates', [])
-
-            if geom_type == 'LineString' and coordinates:
-                for coord in coordinates:
-                    if len(coord) >= 2:
-                        d = haversine_distance(lat, lng, coord[1], coord[0])
-                        if d <= radius:
-                            road_segments_nearby += 1
-                            break
-
-            elif geom_type == 'MultiLineString' and coordinates:
-                found = False
-                for linestring in coordinates:
-                    if found:
-                        break
-                    for coord in linestring:
-                        if len(coord) >= 2:
-                            d = haversine_distance(lat, lng, coord[1], coord[0])
-                            if d <= radius:
-                                road_segments_nearby += 1
-                                found = True
-                                break
-
-        road_m = road_segments_nearby * 100  # ~100m per segment estimate
-
-        # Step 5: Compute suitability score (0-100)
-        competitor_score = max(0, 1 - (total_competitors / 20)) * 40
-        road_score       = min(1, road_m / 3000) * 30
-        pop_score        = min(1, pop_density / 15000) * 30
-        suitability_score = round(competitor_score + road_score + pop_score)
-
-        # Step 6: ML prediction
-        ratings = [c.rating for c in nearby_cafes if c.rating is not None]
-        avg_rating = sum(ratings) / len(ratings) if ratings else 0
-
-        features = [
-            total_competitors,
-            avg_rating,
-            road_m,
-            pop_density,
-        ]
+        # Nearby cafes → top 5 → ward density → road length → score → ML prediction
+        # (api/analysis.py, shared with the batch endpoint)
+        return Response(analyze_sites([serializer.validated_data])[0])
 
-        prediction = get_suitability_prediction(features)
 
+# ═══════════════════════════════════════════════════════════════════
+# VIEW 4b: Batch Suitability Analysis
+# POST /api/analyze/batch/
+# { "sites": [{"lat": .., "lng": .., "cafe_type": .., "radius": ..}, ...] }
+# Returns one /api/analyze/ result per site, in the same order
+# ═══════════════════════════════════════════════════════════════════
+class BatchSuitabilityAnalysisView(APIView):
+
+    def post(self, request):
+        serializer = BatchSuitabilityRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        results = analyze_sites(serializer.validated_data['sites'])
+        return Response({
+            'count':   len(results),
+            'results': results,
+        })
+
+
+# ═══════════════════════════════════════════════════════════════════
+# VIEW 4c: Suitability Heatmap
+# GET /api/heatmap/?south=27.68&west=85.28&north=27.74&east=85.36&layer=score
+# Cells of the precomputed suitability grid inside the viewport, as
+# [lat, lng, value] (block-averaged when the viewport holds more than max_cells)
+# ═══════════════════════════════════════════════════════════════════
+class HeatmapView(APIView):
+
+    def get(self, request):
+        serializer = HeatmapRequestSerializer(data=request.GET)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+
+        suitability_grid = get_suitability_grid()
+        if suitability_grid is None:
+            return Response(
+                {'error': 'Suitability grid has not been built — run manage.py build_suitability_grid'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        cells, stride = suitability_grid.cells(
+            params['layer'], params['south'], params['west'], params['north'], params['east'], params['max_cells']
+        )
+        meta = suitability_grid.meta
         return Response({
-            'location':     {'lat': lat, 'lng': lng},
-            'nearby_count': total_competitors,
-            'top5':         CafeSerializer(top5_qs, many=True).data,
-            'suitability': {
-                'score':              suitability_score,
-                'level':              prediction.get('predicted_suitability', 'Unknown'),
-                'confidence':         prediction.get('confidence', 0),
-                'competitor_count':   total_competitors,
-                'road_length_m':      round(road_m),
-                'population_density': pop_density,
-            },
-            'prediction': prediction,
+            'layer':         params['layer'],
+            # The analysis does not depend on the café type, so one grid serves every type
+            'cafe_type':     params.get('cafe_type'),
+            'levels':        meta['levels'] if params['layer'] == 'level' else None,
+            'resolution_m':  suitability_grid.grid.resolution_m * stride,
+            'radius_m':      meta['radius_m'],
+            'model_version': meta.get('model_version'),
+            'built_at':      meta.get('built_at'),
+            'count':         len(cells),
+            'cells':         cells,
         })
 
 
+# ═══════════════════════════════════════════════════════════════════
+# VIEW 4d: Map Tiles
+# GET /api/tiles/<layer>/<z>/<x>/<y>.png   (layer: suitability | population | competitors)
+# 256×256 PNG tiles for Leaflet, rendered from the precomputed grids and
+# cached; the ETag changes only when the layer's dataset (or model) does
+# ═══════════════════════════════════════════════════════════════════
+class TileView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, layer, z, x, y):
+        if layer not in TILE_LAYERS:
+            return Response(
+                {'error': f"Unknown layer '{layer}' (available: {', '.join(TILE_LAYERS)})"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if not valid_tile(z, x, y):
+            return Response({'error': 'Tile coordinates out of range'}, status=status.HTTP_404_NOT_FOUND)
+
+        tile_layer = get_tile_layer(layer)
+        if tile_layer is None:
+            return Response(
+                {'error': f"The {layer} layer has not been built yet"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        tag = etag(tile_layer, z, x, y)
+        if tag in request.headers.get('If-None-Match', ''):
+            response = HttpResponse(status=304)
+        else:
+            response = HttpResponse(get_tile(tile_layer, z, x, y), content_type='image/png')
+        response['ETag'] = tag
+        patch_cache_control(response, public=True, max_age=settings.TILE_MAX_AGE)
+        return response
+
+
 # ═══════════════════════════════════════════════════════════════════
 # VIEW 5: Amenities by Type and Radius
 # GET /api/amenities/?lat=27.71&lng=85.32&radius=500&type=school
@@ -365,20 +301,14 @@ class AmenitiesView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Query amenities by type
-        query = Amenity.objects.all()
-        if amenity_type:
-            query = query.filter(amenity_type__icontains=amenity_type)
-
-        amenities = []
-        for amenity in query:
-            distance = haversine_distance(lat, lng, amenity.latitude, amenity.longitude)
-            if distance <= radius:
-                amenity.distance = distance
-                amenities.append(amenity)
+        if not valid_circle(lat, lng, radius):
+            return Response(
+                {'error': 'lat, lng and radius must be finite numbers (radius >= 0)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Sort by distance
-        amenities.sort(key=lambda a: getattr(a, 'distance', 0))
+        # Spatial index answers the radius query, type filter applied to its hits; nearest first
+        amenities = amenities_within(lat, lng, radius, amenity_type)
 
         serializer = AmenitySerializer(amenities, many=True)
         return Response({
@@ -408,21 +338,25 @@ class AmenitiesReportView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Key amenity types we want to report
-        key_amenity_types = ['school', 'hospital', 'bus_station', 'cafe', 'health_post', 'pharmacy']
+        if not valid_circle(lat, lng, radius):
+            return Response(
+                {'error': 'lat, lng and radius must be finite numbers (radius >= 0)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Key amenity categories we want to report
+        key_categories = [
+            AmenityCategory.SCHOOL, AmenityCategory.HOSPITAL, AmenityCategory.BUS_STATION,
+            AmenityCategory.CAFE, AmenityCategory.HEALTH_POST, AmenityCategory.PHARMACY,
+        ]
 
+        # One radius query for all categories, hits bucketed by category code
         report = {}
-        for amenity_type in key_amenity_types:
-            amenities = []
-            for amenity in Amenity.objects.filter(amenity_type__icontains=amenity_type):
-                distance = haversine_distance(lat, lng, amenity.latitude, amenity.longitude)
-                if distance <= radius:
-                    amenity.distance = distance
-                    amenities.append(amenity)
-
-            report[amenity_type] = {
-                'count': len(amenities),
-                'amenities': AmenitySerializer(amenities[:20], many=True).data  # Top 20
+        for category, group in amenity_report(lat, lng, radius, key_categories, top_n=20).items():
+            report[category.slug] = {
+                'count': group['count'],
+                'nearest_distance_m': round(group['nearest_distance_m'], 1) if group['count'] else None,
+                'amenities': AmenitySerializer(group['amenities'], many=True).data  # Nearest 20
             }
 
         return Response({
@@ -435,7 +369,9 @@ class AmenitiesReportView(APIView):
 # ═══════════════════════════════════════════════════════════════════
 # VIEW 7: Area Population Calculation
 # GET /api/area-population/?lat=27.71&lng=85.32&radius=500
-# Calculates exact population within the area based on ward boundaries
+# Estimates the population inside the circle from ward populations,
+# spread by road/amenity density (population surface) or, without one,
+# weighted by how much of each ward's area the circle covers
 # ═══════════════════════════════════════════════════════════════════
 class AreaPopulationView(APIView):
 
@@ -450,66 +386,33 @@ class AreaPopulationView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        total_population = 0
-        affected_wards = []
-
-        # Check which wards the location falls in or intersects with
-        for ward in Ward.objects.all():
-            if not (ward.boundary and isinstance(ward.boundary, dict)):
-                continue
-
-            is_affected = False
-
-            # Try to use Shapely if available for more accurate geometry handling
-            if SHAPELY_AVAILABLE and ward.boundary.get('type') == 'wkt':
-                try:
-                    wkt_str = ward.boundary.get('wkt')
-                    if wkt_str:
-                        ward_polygon = wkt_loads(wkt_str)
-                        test_point = Point(lng, lat)
-
-                        # Check if point is within ward or within radius of ward
-                        if ward_polygon.contains(test_point):
-                            is_affected = True
-                        elif ward_polygon.distance(test_point) * 111000 <= radius:  # ~111km per degree
-                            is_affected = True
-                except Exception as e:
-                    logger.warning(f'Error parsing WKT for ward {ward.ward_number}: {e}')
-                    continue
-            else:
-                # Fallback to checking if point is within or near the ward's geometric bounds
-                # This is a simplified approach - just consider wards near the location
-                try:
-                    # Extract first set of coordinates if possible for boundary check
-                    coords = ward.boundary.get('coordinates', [])
-                    if coords and len(coords) > 0:
-                        # Simple check: if we have coordinates, assume some overlap within radius
-                        for coord_set in coords:
-                            if isinstance(coord_set, (list, tuple)) and len(coord_set) > 0:
-                                for coord in coord_set:
-                                    if isinstance(coord, (list, tuple)) and len(coord) >= 2:
-                                        d = haversine_distance(lat, lng, coord[1], coord[0])
-                                        if d <= radius * 2:  # generous bounds
-                                            is_affected = True
-                                            break
-                                if is_affected:
-                                    break
-                except:
-                    continue
-
-            if is_affected:
-                total_population += ward.population
-                affected_wards.append({
-                    'ward_number': ward.ward_number,
-                    'population': ward.population,
-                    'population_density': ward.population_density,
-                    'area_sqkm': ward.area_sqkm,
-                })
+        if not valid_circle(lat, lng, radius):
+            return Response(
+                {'error': 'lat, lng and radius must be finite numbers (radius >= 0)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Total and per-ward split from ONE method: the population surface when
+        # built, otherwise circle ∩ ward polygons (population × share of area inside)
+        total_population, population_method, breakdown = catchment_breakdown(lat, lng, radius)
+        affected_wards = [
+            {
+                'ward_number': ward['ward_number'],
+                'population': ward['population'],
+                'population_density': ward['population_density'],
+                'area_sqkm': ward['area_sqkm'],
+                'overlap_fraction': round(fraction, 4),
+                'population_in_area': round(population),
+            }
+            for ward, fraction, population in breakdown
+        ]
+        total_population = round(total_population)
 
         return Response({
             'location': {'lat': lat, 'lng': lng},
             'radius': radius,
             'total_population': total_population,
+            'population_method': population_method,
             'affected_wards': affected_wards,
             'affected_ward_count': len(affected_wards),
         })
@@ -0,0 +1,108 @@
+"""
+Precomputed point → ward lookup raster.
+
+A uint8 grid over the analysis area (serializer bounds) where every cell
+holds the ward number it lies in. Cells crossed by a ward boundary hold
+EXACT and fall back to the exact polygon test in WardLocator; 0 means
+"outside every ward". The raster is built offline:
+
+    python manage.py build_ward_raster --resolution 10
+
+and saved as SPATIAL_CACHE_DIR/ward_raster.npy (+ .json metadata). At run
+time it is opened with mmap_mode='r', so a lookup is one array read and
+the pages are shared between worker processes.
+"""
+
+import json
+import logging
+
+import numpy as np
+from django.conf import settings
+
+from .grid import MetricGrid
+
+logger = logging.getLogger(__name__)
+
+OUTSIDE = 0      # not inside any ward
+EXACT   = 255    # boundary cell (or off the raster) → ask the polygons
+
+
+def raster_path():
+    return settings.SPATIAL_CACHE_DIR / 'ward_raster.npy'
+
+
+class WardRaster:
+
+    def __init__(self, grid, codes, fingerprint):
+        self.grid        = grid
+        self.codes       = codes
+        self.fingerprint = fingerprint
+
+    def lookup_xy(self, x, y):
+        """Ward number / OUTSIDE / EXACT for every metric (x, y)."""
+        rows, cols, inside = self.grid.cells_xy(x, y)
+        result = np.full(np.shape(rows), EXACT, dtype=np.uint8)
+        result[inside] = self.codes[rows[inside], cols[inside]]
+        return result
+
+    def save(self, path=None):
+        path = path or raster_path()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.save(path, np.ascontiguousarray(self.codes, dtype=np.uint8))
+        meta = {**self.grid.to_meta(), 'fingerprint': self.fingerprint}
+        path.with_suffix('.json').write_text(json.dumps(meta, indent=2))
+
+    @classmethod
+    def load(cls, path=None):
+        """Memory-map a saved raster; None when it has not been built."""
+        path = path or raster_path()
+        meta_path = path.with_suffix('.json')
+        if not (path.exists() and meta_path.exists()):
+            return None
+
+        meta  = json.loads(meta_path.read_text())
+        codes = np.load(path, mmap_mode='r')
+        grid  = MetricGrid.from_meta(meta)
+        if codes.shape != grid.shape:
+            raise ValueError(f'{path} has shape {codes.shape}, metadata says {grid.shape}')
+        return cls(grid, codes, meta.get('fingerprint'))
+
+
+def build_ward_raster(locator, resolution_m, band_rows=256):
+    """
+    Rasterise a WardLocator at resolution_m metres per cell.
+
+    Cell centres are classified with the exact polygon test, band by band;
+    then every cell a ward edge passes through (plus its 8 neighbours, to
+    stay conservative at corners) is marked EXACT.
+    """
+    numbers = np.array([ward['ward_number'] for ward in locator.wards], dtype=np.int64)
+    if len(numbers) and (numbers.min() < 1 or numbers.max() >= EXACT):
+        raise ValueError(f'Ward numbers must be between 1 and {EXACT - 1} to fit a uint8 raster')
+    position_codes = np.append(numbers, OUTSIDE).astype(np.uint8)  # position -1 → OUTSIDE
+
+    grid  = MetricGrid.for_bounds(resolution_m)
+    codes = np.zeros(grid.shape, dtype=np.uint8)
+
+    for start in range(0, grid.n_rows, band_rows):
+        stop = min(start + band_rows, grid.n_rows)
+        x, y = grid.row_centers(start, stop)
+        positions = locator.locate_xy(x.ravel(), y.ravel())
+        codes[start:stop] = position_codes[positions].reshape(x.shape)
+
+    # Walk every edge in steps of half a cell and flag the cells it touches
+    lengths = np.hypot(locator.x1 - locator.x0, locator.y1 - locator.y0)
+    steps = np.maximum(np.ceil(lengths / (resolution_m / 2)).astype(np.intp), 1)
+    edge  = np.repeat(np.arange(len(steps)), steps + 1)
+    first = np.repeat(np.cumsum(steps + 1) - (steps + 1), steps + 1)
+    t     = (np.arange(len(edge)) - first) / steps[edge]
+    x = locator.x0[edge] + t * (locator.x1[edge] - locator.x0[edge])
+    y = locator.y0[edge] + t * (locator.y1[edge] - locator.y0[edge])
+    rows, cols, _ = grid.cells_xy(x, y)
+    for d_row in (-1, 0, 1):
+        for d_col in (-1, 0, 1):
+            r, c = rows + d_row, cols + d_col
+            ok = (r >= 0) & (r < grid.n_rows) & (c >= 0) & (c < grid.n_cols)
+            codes[r[ok], c[ok]] = EXACT
+
+    return WardRaster(grid, codes, locator.fingerprint)
@@ -0,0 +1,362 @@
+"""
+Ward locator — answers "which ward is this point in?" and "which wards are
+within X metres?" without re-parsing ward boundaries on every request.
+
+All Ward boundaries are parsed ONCE, projected to a local metric plane
+centred on Kathmandu and kept as prepared shapely polygons behind an
+STRtree. When shapely is not installed the same queries run on a flat
+NumPy edge table (vectorised ray casting / point-to-segment distance).
+
+Boundaries may be stored either as {'type': 'wkt', 'wkt': ...} (what
+ml/load_wards.py writes) or as a GeoJSON (Multi)Polygon.
+"""
+
+import hashlib
+import json
+import logging
+import re
+
+import numpy as np
+
+from .grid import project
+from .spatial_index import LazyIndex, query_backend, table_stamp
+from .ward_raster import EXACT, WardRaster
+
+try:
+    import shapely
+    from shapely import STRtree
+    from shapely.geometry import Polygon, MultiPolygon
+    SHAPELY_AVAILABLE = True
+except ImportError:
+    SHAPELY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+WARD_FIELDS = ['ward_number', 'population', 'households', 'area_sqkm', 'population_density']
+
+_POLYGON_RE = re.compile(r'\(\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*\s*\)')
+_RING_RE    = re.compile(r'\(([^()]+)\)')
+_COORD_RE   = re.compile(r'[-+0-9.eE]+')
+
+
+def _parse_ring(text):
+    """'x y, x y, ...' → list of [x, y], closed (first point repeated at the end)."""
+    values = [float(v) for v in _COORD_RE.findall(text)]
+    ring = [values[i:i + 2] for i in range(0, len(values) - 1, 2)]
+    if ring and ring[0] != ring[-1]:
+        ring.append(ring[0])  # some source rings are not closed
+    return ring
+
+
+def _wkt_polygons(wkt):
+    """
+    POLYGON / MULTIPOLYGON WKT → list of polygons, each a list of rings
+    (exterior first). Parsed by hand so that unclosed rings can be repaired.
+    """
+    wkt = wkt.strip()
+    if not wkt.upper().startswith(('POLYGON', 'MULTIPOLYGON')):
+        return []
+    return [[_parse_ring(ring) for ring in _RING_RE.findall(polygon)] for polygon in _POLYGON_RE.findall(wkt)]
+
+
+def boundary_polygons(boundary):
+    """Ward.boundary → list of polygons (lists of [lng, lat] rings)."""
+    if not (boundary and isinstance(boundary, dict)):
+        return []
+
+    geom_type = boundary.get('type')
+    if geom_type == 'wkt':
+        return _wkt_polygons(boundary.get('wkt') or '')
+    if geom_type == 'Polygon':
+        return [boundary.get('coordinates', [])]
+    if geom_type == 'MultiPolygon':
+        return list(boundary.get('coordinates', []))
+    return []
+
+
+# ═══════════════════════════════════════════════════════════════════
+# WardLocator
+# ═══════════════════════════════════════════════════════════════════
+class WardLocator:
+
+    def __init__(self, wards, polygons, fingerprint=None):
+        """
+        Args:
+            wards:       list of dicts with WARD_FIELDS
+            polygons:    per ward, a list of polygons of [lng, lat] rings
+            fingerprint: hash of the boundaries, used to match a lookup raster
+        """
+        self.wards       = list(wards)
+        self.fingerprint = fingerprint
+        self.raster      = None
+
+        # ward_number → position in self.wards, as a lookup table for raster codes
+        self._code_positions = np.full(256, -1, dtype=np.intp)
+        for position, ward in enumerate(self.wards):
+            if 0 < ward['ward_number'] < EXACT:
+                self._code_positions[ward['ward_number']] = position
+
+        # Flat edge table (metric), one row per ring edge, tagged with its ward
+        x0, y0, x1, y1, owner = [], [], [], [], []
+        projected = []
+        self.areas = np.zeros(len(self.wards))  # m², exterior minus holes
+        for position, ward_polygons in enumerate(polygons):
+            ward_projected = []
+            for rings in ward_polygons:
+                xy_rings = []
+                for ring in rings:
+                    if len(ring) < 4:
+                        continue
+                    ring = np.asarray(ring, dtype=np.float64)[:, :2]
+                    x, y = project(ring[:, 1], ring[:, 0])
+                    ring_area = abs(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])) / 2  # shoelace
+                    self.areas[position] += -ring_area if xy_rings else ring_area
+                    xy_rings.append(np.column_stack([x, y]))
+                    x0.append(x[:-1]); y0.append(y[:-1])
+                    x1.append(x[1:]);  y1.append(y[1:])
+                    owner.append(np.full(len(x) - 1, position, dtype=np.intp))
+                if xy_rings:
+                    ward_projected.append(xy_rings)
+            projected.append(ward_projected)
+
+        if owner:
+            self.x0, self.y0 = np.concatenate(x0), np.concatenate(y0)
+            self.x1, self.y1 = np.concatenate(x1), np.concatenate(y1)
+            self.edge_ward   = np.concatenate(owner)
+        else:
+            self.x0 = self.y0 = self.x1 = self.y1 = np.empty(0)
+            self.edge_ward = np.empty(0, dtype=np.intp)
+
+        self.geometries = None
+        self._tree = None
+        if SHAPELY_AVAILABLE and self.wards:
+            self.geometries = np.array([self._to_shapely(p) for p in projected], dtype=object)
+            shapely.prepare(self.geometries)
+            self._tree = STRtree(self.geometries)
+            self.areas = shapely.area(self.geometries)
+
+    @staticmethod
+    def _to_shapely(ward_projected):
+        polygons = [Polygon(rings[0], rings[1:]) for rings in ward_projected]
+        geometry = polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+        if not geometry.is_valid:
+            geometry = geometry.buffer(0)  # repair self-intersections from digitising
+        return geometry
+
+    def __len__(self):
+        return len(self.wards)
+
+    def project(self, lats, lngs):
+        """(lat, lng) → metric (x, y) in the locator's plane."""
+        return project(lats, lngs)
+
+    def attach_raster(self, raster):
+        """Use a precomputed WardRaster for O(1) lookups if it matches these boundaries."""
+        if raster.fingerprint != self.fingerprint:
+            logger.warning('Ward raster is stale (boundaries changed) — run build_ward_raster. Ignoring it.')
+            return False
+        self.raster = raster
+        return True
+
+    # ── point-in-ward ─────────────────────────────────────────────
+    def locate_many(self, lats, lngs):
+        """
+        Ward position (index into self.wards) for every point, -1 when the
+        point is outside all wards.
+        """
+        x, y = self.project(np.atleast_1d(lats), np.atleast_1d(lngs))
+        return self.lookup_xy(x, y)
+
+    def lookup_xy(self, x, y):
+        """Like locate_many() for metric (x, y): raster first when attached, exact test for the rest."""
+        if self.raster is None:
+            return self.locate_xy(x, y)
+
+        # Interior cells answer directly; boundary/off-raster cells use the polygons
+        codes  = self.raster.lookup_xy(x, y)
+        result = self._code_positions[codes]
+        exact  = codes == EXACT
+        if exact.any():
+            result[exact] = self.locate_xy(x[exact], y[exact])
+        return result
+
+    def locate_xy(self, x, y):
+        """Exact polygon test for metric (x, y) points (ignores the raster)."""
+        result = np.full(len(x), -1, dtype=np.intp)
+        if not len(self):
+            return result
+
+        if self._tree is not None:
+            points, wards = self._tree.query(shapely.points(x, y), predicate='intersects')
+            result[points[::-1]] = wards[::-1]  # first match wins on shared edges
+            return result
+
+        # Even-odd ray casting against the whole edge table, a block of points at a time.
+        # Edges are stored ward by ward, so per-ward crossing counts are one reduceat.
+        ward_starts = np.searchsorted(self.edge_ward, np.arange(len(self)))
+        for start in range(0, len(x), 256):
+            px = x[start:start + 256, np.newaxis]
+            py = y[start:start + 256, np.newaxis]
+            crosses = (self.y0 > py) != (self.y1 > py)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                x_at = self.x0 + (py - self.y0) * (self.x1 - self.x0) / (self.y1 - self.y0)
+            crosses &= px < x_at
+            inside = np.add.reduceat(crosses, ward_starts, axis=1) % 2 == 1
+            found = inside.any(axis=1)
+            result[start:start + 256][found] = np.argmax(inside[found], axis=1)
+        return result
+
+    def locate(self, lat, lng):
+        """The ward dict containing (lat, lng), or None."""
+        position = int(self.locate_many(lat, lng)[0])
+        return self.wards[position] if position >= 0 else None
+
+    # ── wards within distance ─────────────────────────────────────
+    def distances(self, lat, lng, radius_m):
+        """
+        Wards whose boundary comes within radius_m of (lat, lng).
+
+        Returns:
+            list of (position, distance_m) — distance 0 when the point is inside
+        """
+        if not len(self):
+            return []
+
+        x, y = self.project(lat, lng)
+        if self._tree is not None:
+            point = shapely.points(x, y)
+            box = shapely.box(x - radius_m, y - radius_m, x + radius_m, y + radius_m)
+            candidates = np.sort(self._tree.query(box))
+            dist = shapely.distance(self.geometries[candidates], point)
+            keep = dist <= radius_m
+            return list(zip(candidates[keep].tolist(), dist[keep].tolist()))
+
+        # Point-to-segment distance for every edge, min per ward
+        dx, dy = self.x1 - self.x0, self.y1 - self.y0
+        length2 = dx * dx + dy * dy
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(((x - self.x0) * dx + (y - self.y0) * dy) / length2, 0.0, 1.0)
+        t = np.nan_to_num(t)
+        edge_dist = np.hypot(self.x0 + t * dx - x, self.y0 + t * dy - y)
+        dist = np.full(len(self), np.inf)
+        np.minimum.at(dist, self.edge_ward, edge_dist)
+
+        inside = self.locate_many(lat, lng)[0]
+        if inside >= 0:
+            dist[inside] = 0.0
+        candidates = np.flatnonzero(dist <= radius_m)
+        return list(zip(candidates.tolist(), dist[candidates].tolist()))
+
+    def within_distance(self, lat, lng, radius_m):
+        """Ward dicts within radius_m of (lat, lng), in ward order."""
+        return [self.wards[position] for position, _ in self.distances(lat, lng, radius_m)]
+
+    # ── catchment population ──────────────────────────────────────
+    def overlaps(self, lat, lng, radius_m, samples=1024):
+        """
+        How much of each ward lies inside the circle of radius_m around (lat, lng).
+
+        Returns:
+            list of (position, overlap_m2) for every ward the circle touches
+
+        With shapely the circle is intersected exactly with the candidate
+        polygons from the STRtree. Without it, the circle is covered by a
+        regular lattice of ~`samples` points and each point is located.
+        """
+        if not len(self):
+            return []
+
+        x, y = self.project(lat, lng)
+        if self._tree is not None:
+            circle = shapely.Point(x, y).buffer(radius_m, quad_segs=32)
+            candidates = np.sort(self._tree.query(circle))
+            overlap = shapely.area(shapely.intersection(self.geometries[candidates], circle))
+            keep = overlap > 0
+            return list(zip(candidates[keep].tolist(), overlap[keep].tolist()))
+
+        step = radius_m * np.sqrt(np.pi / samples)
+        offsets = np.arange(-radius_m + step / 2, radius_m, step)
+        dx, dy = np.meshgrid(offsets, offsets)
+        in_circle = dx * dx + dy * dy <= radius_m * radius_m
+        positions = self.lookup_xy(x + dx[in_circle], y + dy[in_circle])
+        counts = np.bincount(positions[positions >= 0], minlength=len(self))
+        cell_area = step * step
+        touched = np.flatnonzero(counts)
+        return list(zip(touched.tolist(), (counts[touched] * cell_area).tolist()))
+
+    def catchment_population(self, lat, lng, radius_m):
+        """
+        Population living inside the circle, assuming each ward's population
+        is spread evenly over its area.
+
+        Returns:
+            (total_population, [(ward_dict, overlap_fraction, population_in_area), ...])
+        """
+        total = 0.0
+        breakdown = []
+        for position, overlap_m2 in self.overlaps(lat, lng, radius_m):
+            ward = self.wards[position]
+            fraction = min(1.0, overlap_m2 / self.areas[position]) if self.areas[position] > 0 else 0.0
+            population = ward['population'] * fraction
+            total += population
+            breakdown.append((ward, fraction, population))
+        return total, breakdown
+
+
+def _build_ward_locator():
+    from .models import Ward
+
+    wards, polygons = [], []
+    digest = hashlib.sha1()
+    for row in Ward.objects.order_by('ward_number').values(*WARD_FIELDS, 'boundary'):
+        boundary = row.pop('boundary')
+        try:
+            ward_polygons = boundary_polygons(boundary)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Could not parse boundary of ward {row['ward_number']}: {e}")
+            continue
+        if ward_polygons:
+            wards.append(row)
+            polygons.append(ward_polygons)
+            digest.update(json.dumps([row['ward_number'], boundary], sort_keys=True).encode())
+
+    locator = WardLocator(wards, polygons, fingerprint=digest.hexdigest())
+    try:
+        raster = WardRaster.load()
+    except (OSError, ValueError) as e:
+        logger.warning(f'Could not load ward raster: {e}')
+        raster = None
+    if raster is not None:
+        locator.attach_raster(raster)
+    return locator
+
+
+_ward_locator = LazyIndex('ward', _build_ward_locator, stamp=table_stamp('Ward'))
+
+
+def get_ward_locator():
+    return _ward_locator.get()
+
+
+def invalidate_ward_locator():
+    _ward_locator.invalidate()
+
+
+def locate_ward(lat, lng):
+    """The ward dict containing (lat, lng), or None."""
+    backend = query_backend()
+    if backend is not None:
+        return backend.locate_ward(lat, lng)
+
+    return get_ward_locator().locate(lat, lng)
+
+
+def locate_wards(lats, lngs):
+    """locate_ward() for many points — one vectorised lookup with the in-memory locator."""
+    backend = query_backend()
+    if backend is not None:
+        return [backend.locate_ward(lat, lng) for lat, lng in zip(lats, lngs)]
+
+    locator = get_ward_locator()
+    positions = locator.locate_many(np.asarray(lats, dtype=np.float64), np.asarray(lngs, dtype=np.float64))
+    return [locator.wards[p] if p >= 0 else None for p in positions.tolist()]
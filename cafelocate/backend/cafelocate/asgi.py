@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cafelocate.settings')
 
 application = get_asgi_application()
+
+# Servers only: start loading the ML model now (ML_EAGER_LOAD)
+from ml_engine.apps import start_eager_load  # noqa: E402
+start_eager_load()
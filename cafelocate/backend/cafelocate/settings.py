@@ -55,6 +55,17 @@ INSTALLED_APPS = [
     'ml_engine',                   # the ML prediction app
 ]
 
+# Optional spatial database mode (needs GDAL + SpatiaLite or PostGIS).
+# Geometry mirrors live in the `geodb` app; radius / containment /
+# intersection queries then run in the database (ST_DWithin & co.)
+SPATIAL_DB = env.bool('SPATIAL_DB', default=False)
+
+if SPATIAL_DB:
+    INSTALLED_APPS += [
+        'django.contrib.gis',
+        'geodb',                   # geometry columns + spatial indexes
+    ]
+
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # ← ADD THIS FIRST
     'django.middleware.security.SecurityMiddleware',
@@ -101,6 +112,8 @@ if DATABASE_URL.startswith('postgresql://'):
     DATABASES = {
         'default': env.db_url('DATABASE_URL')
     }
+    if SPATIAL_DB:
+        DATABASES['default']['ENGINE'] = 'django.contrib.gis.db.backends.postgis'
 else:
     # SQLite configuration (development fallback)
     DATABASES = {
@@ -109,6 +122,25 @@ else:
             'NAME': BASE_DIR / 'db.sqlite3',
         }
     }
+    if SPATIAL_DB:
+        DATABASES['default']['ENGINE'] = 'django.contrib.gis.db.backends.spatialite'
+
+# Where radius queries run when SPATIAL_DB is off:
+#   'memory' — process-wide BallTree / STRtree indexes (fastest once built)
+#   'rtree'  — SQLite R*Tree tables (api/rtree.py): no per-process index
+#              build, always in sync across worker processes
+SPATIAL_INDEX = env('SPATIAL_INDEX', default='memory')
+
+# The in-memory indexes compare their build stamp (api/spatial_index.py
+# table_stamp) with the database at most every SPATIAL_INDEX_CHECK_INTERVAL
+# seconds, to pick up changes made by other processes (0 = never)
+SPATIAL_INDEX_CHECK_INTERVAL = env.float('SPATIAL_INDEX_CHECK_INTERVAL', default=5.0)
+
+# Only needed when the libraries are not on the default search path
+if env('GDAL_LIBRARY_PATH', default=None):
+    GDAL_LIBRARY_PATH = env('GDAL_LIBRARY_PATH')
+if env('SPATIALITE_LIBRARY_PATH', default=None):
+    SPATIALITE_LIBRARY_PATH = env('SPATIALITE_LIBRARY_PATH')
 
 
 # Password validation
@@ -147,6 +179,33 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Precomputed spatial artefacts (ward lookup raster, population surface, ...)
+# Built offline by management commands, read (memory-mapped) by the API
+SPATIAL_CACHE_DIR = Path(env('SPATIAL_CACHE_DIR', default=str(BASE_DIR / 'spatial_cache')))
+
+# Map tiles (/api/tiles/...): rendered PNGs are kept on disk (empty = memory
+# only) and in a per-process LRU of TILE_MEMORY_CACHE_MB
+TILE_CACHE_DIR = env('TILE_CACHE_DIR', default=str(SPATIAL_CACHE_DIR / 'tiles'))
+TILE_CACHE_DIR = Path(TILE_CACHE_DIR) if TILE_CACHE_DIR else None
+TILE_MEMORY_CACHE_MB = env.int('TILE_MEMORY_CACHE_MB', default=64)
+TILE_MAX_AGE = env.int('TILE_MAX_AGE', default=3600)   # Cache-Control max-age, seconds
+
+# Load the ML model in the background as soon as the server starts
+# (wsgi.py / asgi.py; GET /api/ready/ reports when it is available)
+ML_EAGER_LOAD = env.bool('ML_EAGER_LOAD', default=True)
+
+# Versioned model registry (ml_engine/registry.py); the version named in
+# <ML_REGISTRY_DIR>/ACTIVE is served. Workers check for a newly activated
+# version every ML_RELOAD_INTERVAL seconds (0 = only on POST /api/model/activate/)
+ML_REGISTRY_DIR = Path(env('ML_REGISTRY_DIR', default=str(BASE_DIR / 'ml_engine' / 'models' / 'registry')))
+ML_RELOAD_INTERVAL = env.float('ML_RELOAD_INTERVAL', default=5.0)
+
+# LRU cache of model outputs (ml_engine/cache.py). Features are rounded to
+# ML_PREDICTION_CACHE_DIGITS significant digits before prediction so that
+# nearby requests share an entry; ML_PREDICTION_CACHE_SIZE=0 disables both
+ML_PREDICTION_CACHE_SIZE = env.int('ML_PREDICTION_CACHE_SIZE', default=10000)
+ML_PREDICTION_CACHE_DIGITS = env.int('ML_PREDICTION_CACHE_DIGITS', default=4)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
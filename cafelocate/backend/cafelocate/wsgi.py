@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cafelocate.settings')
 
 application = get_wsgi_application()
+
+# Servers only: start loading the ML model now (ML_EAGER_LOAD)
+from ml_engine.apps import start_eager_load  # noqa: E402
+start_eager_load()
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class GeodbConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'geodb'
+    verbose_name = 'Spatial database mirrors'
+
+    def ready(self):
+        # Keep the geometry mirrors in sync with the api tables
+        from . import signals  # noqa: F401
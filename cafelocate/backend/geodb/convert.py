@@ -0,0 +1,115 @@
+"""
+JSON geometry columns (api models) → GEOS geometries (geodb mirrors).
+
+Used by the sync_geodb command and the signal handlers, so both build
+exactly the same geometries. Migration 0002 keeps its own frozen copy.
+"""
+
+import logging
+
+from django.contrib.gis.geos import LineString, MultiLineString, MultiPolygon, Point, Polygon
+
+from api.roads import geometry_lines
+from api.spatial_index import point_coordinates
+from api.wards import boundary_polygons
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+
+
+def point_geometry(location, latitude, longitude):
+    lat, lng = point_coordinates(location, latitude, longitude)
+    if lat is None:
+        return None
+    return Point(float(lng), float(lat), srid=4326)
+
+
+def road_geometry(geometry):
+    lines = [LineString(line) for line in geometry_lines(geometry) if len(line) >= 2]
+    if not lines:
+        return None
+    return MultiLineString(*lines, srid=4326)
+
+
+def ward_geometry(boundary):
+    polygons = [Polygon(*polygon) for polygon in boundary_polygons(boundary) if polygon]
+    if not polygons:
+        return None
+
+    multipolygon = MultiPolygon(*polygons, srid=4326)
+    if not multipolygon.valid:
+        # Self-touching rings in the source data; buffer(0) rebuilds a valid shape
+        fixed = multipolygon.buffer(0)
+        multipolygon = fixed if isinstance(fixed, MultiPolygon) else MultiPolygon(fixed, srid=4326)
+    return multipolygon
+
+
+# (api model, mirror model, mirror FK field, mirror geometry field, source fields, converter)
+MIRRORS = [
+    ('Cafe',    'CafeGeometry',    'cafe',    'location', ('location', 'latitude', 'longitude'), point_geometry),
+    ('Amenity', 'AmenityGeometry', 'amenity', 'location', ('location', 'latitude', 'longitude'), point_geometry),
+    ('Road',    'RoadGeometry',    'road',    'geometry', ('geometry',),                         road_geometry),
+    ('Ward',    'WardGeometry',    'ward',    'boundary', ('boundary',),                         ward_geometry),
+]
+
+
+def copy_all(get_model, only=None):
+    """
+    Rebuild every mirror table from the JSON columns.
+
+    Args:
+        get_model: (app_label, model_name) → model class — `apps.get_model`
+                   in a migration, django.apps.apps.get_model elsewhere.
+        only:      optional api model names ('Cafe', ...) to rebuild; default all
+
+    Returns:
+        {api model name: (copied, skipped)}
+    """
+    counts = {}
+    for source_name, mirror_name, fk, geom_field, fields, convert in MIRRORS:
+        if only is not None and source_name not in only:
+            continue
+        Source = get_model('api', source_name)
+        Mirror = get_model('geodb', mirror_name)
+
+        Mirror.objects.all().delete()
+        batch, copied, skipped = [], 0, 0
+        for row in Source.objects.values_list('pk', *fields).iterator():
+            try:
+                geometry = convert(*row[1:])
+            except Exception as e:  # malformed source geometry
+                logger.warning(f'{source_name} {row[0]}: {e}')
+                geometry = None
+
+            if geometry is None:
+                skipped += 1
+                continue
+
+            batch.append(Mirror(**{f'{fk}_id': row[0], geom_field: geometry}))
+            if len(batch) >= BATCH_SIZE:
+                Mirror.objects.bulk_create(batch)
+                copied += len(batch)
+                batch = []
+
+        Mirror.objects.bulk_create(batch)
+        copied += len(batch)
+        counts[source_name] = (copied, skipped)
+    return counts
+
+
+def sync_instance(instance):
+    """Create / update / delete the mirror row of one saved api object."""
+    from django.apps import apps
+
+    for source_name, mirror_name, fk, geom_field, fields, convert in MIRRORS:
+        if type(instance).__name__ != source_name:
+            continue
+
+        Mirror = apps.get_model('geodb', mirror_name)
+        geometry = convert(*(getattr(instance, field) for field in fields))
+        if geometry is None:
+            Mirror.objects.filter(**{f'{fk}_id': instance.pk}).delete()
+        else:
+            Mirror.objects.update_or_create(**{f'{fk}_id': instance.pk}, defaults={geom_field: geometry})
+        return
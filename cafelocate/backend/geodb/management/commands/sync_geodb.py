@@ -0,0 +1,16 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from geodb.convert import copy_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the geometry mirror tables (spatial database mode) from the api JSON columns'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        for model_name, (copied, skipped) in copy_all(apps.get_model).items():
+            self.stdout.write(f'  {model_name:<8} {copied:>7} copied, {skipped} skipped (no usable geometry)')
+
+        self.stdout.write(self.style.SUCCESS('✅ Geometry mirrors rebuilt'))
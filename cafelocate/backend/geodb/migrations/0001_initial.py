@@ -0,0 +1,55 @@
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('api', '0003_amenity_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CafeGeometry',
+            fields=[
+                ('cafe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='geo', serialize=False, to='api.cafe')),
+                ('location', django.contrib.gis.db.models.fields.PointField(srid=4326)),
+            ],
+            options={
+                'db_table': 'geo_cafes',
+            },
+        ),
+        migrations.CreateModel(
+            name='AmenityGeometry',
+            fields=[
+                ('amenity', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='geo', serialize=False, to='api.amenity')),
+                ('location', django.contrib.gis.db.models.fields.PointField(srid=4326)),
+            ],
+            options={
+                'db_table': 'geo_amenities',
+            },
+        ),
+        migrations.CreateModel(
+            name='RoadGeometry',
+            fields=[
+                ('road', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='geo', serialize=False, to='api.road')),
+                ('geometry', django.contrib.gis.db.models.fields.MultiLineStringField(srid=4326)),
+            ],
+            options={
+                'db_table': 'geo_roads',
+            },
+        ),
+        migrations.CreateModel(
+            name='WardGeometry',
+            fields=[
+                ('ward', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='geo', serialize=False, to='api.ward')),
+                ('boundary', django.contrib.gis.db.models.fields.MultiPolygonField(srid=4326)),
+            ],
+            options={
+                'db_table': 'geo_wards',
+            },
+        ),
+    ]
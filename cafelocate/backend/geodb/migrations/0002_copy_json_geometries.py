@@ -0,0 +1,126 @@
+import re
+
+from django.contrib.gis.geos import LineString, MultiLineString, MultiPolygon, Point, Polygon
+from django.db import migrations
+
+# Frozen copy of the geodb/convert.py code (and the api helpers it used)
+# this migration was written with: the live modules follow the current
+# models and must not change what an applied migration does.
+BATCH_SIZE = 2000
+
+_POLYGON_RE = re.compile(r'\(\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*\s*\)')
+_RING_RE    = re.compile(r'\(([^()]+)\)')
+_COORD_RE   = re.compile(r'[-+0-9.eE]+')
+
+
+def _parse_ring(text):
+    values = [float(v) for v in _COORD_RE.findall(text)]
+    ring = [values[i:i + 2] for i in range(0, len(values) - 1, 2)]
+    if ring and ring[0] != ring[-1]:
+        ring.append(ring[0])
+    return ring
+
+
+def boundary_polygons(boundary):
+    if not (boundary and isinstance(boundary, dict)):
+        return []
+
+    geom_type = boundary.get('type')
+    if geom_type == 'wkt':
+        wkt = (boundary.get('wkt') or '').strip()
+        if not wkt.upper().startswith(('POLYGON', 'MULTIPOLYGON')):
+            return []
+        return [[_parse_ring(ring) for ring in _RING_RE.findall(polygon)] for polygon in _POLYGON_RE.findall(wkt)]
+    if geom_type == 'Polygon':
+        return [boundary.get('coordinates', [])]
+    if geom_type == 'MultiPolygon':
+        return list(boundary.get('coordinates', []))
+    return []
+
+
+def geometry_lines(geometry):
+    if not (geometry and isinstance(geometry, dict)):
+        return []
+
+    coordinates = geometry.get('coordinates', [])
+    if geometry.get('type') == 'LineString':
+        return [coordinates] if coordinates else []
+    if geometry.get('type') == 'MultiLineString':
+        return [line for line in coordinates if line]
+    return []
+
+
+def point_geometry(location, latitude, longitude):
+    if location and isinstance(location, dict):
+        coords = location.get('coordinates', [None, None])
+        if len(coords) >= 2 and coords[0] is not None and coords[1] is not None:
+            return Point(float(coords[0]), float(coords[1]), srid=4326)
+    if latitude and longitude:
+        return Point(float(longitude), float(latitude), srid=4326)
+    return None
+
+
+def road_geometry(geometry):
+    lines = [LineString(line) for line in geometry_lines(geometry) if len(line) >= 2]
+    if not lines:
+        return None
+    return MultiLineString(*lines, srid=4326)
+
+
+def ward_geometry(boundary):
+    polygons = [Polygon(*polygon) for polygon in boundary_polygons(boundary) if polygon]
+    if not polygons:
+        return None
+
+    multipolygon = MultiPolygon(*polygons, srid=4326)
+    if not multipolygon.valid:
+        fixed = multipolygon.buffer(0)
+        multipolygon = fixed if isinstance(fixed, MultiPolygon) else MultiPolygon(fixed, srid=4326)
+    return multipolygon
+
+
+# (api model, mirror model, mirror FK field, mirror geometry field, source fields, converter)
+MIRRORS = [
+    ('Cafe',    'CafeGeometry',    'cafe',    'location', ('location', 'latitude', 'longitude'), point_geometry),
+    ('Amenity', 'AmenityGeometry', 'amenity', 'location', ('location', 'latitude', 'longitude'), point_geometry),
+    ('Road',    'RoadGeometry',    'road',    'geometry', ('geometry',),                         road_geometry),
+    ('Ward',    'WardGeometry',    'ward',    'boundary', ('boundary',),                         ward_geometry),
+]
+
+
+def copy_geometries(apps, schema_editor):
+    for source_name, mirror_name, fk, geom_field, fields, convert in MIRRORS:
+        Source = apps.get_model('api', source_name)
+        Mirror = apps.get_model('geodb', mirror_name)
+
+        Mirror.objects.all().delete()
+        batch = []
+        for row in Source.objects.values_list('pk', *fields).iterator():
+            try:
+                geometry = convert(*row[1:])
+            except Exception:  # malformed source geometry
+                geometry = None
+            if geometry is None:
+                continue
+
+            batch.append(Mirror(**{f'{fk}_id': row[0], geom_field: geometry}))
+            if len(batch) >= BATCH_SIZE:
+                Mirror.objects.bulk_create(batch)
+                batch = []
+        Mirror.objects.bulk_create(batch)
+
+
+def clear_geometries(apps, schema_editor):
+    for name in ('CafeGeometry', 'AmenityGeometry', 'RoadGeometry', 'WardGeometry'):
+        apps.get_model('geodb', name).objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geodb', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_geometries, clear_geometries),
+    ]
@@ -0,0 +1,57 @@
+"""
+Real geometry columns for the spatial database mode (settings.SPATIAL_DB).
+
+The api tables keep their GeoJSON / WKT JSONFields so the default SQLite
+deployment works without GDAL. When the spatial mode is on, every Cafe,
+Amenity, Road and Ward gets a one-to-one mirror row here with an indexed
+geometry column (R*Tree on SpatiaLite, GiST on PostGIS), so spatial
+predicates run in the database instead of in Python.
+"""
+
+from django.contrib.gis.db import models
+
+
+# ═══════════════════════════════════════════════════════════════════
+# CafeGeometry / AmenityGeometry: point locations
+# ═══════════════════════════════════════════════════════════════════
+class CafeGeometry(models.Model):
+
+    cafe     = models.OneToOneField('api.Cafe', on_delete=models.CASCADE, primary_key=True, related_name='geo')
+    # srid=4326 → WGS84 lng/lat; spatial_index builds the R*Tree / GiST index
+    location = models.PointField(srid=4326, spatial_index=True)
+
+    class Meta:
+        db_table = 'geo_cafes'
+
+
+class AmenityGeometry(models.Model):
+
+    amenity  = models.OneToOneField('api.Amenity', on_delete=models.CASCADE, primary_key=True, related_name='geo')
+    location = models.PointField(srid=4326, spatial_index=True)
+
+    class Meta:
+        db_table = 'geo_amenities'
+
+
+# ═══════════════════════════════════════════════════════════════════
+# RoadGeometry: road centre lines
+# ═══════════════════════════════════════════════════════════════════
+class RoadGeometry(models.Model):
+
+    road     = models.OneToOneField('api.Road', on_delete=models.CASCADE, primary_key=True, related_name='geo')
+    geometry = models.MultiLineStringField(srid=4326, spatial_index=True)
+
+    class Meta:
+        db_table = 'geo_roads'
+
+
+# ═══════════════════════════════════════════════════════════════════
+# WardGeometry: ward boundaries
+# ═══════════════════════════════════════════════════════════════════
+class WardGeometry(models.Model):
+
+    ward     = models.OneToOneField('api.Ward', on_delete=models.CASCADE, primary_key=True, related_name='geo')
+    boundary = models.MultiPolygonField(srid=4326, spatial_index=True)
+
+    class Meta:
+        db_table = 'geo_wards'
@@ -0,0 +1,174 @@
+"""
+Spatial queries executed by the database (settings.SPATIAL_DB).
+
+Each function returns exactly what its in-memory counterpart in the api app
+returns, so the views do not care which mode is active:
+
+    nearby_cafes        ↔ api.spatial_index.nearby_cafes
+    amenities_within    ↔ api.amenities.amenities_within
+    amenity_report      ↔ api.amenities.amenity_report
+    road_length_within  ↔ api.roads.road_length_within
+    location_distances  ↔ api.rtree.location_distances (ml_engine.features)
+    locate_ward         ↔ api.wards.locate_ward
+
+Radius filters use ST_DWithin (PostGIS) / PtDistWithin (SpatiaLite).
+PostGIS picks up its GiST index by itself; SpatiaLite only uses its R*Tree
+through the SpatialIndex virtual table, so that pre-filter is added
+explicitly.
+"""
+
+import math
+from collections import defaultdict
+
+import numpy as np
+from django.contrib.gis.db.models.functions import Distance, Intersection, Length
+from django.contrib.gis.geos import Point, Polygon
+from django.contrib.gis.measure import D
+from django.db import connection
+
+from api.distance import degree_box, metres_per_degree
+
+from .models import AmenityGeometry, CafeGeometry, RoadGeometry, WardGeometry
+
+CIRCLE_SEGMENTS = 64
+
+
+def circle_polygon(lat, lng, radius_m, segments=CIRCLE_SEGMENTS):
+    """Polygon (lng/lat, srid 4326) approximating a circle of radius_m metres."""
+    m_lat, m_lng = metres_per_degree(lat)
+    ring = []
+    for i in range(segments):
+        angle = 2 * math.pi * i / segments
+        ring.append((lng + radius_m * math.cos(angle) / m_lng, lat + radius_m * math.sin(angle) / m_lat))
+    ring.append(ring[0])
+    return Polygon(ring, srid=4326)
+
+
+def _within(queryset, field, lat, lng, radius_m):
+    """Rows whose `field` is within radius_m metres of (lat, lng), index-assisted."""
+    point = Point(lng, lat, srid=4326)
+
+    if connection.vendor == 'postgresql':
+        # ST_DWithin on a 4326 geometry takes degrees: use the widest degree span
+        # of the circle for the indexed test, then the exact spheroid distance
+        _, m_lng = metres_per_degree(lat)
+        queryset = queryset.filter(**{
+            f'{field}__dwithin': (point, radius_m / m_lng),
+            f'{field}__distance_lte': (point, D(m=radius_m)),
+        })
+        return queryset.annotate(distance=Distance(field, point))
+
+    # SpatiaLite: PtDistWithin takes metres for 4326 geometries
+    queryset = queryset.filter(**{f'{field}__dwithin': (point, radius_m)})
+    return _spatialite_bbox(queryset, degree_box(lat, lng, radius_m)).annotate(distance=Distance(field, point))
+
+
+def _spatialite_bbox(queryset, box):
+    """Restrict a SpatiaLite queryset to rows whose R*Tree entry overlaps box."""
+    table = queryset.model._meta.db_table
+    column = {'geo_roads': 'geometry', 'geo_wards': 'boundary'}.get(table, 'location')
+    return queryset.extra(
+        where=[
+            f'"{table}".rowid IN (SELECT rowid FROM SpatialIndex '
+            f"WHERE f_table_name = '{table}' AND f_geometry_column = '{column}' "
+            f'AND search_frame = BuildMbr(%s, %s, %s, %s, 4326))'
+        ],
+        params=list(box),
+    )
+
+
+def nearby_cafes(lat, lng, radius_m):
+    rows = _within(CafeGeometry.objects.filter(cafe__is_open=True), 'location', lat, lng, radius_m)
+    cafes = []
+    for geometry in rows.select_related('cafe').order_by('distance'):
+        cafe = geometry.cafe
+        cafe.distance = geometry.distance.m
+        cafes.append(cafe)
+    return cafes
+
+
+def amenities_within(lat, lng, radius_m, amenity_type=''):
+    from api.taxonomy import category_from_slug
+
+    rows = AmenityGeometry.objects.all()
+    if amenity_type:
+        category = category_from_slug(amenity_type)
+        if category is not None:
+            rows = rows.filter(amenity__category=category)
+        else:
+            rows = rows.filter(amenity__amenity_type__icontains=amenity_type)
+
+    amenities = []
+    for geometry in _within(rows, 'location', lat, lng, radius_m).select_related('amenity').order_by('distance'):
+        amenity = geometry.amenity
+        amenity.distance = geometry.distance.m
+        amenities.append(amenity)
+    return amenities
+
+
+def amenity_report(lat, lng, radius_m, categories, top_n=20):
+    from api.amenities import report_from_hits
+
+    rows = _within(AmenityGeometry.objects.filter(amenity__category__in=list(categories)), 'location', lat, lng, radius_m)
+    hits = list(rows.order_by('distance').values_list('amenity_id', 'distance', 'amenity__category'))
+    return report_from_hits(
+        categories,
+        [amenity_id for amenity_id, _, _ in hits],
+        [distance.m for _, distance, _ in hits],
+        [category for _, _, category in hits],
+        top_n,
+    )
+
+
+def road_length_within(lat, lng, radius_m):
+    circle = circle_polygon(lat, lng, radius_m)
+    rows = RoadGeometry.objects.filter(geometry__intersects=circle)
+    if connection.vendor != 'postgresql':
+        rows = _spatialite_bbox(rows, circle.extent)
+    rows = rows.annotate(clipped=Length(Intersection('geometry', circle)))
+
+    total, by_type, n_roads = 0.0, defaultdict(float), 0
+    for road_type, clipped in rows.values_list('road__road_type', 'clipped'):
+        if clipped is None or clipped.m <= 0:
+            continue
+        total += clipped.m
+        by_type[road_type or 'unknown'] += clipped.m
+        n_roads += 1
+    return total, dict(by_type), n_roads
+
+
+def location_distances(lat, lng, radius_m, categories):
+    """
+    Ascending distances (m) of the open cafés, the amenities of the given
+    categories (with their categories) and the roads within radius_m.
+
+    Returns:
+        (cafe distances, amenity distances, amenity categories, road distances)
+    """
+    cafes = _within(CafeGeometry.objects.filter(cafe__is_open=True), 'location', lat, lng, radius_m)
+    cafe_d = [distance.m for distance in cafes.order_by('distance').values_list('distance', flat=True)]
+
+    amenities = _within(AmenityGeometry.objects.filter(amenity__category__in=list(categories)), 'location', lat, lng, radius_m)
+    amenities = list(amenities.order_by('distance').values_list('distance', 'amenity__category'))
+
+    roads = _within(RoadGeometry.objects.all(), 'geometry', lat, lng, radius_m)
+    road_d = [distance.m for distance in roads.order_by('distance').values_list('distance', flat=True)]
+
+    return (
+        np.array(cafe_d, dtype=np.float64),
+        np.array([distance.m for distance, _ in amenities], dtype=np.float64),
+        np.array([category for _, category in amenities], dtype=np.intp),
+        np.array(road_d, dtype=np.float64),
+    )
+
+
+def locate_ward(lat, lng):
+    from api.wards import WARD_FIELDS
+
+    point = Point(lng, lat, srid=4326)
+    rows = WardGeometry.objects.filter(boundary__contains=point)
+    if connection.vendor != 'postgresql':
+        rows = _spatialite_bbox(rows, (lng, lat, lng, lat))
+    fields = [f'ward__{field}' for field in WARD_FIELDS]
+    row = rows.order_by('ward__ward_number').values_list(*fields).first()
+    return dict(zip(WARD_FIELDS, row)) if row else None
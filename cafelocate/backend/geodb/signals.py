@@ -0,0 +1,22 @@
+"""
+Keep the geometry mirrors in sync with the api tables.
+
+Like api/signals.py, bulk operations do not send these signals — run
+`python manage.py sync_geodb` after bulk loads.
+"""
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from api.models import Amenity, Cafe, Road, Ward
+
+from .convert import sync_instance
+
+
+@receiver(post_save, sender=Cafe)
+@receiver(post_save, sender=Amenity)
+@receiver(post_save, sender=Road)
+@receiver(post_save, sender=Ward)
+def geometry_source_saved(sender, instance, **kwargs):
+    # Deletes cascade through the one-to-one keys
+    sync_instance(instance)
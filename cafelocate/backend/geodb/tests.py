@@ -0,0 +1,194 @@
+"""
+Parity of geodb/queries.py with the in-memory functions of the api app.
+
+Only meaningful with the spatial database on (SPATIAL_DB=True, SpatiaLite
+for the default db.sqlite3 setup), which needs GDAL:
+
+    SPATIAL_DB=True python manage.py test geodb
+
+Skipped otherwise. The database measures distances on the WGS84 ellipsoid
+and clips roads with a 64-sided polygon, the api app uses a sphere and the
+exact circle, so values are compared to within 0.5 % (1 % for road length)
+and the circles are chosen with nothing within 1 % of their edge.
+"""
+
+import unittest
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+
+try:
+    from django.contrib.gis import gdal  # noqa: F401
+    GDAL_AVAILABLE = True
+except (ImportError, ImproperlyConfigured):
+    GDAL_AVAILABLE = False
+
+IN_MEMORY = override_settings(SPATIAL_DB=False, SPATIAL_INDEX='memory')
+
+CENTER = (27.70, 85.32)
+WARD_SIZE = 0.02   # degrees; 2 × 2 wards around CENTER
+
+
+def _ring(lat0, lng0, size):
+    return [[lng0, lat0], [lng0 + size, lat0], [lng0 + size, lat0 + size], [lng0, lat0 + size], [lng0, lat0]]
+
+
+@unittest.skipUnless(GDAL_AVAILABLE and settings.SPATIAL_DB, 'needs GDAL and SPATIAL_DB=True')
+class SpatialQueryParityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        from api.models import Amenity, Cafe, Road, Ward
+
+        rng = np.random.default_rng(7)
+        lat0, lng0 = CENTER
+        # Saved one by one: the post_save signals fill the geodb mirrors
+        for i, (lat, lng) in enumerate(zip(rng.uniform(lat0 - 0.015, lat0 + 0.015, 80),
+                                           rng.uniform(lng0 - 0.015, lng0 + 0.015, 80))):
+            Cafe.objects.create(
+                place_id=f'test-{i}', name=f'Café {i}', cafe_type='coffee_shop',
+                latitude=lat, longitude=lng, location={'type': 'Point', 'coordinates': [lng, lat]},
+                rating=float(rng.uniform(2, 5)), review_count=int(rng.integers(0, 500)),
+            )
+
+        amenity_types = ['school', 'hospital', 'bus_stop', 'pharmacy', 'bank']
+        for i, (lat, lng) in enumerate(zip(rng.uniform(lat0 - 0.015, lat0 + 0.015, 200),
+                                           rng.uniform(lng0 - 0.015, lng0 + 0.015, 200))):
+            Amenity.objects.create(osm_id=i, amenity_type=amenity_types[i % len(amenity_types)],
+                                   name=f'Amenity {i}', latitude=lat, longitude=lng)
+
+        road_types = ['primary', 'residential', '']
+        for i in range(40):
+            steps = rng.normal(0, 0.002, (int(rng.integers(2, 6)), 2))
+            start = [lng0 + rng.uniform(-0.015, 0.015), lat0 + rng.uniform(-0.015, 0.015)]
+            line = (start + np.cumsum(steps, axis=0)).tolist()
+            Road.objects.create(osm_id=i, road_type=road_types[i % len(road_types)],
+                                geometry={'type': 'LineString', 'coordinates': [start] + line})
+
+        for number, (row, col) in enumerate([(0, 0), (0, 1), (1, 0), (1, 1)], start=1):
+            boundary = _ring(lat0 - WARD_SIZE + row * WARD_SIZE, lng0 - WARD_SIZE + col * WARD_SIZE, WARD_SIZE)
+            Ward.objects.create(ward_number=number, population=10000 * number, households=2000 * number,
+                                area_sqkm=4.8, population_density=2000 * number,
+                                boundary={'type': 'Polygon', 'coordinates': [boundary]})
+
+    @classmethod
+    def tearDownClass(cls):
+        from api.amenities import invalidate_amenity_index
+        from api.roads import invalidate_road_index
+        from api.spatial_index import invalidate_cafe_index
+        from api.wards import invalidate_ward_locator
+
+        # The indexes were built from rows that are gone after this class
+        for invalidate in (invalidate_cafe_index, invalidate_amenity_index, invalidate_road_index, invalidate_ward_locator):
+            invalidate()
+        super().tearDownClass()
+
+    def circles(self, radii, n=40):
+        """(lat, lng, radius) with no café, amenity or road within 1 % of the edge."""
+        from api.amenities import get_amenity_index
+        from api.roads import get_road_index
+        from api.spatial_index import get_cafe_index
+
+        rng = np.random.default_rng(11)
+        found = []
+        with IN_MEMORY:
+            for lat, lng, radius in zip(rng.uniform(CENTER[0] - 0.012, CENTER[0] + 0.012, 10 * n),
+                                        rng.uniform(CENTER[1] - 0.012, CENTER[1] + 0.012, 10 * n),
+                                        rng.choice(radii, 10 * n)):
+                radius = float(radius)
+                distances = np.concatenate([
+                    get_cafe_index().query_radius(lat, lng, 1.01 * radius)[1],
+                    get_amenity_index().query_radius(lat, lng, 1.01 * radius)[1],
+                    get_road_index().distances_within(lat, lng, 1.01 * radius)[1],
+                ])
+                if not np.any(distances >= 0.99 * radius):
+                    found.append((float(lat), float(lng), radius))
+                if len(found) == n:
+                    break
+        self.assertGreater(len(found), n // 2)
+        return found
+
+    def assert_distances_match(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        np.testing.assert_allclose(np.sort(actual), np.sort(expected), rtol=5e-3, atol=0.5)
+
+    def test_nearby_cafes(self):
+        from api.spatial_index import nearby_cafes
+        from geodb import queries
+
+        for lat, lng, radius in self.circles([100, 300, 800]):
+            with IN_MEMORY:
+                expected = {cafe.id: cafe.distance for cafe in nearby_cafes(lat, lng, radius)}
+            actual = {cafe.id: cafe.distance for cafe in queries.nearby_cafes(lat, lng, radius)}
+            self.assertEqual(set(actual), set(expected))
+            self.assert_distances_match([actual[i] for i in expected], list(expected.values()))
+
+    def test_amenity_report(self):
+        from api.amenities import amenity_report
+        from api.taxonomy import AmenityCategory
+        from geodb import queries
+
+        categories = [AmenityCategory.SCHOOL, AmenityCategory.HOSPITAL, AmenityCategory.BUS_STATION, AmenityCategory.BANK]
+        for lat, lng, radius in self.circles([200, 500, 1000]):
+            with IN_MEMORY:
+                expected = amenity_report(lat, lng, radius, categories, top_n=1000)
+            actual = queries.amenity_report(lat, lng, radius, categories, top_n=1000)
+            for category in categories:
+                self.assertEqual(actual[category]['count'], expected[category]['count'])
+                self.assertEqual({a.id for a in actual[category]['amenities']},
+                                 {a.id for a in expected[category]['amenities']})
+                if expected[category]['count']:
+                    self.assertAlmostEqual(actual[category]['nearest_distance_m'],
+                                           expected[category]['nearest_distance_m'],
+                                           delta=5e-3 * expected[category]['nearest_distance_m'] + 0.5)
+
+    def test_road_length_within(self):
+        from api.roads import road_length_within
+        from geodb import queries
+
+        for lat, lng, radius in self.circles([200, 500, 1000]):
+            with IN_MEMORY:
+                total, by_type, n_roads = road_length_within(lat, lng, radius)
+            actual_total, actual_by_type, actual_n_roads = queries.road_length_within(lat, lng, radius)
+            self.assertEqual(actual_n_roads, n_roads)
+            self.assertEqual(set(actual_by_type), set(by_type))
+            np.testing.assert_allclose(actual_total, total, rtol=1e-2, atol=1.0)
+            for road_type, metres in by_type.items():
+                np.testing.assert_allclose(actual_by_type[road_type], metres, rtol=1e-2, atol=1.0)
+
+    def test_location_distances(self):
+        from api.taxonomy import AmenityCategory
+        from geodb import queries
+        from ml_engine.features import RADIUS_M, _indexed_distances
+
+        categories = (AmenityCategory.SCHOOL, AmenityCategory.HOSPITAL, AmenityCategory.BUS_STATION)
+        for lat, lng, radius in self.circles([RADIUS_M]):
+            with IN_MEMORY:
+                cafe_d, amenity_d, amenity_categories, road_d = next(_indexed_distances(np.array([lat]), np.array([lng])))
+            wanted = np.isin(amenity_categories, categories)
+            actual = queries.location_distances(lat, lng, radius, categories)
+
+            self.assert_distances_match(actual[0], cafe_d)
+            for category in categories:
+                self.assert_distances_match(actual[1][actual[2] == category],
+                                            amenity_d[wanted & (amenity_categories == category)])
+            self.assert_distances_match(actual[3], road_d)
+
+    def test_locate_ward(self):
+        from api.wards import locate_ward
+        from geodb import queries
+
+        rng = np.random.default_rng(3)
+        lat0, lng0 = CENTER
+        points = list(zip(rng.uniform(lat0 - 0.019, lat0 + 0.019, 60), rng.uniform(lng0 - 0.019, lng0 + 0.019, 60)))
+        # Keep clear of the shared ward edges; add one point outside every ward
+        points = [(lat, lng) for lat, lng in points if abs(lat - lat0) > 1e-4 and abs(lng - lng0) > 1e-4]
+        points.append((lat0 + 0.05, lng0 + 0.05))
+
+        for lat, lng in points:
+            with IN_MEMORY:
+                expected = locate_ward(lat, lng)
+            self.assertEqual(queries.locate_ward(float(lat), float(lng)), expected)
+        self.assertIsNone(expected)
@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class MlEngineConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ml_engine'
+
+
+def start_eager_load():
+    """
+    Load the model in the background as soon as the server starts instead
+    of on the first request. Called from the WSGI / ASGI entry points only
+    (runserver imports cafelocate/wsgi.py too), so management commands and
+    the ml/ scripts that call django.setup() never start the loader thread.
+    """
+    if not settings.ML_EAGER_LOAD:
+        return
+
+    from .predictor import load_model_async
+    load_model_async()
@@ -0,0 +1,81 @@
+"""
+Bounded LRU cache of model outputs, keyed on quantized feature vectors.
+
+Nearby /api/analyze/ and /api/predict/ calls produce almost the same
+features (same competitors, road length within a few metres, same ward
+density). Features are rounded to a few significant digits and the model
+is run on the ROUNDED vector, so a cached answer is exactly what the model
+would return for that request — caching never changes a result, it only
+skips the forest.
+
+Entries are keyed by the model's sha1 as well, and the predictor clears the
+cache when it swaps in a new model.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def quantize(X, digits):
+    """Round every value of a 2-D array to `digits` significant digits (0 stays 0)."""
+    X = np.asarray(X, dtype=np.float64)
+    magnitude = np.floor(np.log10(np.abs(X), where=X != 0, out=np.zeros_like(X)))
+    decimals = digits - 1 - magnitude
+    # divide / multiply by an exact power of ten so 98765.4 → 98770.0 (not 98770.00000000001)
+    up, down = 10.0 ** np.maximum(decimals, 0), 10.0 ** np.maximum(-decimals, 0)
+    return np.round(X * up / down) * down / up
+
+
+class PredictionCache:
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock    = threading.Lock()
+        self.hits     = 0
+        self.misses   = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        """Cached value per key (None for misses); hits become most recently used."""
+        values = []
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                values.append(value)
+        return values
+
+    def put_many(self, items):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry (hit/miss counters are kept)."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size':     len(self._entries),
+                'max_size': self.max_size,
+                'hits':     self.hits,
+                'misses':   self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
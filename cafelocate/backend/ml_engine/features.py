@@ -0,0 +1,155 @@
+"""
+Location features — the 17-column schema of cafe_location_training_dataset.csv.
+
+One module computes them for both sides:
+  - training:  ml/build_training_dataset.py (any number of sampled points)
+  - serving:   /api/analyze/ and the heatmap (api/analysis.py), for the
+               sites being analysed — and as model input when the served
+               registry version was trained on them
+
+Every layer (competitors, schools, hospitals, bus stops, roads) is queried
+ONCE at the largest radius and comes back as an ascending array of
+distances. All its features are then read off that one array: the count
+within each radius is a searchsorted() on it, the minimum is its first
+element and the average its mean. Adding a radius costs a binary search,
+not another spatial query.
+
+Derived scores:
+    population_density_proxy  (2·schools + 5·hospitals + 3·bus stops) within 500 m, per km²
+    competition_pressure      competitors within 500 m per km² / 2, plus up to 0.5
+                              for a competitor closer than 200 m (capped at 10)
+    accessibility_score       0.6 per road within 500 m (at most 10), weighted by
+                              (1 - avg distance / 500), + 4/3·Σ (1 - d / 500) over bus stops
+    foot_traffic_score        0.3 per school, 0.4 per hospital, 0.3 per bus stop within 500 m
+                              (capped at 10)
+
+ml/train_model.py trains on the rows build_training_dataset.py writes with
+these functions, so a served model sees the features it was trained on.
+"""
+
+import math
+
+import numpy as np
+
+RADIUS_M      = 500   # "within_500m" features; also the default distance when nothing is that close
+NEAR_RADIUS_M = 200   # "within_200m" features
+
+# Column order the suitability models are trained on
+LOCATION_FEATURES = [
+    'competitors_within_500m', 'competitors_within_200m', 'competitors_min_distance', 'competitors_avg_distance',
+    'roads_within_500m', 'roads_avg_distance',
+    'schools_within_500m', 'schools_within_200m', 'schools_min_distance',
+    'hospitals_within_500m', 'hospitals_min_distance',
+    'bus_stops_within_500m', 'bus_stops_min_distance',
+    'population_density_proxy', 'accessibility_score', 'foot_traffic_score', 'competition_pressure',
+]
+
+
+def distance_stats(distances, radii=(RADIUS_M,)):
+    """
+    Features of one layer from its ascending distances (all within max(radii)).
+
+    Returns:
+        (counts within each radius, min distance, avg distance) — min/avg
+        are RADIUS_M when nothing is in range
+    """
+    counts = np.searchsorted(distances, radii, side='right').tolist()
+    if not len(distances):
+        return counts, float(RADIUS_M), float(RADIUS_M)
+    return counts, float(distances[0]), float(distances.mean())
+
+
+def location_features(cafes, schools, hospitals, bus_stops, roads) -> dict:
+    """
+    The 17 features of one point from the ascending distances (metres,
+    all within RADIUS_M) of each layer; roads: one distance per road.
+    """
+    area_km2 = math.pi * (RADIUS_M / 1000) ** 2
+
+    (c500, c200), c_min, c_avg = distance_stats(cafes, (RADIUS_M, NEAR_RADIUS_M))
+    (s500, s200), s_min, _     = distance_stats(schools, (RADIUS_M, NEAR_RADIUS_M))
+    (h500,), h_min, _          = distance_stats(hospitals)
+    (b500,), b_min, _          = distance_stats(bus_stops)
+    (r500,), _, r_avg          = distance_stats(roads)
+
+    competition = c500 / area_km2 / 2
+    if c500:
+        competition += 0.5 * max(0.0, 1 - c_min / NEAR_RADIUS_M)
+    road_access = 0.6 * min(r500, 10) * (1 - r_avg / RADIUS_M)
+    bus_access  = 4 / 3 * float(np.sum(1 - bus_stops / RADIUS_M))
+
+    return {
+        'competitors_within_500m':  c500,
+        'competitors_within_200m':  c200,
+        'competitors_min_distance': round(c_min, 2),
+        'competitors_avg_distance': round(c_avg, 2),
+        'roads_within_500m':        r500,
+        'roads_avg_distance':       round(r_avg, 2),
+        'schools_within_500m':      s500,
+        'schools_within_200m':      s200,
+        'schools_min_distance':     round(s_min, 2),
+        'hospitals_within_500m':    h500,
+        'hospitals_min_distance':   round(h_min, 2),
+        'bus_stops_within_500m':    b500,
+        'bus_stops_min_distance':   round(b_min, 2),
+        'population_density_proxy': round((2 * s500 + 5 * h500 + 3 * b500) / area_km2, 2),
+        'accessibility_score':      round(min(10.0, road_access + bus_access), 2),
+        'foot_traffic_score':       round(min(10.0, 0.3 * s500 + 0.4 * h500 + 0.3 * b500), 1),
+        'competition_pressure':     round(min(10.0, competition), 2),
+    }
+
+
+def extract_location_features(lats, lngs, in_memory=False) -> list:
+    """
+    location_features() of many points. On the in-memory indexes: one café
+    query and one amenity query (all categories) for all points at once,
+    and one road query per point. With a query backend active (spatial
+    database or SQLite R*Tree, api.spatial_index.query_backend()) each
+    point is one location_distances() call there instead, so no in-memory
+    index is built; in_memory=True forces the indexes (dataset building,
+    which queries far more points than any request).
+
+    Returns:
+        list of feature dicts, in the same order as the points
+    """
+    from api.spatial_index import query_backend
+    from api.taxonomy import AmenityCategory
+
+    lats = np.atleast_1d(np.asarray(lats, dtype=np.float64))
+    lngs = np.atleast_1d(np.asarray(lngs, dtype=np.float64))
+    categories = (AmenityCategory.SCHOOL, AmenityCategory.HOSPITAL, AmenityCategory.BUS_STATION)
+
+    backend = None if in_memory else query_backend()
+    if backend is not None:
+        distances = (backend.location_distances(lat, lng, RADIUS_M, categories)
+                     for lat, lng in zip(lats.tolist(), lngs.tolist()))
+    else:
+        distances = _indexed_distances(lats, lngs)
+
+    rows = []
+    for cafe_d, amenity_d, amenity_categories, road_d in distances:
+        # Boolean masks keep each category's distances in ascending order
+        rows.append(location_features(
+            cafes=cafe_d,
+            schools=amenity_d[amenity_categories == AmenityCategory.SCHOOL],
+            hospitals=amenity_d[amenity_categories == AmenityCategory.HOSPITAL],
+            bus_stops=amenity_d[amenity_categories == AmenityCategory.BUS_STATION],
+            roads=road_d,
+        ))
+    return rows
+
+
+def _indexed_distances(lats, lngs):
+    """location_distances() of every point, on the in-memory indexes."""
+    from api.amenities import get_amenity_index
+    from api.roads import get_road_index
+    from api.spatial_index import get_cafe_index
+
+    amenity_index = get_amenity_index()
+    road_index    = get_road_index()
+    cafes     = get_cafe_index().query_radius_many(lats, lngs, RADIUS_M)
+    amenities = amenity_index.query_radius_many(lats, lngs, RADIUS_M)
+
+    for (lat, lng), (_, cafe_d), (positions, amenity_d) in zip(zip(lats.tolist(), lngs.tolist()), cafes, amenities):
+        _, road_d = road_index.distances_within(lat, lng, RADIUS_M)
+        yield cafe_d, amenity_d, amenity_index.categories[positions], road_d
@@ -0,0 +1,95 @@
+"""
+Flattened random-forest inference.
+
+sklearn's RandomForestClassifier.predict_proba() has a fixed per-call
+overhead (input validation, a thread pool, one Cython call per tree) that
+dwarfs the actual work for a single row. FlatForest copies every tree's
+nodes into a few flat NumPy arrays ONCE at load time and walks all trees
+together, one level per step.
+
+The arithmetic follows sklearn's steps, so the probabilities are equal to
+sklearn's within floating-point rounding:
+  - inputs are cast to float32 before comparing with the (float64) thresholds
+  - each leaf's class weights are normalised to sum to 1
+  - tree probabilities are added in tree order, then divided by n_trees
+"""
+
+import numpy as np
+
+
+class FlatForest:
+
+    def __init__(self, feature, threshold, left, right, leaf_proba, roots, depth, classes):
+        self.feature    = feature      # (n_nodes,) feature tested at each node (0 at leaves)
+        self.threshold  = threshold    # (n_nodes,) go left when x[feature] <= threshold
+        self.left       = left         # (n_nodes,) global child indices; leaves point to themselves
+        self.right      = right
+        self.leaf_proba = leaf_proba   # (n_nodes, n_classes) normalised class weights
+        self.roots      = roots        # (n_trees,) index of each tree's root
+        self.depth      = depth        # deepest tree → number of steps to reach every leaf
+        self.classes_   = classes
+        self.source     = None         # identifies the model file this was compiled from
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted single-output RandomForestClassifier (or any forest of DecisionTreeClassifiers)."""
+        features, thresholds, lefts, rights, probas, roots = [], [], [], [], [], []
+        offset, depth = 0, 0
+        n_classes = len(model.classes_)
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n = tree.node_count
+            nodes = np.arange(n)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature).astype(np.intp))
+            thresholds.append(tree.threshold.astype(np.float64))
+            lefts.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+
+            # Same normalisation as DecisionTreeClassifier.predict_proba()
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, np.newaxis]
+            normalizer[normalizer == 0.0] = 1.0
+            probas.append(value / normalizer)
+
+            roots.append(offset)
+            offset += n
+            depth = max(depth, tree.max_depth)
+
+        return cls(
+            feature=np.concatenate(features),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            leaf_proba=np.concatenate(probas),
+            roots=np.asarray(roots, dtype=np.intp),
+            depth=depth,
+            classes=np.asarray(model.classes_),
+        )
+
+    def __len__(self):
+        return len(self.roots)
+
+    def apply(self, X):
+        """Leaf index reached in every tree: shape (n_samples, n_trees)."""
+        # sklearn's trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(len(X))[:, np.newaxis]
+
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba(self, X):
+        """Class probabilities, shape (n_samples, n_classes) — equal to the sklearn forest's within floating-point rounding."""
+        leaves = self.apply(X)
+        # (n_trees, n_samples, n_classes); cumsum adds the trees one by one, in order
+        per_tree = self.leaf_proba[leaves.T]
+        return np.cumsum(per_tree, axis=0)[-1] / len(self.roots)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_engine import registry
+from ml_engine.predictor import check_compatible
+
+
+class Command(BaseCommand):
+    help = 'List registered model versions, or make one the active version'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'version',
+            nargs='?',
+            type=str,
+            help='Version to activate (omit to list the registered versions)'
+        )
+
+    def handle(self, *args, **options):
+        version = options['version']
+        if not version:
+            active = registry.active_version()
+            versions = registry.list_versions()
+            if not versions:
+                self.stdout.write('No registered versions (serving ml_engine/models/rf_model.pkl)')
+            for name in versions:
+                manifest = registry.read_manifest(name)
+                marker = '*' if name == active else ' '
+                self.stdout.write(f"{marker} {name:<20} {manifest['created_at']}  {manifest.get('metrics') or ''}")
+            return
+
+        try:
+            check_compatible(registry.read_manifest(version))
+            registry.activate(version)
+        except registry.RegistryError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Version {version} is now active (running servers swap it in within ML_RELOAD_INTERVAL seconds)'
+        ))
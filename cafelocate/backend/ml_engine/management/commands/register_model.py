@@ -0,0 +1,91 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ml_engine import registry
+from ml_engine.predictor import FEATURE_NAMES, check_compatible
+
+
+class Command(BaseCommand):
+    help = 'Copy a trained model + label encoder (+ feature scaler) into a new version of the model registry'
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', type=str, help='Fitted classifier (.pkl)')
+        parser.add_argument('encoder', type=str, help='LabelEncoder for its classes (.pkl)')
+        parser.add_argument(
+            '--name',
+            type=str,
+            default=None,
+            help='Version name (default: UTC timestamp, e.g. 20261017-142501)'
+        )
+        parser.add_argument(
+            '--scaler',
+            type=str,
+            default=None,
+            help='Fitted feature scaler (.pkl, e.g. suitability_scaler.pkl) applied before the model'
+        )
+        parser.add_argument(
+            '--features',
+            type=str,
+            default=None,
+            help='Comma-separated feature names in training column order (default: the names the '
+                 f'scaler/model were fitted with, else {",".join(FEATURE_NAMES)})'
+        )
+        parser.add_argument(
+            '--metrics',
+            type=str,
+            default=None,
+            help='JSON file (or inline JSON object) of evaluation metrics to store in the manifest'
+        )
+        parser.add_argument('--notes', type=str, default='', help='Free-text notes for the manifest')
+        parser.add_argument(
+            '--activate',
+            action='store_true',
+            help='Make the new version active (running servers swap it in without a restart)'
+        )
+
+    def handle(self, *args, **options):
+        metrics = self._read_metrics(options['metrics'])
+
+        try:
+            if options['features']:
+                features = [name.strip() for name in options['features'].split(',') if name.strip()]
+            else:
+                features = registry.trained_features(options['model'], options['scaler']) or FEATURE_NAMES
+            manifest = registry.register(
+                options['model'],
+                options['encoder'],
+                features=features,
+                metrics=metrics,
+                version=options['name'],
+                notes=options['notes'],
+                scaler_path=options['scaler'],
+            )
+        except (registry.RegistryError, FileNotFoundError) as e:
+            raise CommandError(str(e))
+
+        version = manifest['version']
+        self.stdout.write(f"  features: {', '.join(manifest['features'])}")
+        self.stdout.write(f"  classes:  {', '.join(manifest['classes'])}")
+        if manifest['scaler']:
+            self.stdout.write(f"  scaler:   {manifest['scaler']}")
+        self.stdout.write(self.style.SUCCESS(f'✅ Registered model version {version}'))
+
+        if options['activate']:
+            try:
+                check_compatible(manifest)
+                registry.activate(version)
+            except registry.RegistryError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'✅ Version {version} is now active'))
+
+    def _read_metrics(self, value):
+        if not value:
+            return None
+        try:
+            if value.lstrip().startswith('{'):
+                return json.loads(value)
+            with open(value) as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            raise CommandError(f'Could not read metrics: {e}')
@@ -1,38 +1,304 @@
 import joblib
 import numpy as np
 import logging
+import pickle
+import threading
+import time
 from pathlib import Path
 
+from django.conf import settings
+
+from . import registry
+from .cache import PredictionCache, quantize
+from .features import LOCATION_FEATURES
+from .forest import FlatForest
+
 logger = logging.getLogger(__name__)
 
 # ── Path to the trained model files ──────────────────────────────────────────
-# These .pkl files are created by ml/train_model.py
-# They live in ml/models/ folder and are copied here after training
+# Models are served from the versioned registry (ml_engine/registry.py,
+# `manage.py register_model`). These legacy files are used until a registry
+# version has been activated.
 BASE_DIR      = Path(__file__).resolve().parent
 MODEL_PATH    = BASE_DIR / 'models' / 'rf_model.pkl'
 ENCODER_PATH  = BASE_DIR / 'models' / 'label_encoder.pkl'
 
-# ── Load model once at import time ────────────────────────────────────────────
-# Module-level variables = loaded ONCE when Django starts, not on each request.
-# This is critical for performance — loading a model takes ~1 second.
-_model   = None
-_encoder = None
-
-def _load_model():
-    """Load model from disk if not already loaded (lazy loading)."""
-    global _model, _encoder
-    if _model is None:
-        try:
-            _model   = joblib.load(MODEL_PATH)
-            _encoder = joblib.load(ENCODER_PATH)
-            logger.info("ML model loaded successfully.")
-        except FileNotFoundError:
-            logger.warning("ML models not found. Using fallback predictions.")
-            _model = None
-            _encoder = None
+# ── Load model once, at startup ───────────────────────────────────────────────
+# start_eager_load() (ml_engine/apps.py, called from wsgi.py / asgi.py) starts
+# loading as soon as the server starts (not on the first request). The lock
+# makes concurrent first requests wait for that one load instead of each
+# loading the model again.
+#
+# The flat forest is kept in a sidecar file next to the model and
+# memory-mapped (joblib mmap_mode='r'): its arrays are file-backed pages,
+# shared by every worker process on the machine instead of one private copy
+# per worker.
+#
+# Hot swap: a new version is loaded in the background while the current one
+# keeps serving, then `_loaded` is replaced in one assignment. A request
+# keeps the LoadedModel it started with, so in-flight requests are never
+# interrupted. Workers notice a newly activated version by checking the
+# registry at most every ML_RELOAD_INTERVAL seconds.
+_loaded     = None                # LoadedModel currently served
+_load_lock  = threading.Lock()    # serialises loads and swaps
+_ready      = threading.Event()   # set once a model is loaded
+_status     = {'state': 'not_loaded'}
+_last_check = 0.0                 # time.monotonic() of the last registry check
+
+# Class probabilities per (model sha1, quantized feature vector); see cache.py
+_prediction_cache = PredictionCache(settings.ML_PREDICTION_CACHE_SIZE)
+
+
+class LoadedModel:
+    """A model ready for inference: flat forest (preferred) or the sklearn estimator."""
+
+    def __init__(self, labels, forest=None, model=None, source=None, version=None, stamp=None,
+                 features=None, scaler=None):
+        self.labels   = labels    # display label per class, in class order
+        self.forest   = forest    # FlatForest (memory-mapped) or None
+        self.model    = model     # sklearn estimator, only kept when there is no forest
+        self.source   = source    # sha1 of the model file
+        self.version  = version   # registry version, None for the legacy files
+        self.stamp    = stamp     # _artifact_stamp() the model was loaded for
+        self.features = features or FEATURE_NAMES   # column order of X (the manifest's)
+        self.scaler   = scaler    # fitted scaler applied before the model, or None
+
+    def predict_proba(self, X):
+        """Class probabilities for raw (unscaled) feature rows in self.features order."""
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+        if self.forest is not None:
+            return self.forest.predict_proba(X)
+        return self.model.predict_proba(X)
+
+
+def _sidecar_path(model_path):
+    return Path(model_path).with_suffix('.flat.joblib')
+
+
+def _load_sidecar(path, source):
+    """Memory-mapped flat forest compiled from the model with this sha1, or None."""
+    try:
+        forest = joblib.load(path, mmap_mode='r')
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+    return forest if getattr(forest, 'source', None) == source else None
+
+
+def _artifact_stamp():
+    """Cheap change marker: (active version, mtime of the model file it points to)."""
+    version = registry.active_version()
+    path = registry.version_dir(version) / registry.MODEL_FILE if version else MODEL_PATH
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    return version, mtime
+
+
+def check_compatible(manifest):
+    """Raise RegistryError unless every feature of a registry version is one the predictor can send."""
+    unknown = [name for name in manifest['features'] if name not in SERVED_FEATURES]
+    if unknown:
+        raise registry.RegistryError(
+            f"Version '{manifest['version']}' was trained on features the predictor does not compute: "
+            f"{', '.join(unknown)} (it sends {', '.join(SERVED_FEATURES)})"
+        )
+
+
+def _read_artifacts():
+    """Load encoder + model (or its flat sidecar) of the active version. None when no model has been trained."""
+    version = registry.active_version()
+    features, scaler = FEATURE_NAMES, None
+    if version is None:
+        model_path, encoder_path, expected = MODEL_PATH, ENCODER_PATH, None
+    else:
+        manifest = registry.read_manifest(version)
+        check_compatible(manifest)
+        model_path   = registry.version_dir(version) / registry.MODEL_FILE
+        encoder_path = registry.version_dir(version) / registry.ENCODER_FILE
+        expected     = manifest['checksums'][registry.MODEL_FILE]
+        features     = manifest['features']
+        if manifest.get('scaler'):
+            scaler = _load_scaler(version, manifest)
+
+    try:
+        encoder = joblib.load(encoder_path)
+        source  = registry.file_sha1(model_path)
+    except FileNotFoundError:
+        logger.warning("ML models not found. Using fallback predictions.")
+        return None
+    if expected is not None and source != expected:
+        raise registry.RegistryError(f"Checksum mismatch for the model of version '{version}'")
+
+    forest_path = _sidecar_path(model_path)
+    forest = _load_sidecar(forest_path, source)
+    model  = None
+    if forest is None:
+        model  = joblib.load(model_path)
+        forest = _compile_forest(model)
+        if forest is not None:
+            forest.source = source
+            try:
+                joblib.dump(forest, forest_path)
+                forest = _load_sidecar(forest_path, source) or forest   # re-open memory-mapped
+            except OSError as e:
+                logger.warning(f"Could not write {forest_path.name} ({e}); keeping the forest in memory.")
+            model = None   # the flat forest replaces the estimator for inference
+
+    # Label mapping never changes for a loaded model — decode it once
+    classes = forest.classes_ if forest is not None else model.classes_
+    labels  = [CAFE_TYPE_LABELS.get(label, label) for label in encoder.inverse_transform(classes)]
+
+    logger.info(f"ML model loaded successfully (version {version or 'legacy'}).")
+    return LoadedModel(labels, forest=forest, model=model, source=source, version=version,
+                       features=features, scaler=scaler)
+
+
+def _load_scaler(version, manifest):
+    """The feature scaler stored with a registry version, after checking its checksum."""
+    path = registry.version_dir(version) / manifest['scaler']
+    if registry.file_sha1(path) != manifest['checksums'].get(manifest['scaler']):
+        raise registry.RegistryError(f"Checksum mismatch for the scaler of version '{version}'")
+    scaler = joblib.load(path)
+    # registry.register() checked the names it was fitted on against the
+    # manifest; inference passes plain arrays in that order, so sklearn's
+    # per-call feature-name check (and its warning) is dropped
+    if hasattr(scaler, 'feature_names_in_'):
+        del scaler.feature_names_in_
+    return scaler
+
+
+def _swap_in(force=False):
+    """
+    Load the active artifacts and make them the served model. Caller holds
+    _load_lock. On failure the current model (if any) keeps serving.
+
+    Returns True when a new model was swapped in.
+    """
+    global _loaded
+    stamp = _artifact_stamp()
+    if not force and _loaded is not None and _loaded.stamp == stamp:
+        return False
+
+    if _loaded is None:
+        _status.update(state='loading', error=None)
+    started = time.time()
+    try:
+        loaded = _read_artifacts()
+    except Exception as e:
+        logger.exception("Loading the ML model failed.")
+        _status.update(error=str(e))
+        if _loaded is None:
+            _status.update(state='error')
+        return False
+
+    if loaded is None:
+        if _loaded is None:
+            _status.update(state='missing')
+        return False
+
+    loaded.stamp = stamp
+    _loaded = loaded   # one reference assignment: the swap
+    _prediction_cache.clear()
+    _status.update(
+        state='ready',
+        error=None,
+        version=loaded.version or 'legacy',
+        inference='flat_forest' if loaded.forest is not None else 'sklearn',
+        load_seconds=round(time.time() - started, 3),
+        loaded_at=time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+    )
+    _ready.set()
+    return True
+
+
+def load_model():
+    """
+    The model being served (None when there is no trained model), loading it
+    on first use. Thread-safe: concurrent callers wait for one load.
+    """
+    loaded = _loaded
+    if loaded is not None:
+        _check_for_update(loaded)
+        return loaded
+
+    with _load_lock:
+        if _loaded is None:
+            _swap_in()
+    return _loaded
+
+
+def reload_model(force=False):
+    """
+    Swap in the active version if it is not the one being served (always
+    reload with force=True). Blocks only callers of reload_model(): requests
+    keep using the current model until the swap.
+    """
+    with _load_lock:
+        return _swap_in(force=force)
+
+
+def _check_for_update(loaded):
+    """At most every ML_RELOAD_INTERVAL seconds: start a background reload if the active version changed."""
+    global _last_check
+    interval = settings.ML_RELOAD_INTERVAL
+    now = time.monotonic()
+    if interval <= 0 or now - _last_check < interval:
+        return
+    _last_check = now
+
+    if _artifact_stamp() != loaded.stamp and not _load_lock.locked():
+        threading.Thread(target=reload_model, name='ml-model-reload', daemon=True).start()
+
+
+def load_model_async():
+    """Start loading in a background thread (used at startup)."""
+    thread = threading.Thread(target=load_model, name='ml-model-loader', daemon=True)
+    thread.start()
+    return thread
+
+
+def served_features() -> list:
+    """Features of the model being served, in its column order (FEATURE_NAMES when there is none)."""
+    loaded = load_model()
+    return loaded.features if loaded is not None else FEATURE_NAMES
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def model_status() -> dict:
+    """Readiness information for the /api/ready/ endpoint."""
+    return {'ready': is_ready(), **_status}
+
+
+def prediction_cache_stats() -> dict:
+    return {**_prediction_cache.stats(), 'digits': settings.ML_PREDICTION_CACHE_DIGITS}
+
+
+def clear_prediction_cache():
+    _prediction_cache.clear()
+
+
+def _compile_forest(model):
+    """Flat-array copy of a random forest for fast small-batch inference, or None."""
+    if not hasattr(model, 'estimators_') or getattr(model, 'n_outputs_', 1) != 1:
+        return None
+    try:
+        forest = FlatForest.from_sklearn(model)
+    except (AttributeError, ValueError) as e:
+        logger.warning(f"Could not compile the forest ({e}); using sklearn inference.")
+        return None
+    logger.info(f"Compiled forest: {len(forest)} trees, {len(forest.feature)} nodes.")
+    return forest
 
 
 # ── Feature names — must match what the model was trained on ──────────────────
+# Legacy models take these four, in this order (a plain list per row).
+# Registry versions list their own features in the manifest; rows are then
+# passed as {name: value} dicts and arranged in the manifest's order.
 FEATURE_NAMES = [
     'competitor_count',     # number of cafes within 500m
     'avg_competitor_rating', # average rating of those cafes
@@ -40,6 +306,9 @@ FEATURE_NAMES = [
     'population_density',    # people per sq km in the ward
 ]
 
+# Every feature the serving side can compute for a location
+SERVED_FEATURES = FEATURE_NAMES + LOCATION_FEATURES
+
 # ── Human-readable labels ─────────────────────────────────────────────────────
 CAFE_TYPE_LABELS = {
     'coffee_shop':   'Coffee Shop',
@@ -52,6 +321,13 @@ CAFE_TYPE_LABELS = {
     'internet_cafe': 'Internet Café',
 }
 
+# Classes of the suitability models (ml/train_model.py) → display labels
+SUITABILITY_LEVELS = {
+    'High':   'High Suitability',
+    'Medium': 'Medium Suitability',
+    'Low':    'Low Suitability',
+}
+
 # Map café types to suitability levels
 TYPE_TO_SUITABILITY = {
     'coffee_shop':   'High Suitability',
@@ -70,9 +346,15 @@ def get_suitability_prediction(features: list) -> dict:
     Get location suitability prediction based on café type prediction.
     This maps café type predictions to suitability levels.
     """
-    # Get café type prediction
-    type_prediction = get_prediction(features)
+    return _suitability_from_type(get_prediction(features))
+
 
+def get_suitability_predictions(features_matrix) -> list:
+    """Batch version of get_suitability_prediction(): one model call for all rows."""
+    return [_suitability_from_type(p) for p in get_predictions(features_matrix)]
+
+
+def _suitability_from_type(type_prediction: dict) -> dict:
     if type_prediction.get('predicted_type') == 'Model not trained yet':
         return {
             'predicted_suitability': 'Model not trained yet',
@@ -83,15 +365,17 @@ def get_suitability_prediction(features: list) -> dict:
     predicted_type = type_prediction['predicted_type']
     confidence = type_prediction['confidence']
 
-    # Map to suitability
-    suitability = TYPE_TO_SUITABILITY.get(predicted_type, 'Medium Suitability')
+    # Map to suitability (suitability models predict the level directly)
+    suitability = SUITABILITY_LEVELS.get(predicted_type) or TYPE_TO_SUITABILITY.get(predicted_type, 'Medium Suitability')
 
     # Create suitability probabilities based on type probabilities
     type_probs = type_prediction.get('all_probabilities', {})
     suitability_probs = {'Low Suitability': 0, 'Medium Suitability': 0, 'High Suitability': 0}
 
     for type_name, prob in type_probs.items():
-        if type_name in ['Coffee Shop', 'Bakery Café']:
+        if type_name in SUITABILITY_LEVELS:
+            suitability_probs[SUITABILITY_LEVELS[type_name]] += prob
+        elif type_name in ['Coffee Shop', 'Bakery Café']:
             suitability_probs['High Suitability'] += prob
         elif type_name in ['Dessert Shop', 'Restaurant Café', 'Juice Bar']:
             suitability_probs['Medium Suitability'] += prob
@@ -110,40 +394,90 @@ def get_prediction(features: list) -> dict:
     Run prediction from the trained Random Forest model.
 
     Args:
-        features: [competitor_count, avg_rating, road_length_m, pop_density]
+        features: [competitor_count, avg_rating, road_length_m, pop_density],
+                  or a {feature name: value} dict holding (at least) the
+                  features of the served model
 
     Returns:
         { 'predicted_type': 'Bakery Café', 'confidence': 0.87,
           'all_probabilities': {'Coffee Shop': 0.08, 'Bakery Café': 0.87, ...} }
     """
-    _load_model()
+    return get_predictions([features])[0]
+
+
+def get_predictions(features_matrix) -> list:
+    """
+    Batch version of get_prediction(): the model runs ONCE on the whole
+    feature matrix (n_samples × n_features) and one result dict is returned per row.
+    """
+    loaded = load_model()
 
-    if _model is None:
+    n_samples = len(features_matrix)
+    if loaded is None:
         # Model not trained yet — return a safe fallback
-        return {
+        return [{
             'predicted_type':    'Model not trained yet',
             'confidence':        0,
             'all_probabilities': {},
-        }
+        } for _ in range(n_samples)]
 
-    # Convert feature list to 2D array (sklearn expects shape: [n_samples, n_features])
-    X = np.array([features])    # shape: (1, 4)
+    # sklearn expects shape: [n_samples, n_features], in the model's feature order
+    X = feature_matrix(features_matrix, loaded.features)
 
-    # Get predicted class (integer) and convert to label string
-    predicted_int   = _model.predict(X)[0]
-    predicted_label = _encoder.inverse_transform([predicted_int])[0]
+    # Probabilities for all classes (flat forest: same numbers as sklearn);
+    # the predicted class is the most probable one, exactly like RandomForestClassifier.predict()
+    probabilities = _predict_proba_cached(loaded, X)
+    predicted     = np.argmax(probabilities, axis=1)
 
-    # Get probabilities for all classes
-    probabilities = _model.predict_proba(X)[0]
-    class_labels  = _encoder.inverse_transform(_model.classes_)
+    labels  = loaded.labels
+    results = []
+    for class_index, row in zip(predicted.tolist(), probabilities):
+        results.append({
+            'predicted_type':    labels[class_index],
+            'confidence':        round(float(row.max()), 3),
+            'all_probabilities': {label: round(float(prob), 3) for label, prob in zip(labels, row)},
+        })
+    return results
 
-    all_probs = {
-        CAFE_TYPE_LABELS.get(label, label): round(float(prob), 3)
-        for label, prob in zip(class_labels, probabilities)
-    }
 
-    return {
-        'predicted_type':    CAFE_TYPE_LABELS.get(predicted_label, predicted_label),
-        'confidence':        round(float(max(probabilities)), 3),
-        'all_probabilities':  all_probs,
-    }
\ No newline at end of file
+def feature_matrix(rows, features):
+    """
+    (n_samples, len(features)) float array from rows that are either
+    {feature name: value} dicts or legacy [competitor_count, avg_rating,
+    road_length_m, pop_density] lists.
+
+    Raises:
+        ValueError when a row lacks one of the features
+    """
+    if features == FEATURE_NAMES and not any(isinstance(row, dict) for row in rows):
+        return np.asarray(rows, dtype=np.float64).reshape(len(rows), len(FEATURE_NAMES))
+
+    named = [row if isinstance(row, dict) else dict(zip(FEATURE_NAMES, row)) for row in rows]
+    try:
+        return np.array([[row[name] for name in features] for row in named], dtype=np.float64).reshape(len(rows), len(features))
+    except KeyError as e:
+        raise ValueError(f'The served model needs feature {e.args[0]!r}, which was not given')
+
+
+def _predict_proba_cached(loaded, X):
+    """
+    predict_proba() through the LRU cache: features are rounded to
+    ML_PREDICTION_CACHE_DIGITS significant digits and only the rows not
+    cached yet go through the model (in one call). X holds raw feature
+    values; the version's scaler (if any) is applied by predict_proba(),
+    so cache keys do not depend on it.
+    """
+    if _prediction_cache.max_size <= 0:
+        return loaded.predict_proba(X)
+
+    X = quantize(X, settings.ML_PREDICTION_CACHE_DIGITS)
+    keys = [(loaded.source, *row) for row in X.tolist()]
+    rows = _prediction_cache.get_many(keys)
+
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        computed = loaded.predict_proba(X[missing])
+        for i, row in zip(missing, computed):
+            rows[i] = row
+        _prediction_cache.put_many((keys[i], rows[i]) for i in missing)
+    return np.vstack(rows)
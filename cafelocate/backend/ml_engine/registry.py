@@ -0,0 +1,217 @@
+"""
+Versioned model registry.
+
+Every trained model is stored as an immutable version directory
+
+    <ML_REGISTRY_DIR>/
+        ACTIVE                       ← name of the version being served
+        20261017-142501/
+            model.pkl                ← fitted RandomForestClassifier
+            label_encoder.pkl
+            scaler.pkl               ← optional: feature scaler fitted with the model
+            manifest.json            ← features, classes, metrics, sha1 checksums
+
+Versions are written to a temporary directory and renamed into place, and
+ACTIVE is replaced with os.replace(), so a reader (any worker process) sees
+either the old or the new state, never a half-written one.
+
+The predictor serves the ACTIVE version; without a registry it falls back
+to the legacy ml_engine/models/rf_model.pkl + label_encoder.pkl.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import joblib
+from django.conf import settings
+
+MODEL_FILE    = 'model.pkl'
+ENCODER_FILE  = 'label_encoder.pkl'
+SCALER_FILE   = 'scaler.pkl'
+MANIFEST_FILE = 'manifest.json'
+ACTIVE_FILE   = 'ACTIVE'
+
+_VERSION_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]*$')
+
+
+class RegistryError(Exception):
+    """Raised for unknown versions, bad checksums and incompatible models."""
+
+
+def registry_dir() -> Path:
+    return Path(settings.ML_REGISTRY_DIR)
+
+
+def version_dir(version) -> Path:
+    if not _VERSION_NAME.match(version or ''):
+        raise RegistryError(f"Invalid model version name '{version}'")
+    return registry_dir() / version
+
+
+def file_sha1(path) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, text):
+    """Write text to path via a temporary file + os.replace()."""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.')
+    try:
+        os.chmod(tmp, 0o644)   # mkstemp creates 0600; other workers must read it
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Reading
+# ═══════════════════════════════════════════════════════════════════
+def list_versions() -> list:
+    """Registered versions, oldest first."""
+    root = registry_dir()
+    if not root.is_dir():
+        return []
+    # staging directories start with '.' and are never listed
+    return sorted(p.name for p in root.iterdir() if _VERSION_NAME.match(p.name) and (p / MANIFEST_FILE).is_file())
+
+
+def read_manifest(version) -> dict:
+    path = version_dir(version) / MANIFEST_FILE
+    try:
+        return json.loads(path.read_text())
+    except FileNotFoundError:
+        raise RegistryError(f"Unknown model version '{version}'")
+
+
+def active_path() -> Path:
+    return registry_dir() / ACTIVE_FILE
+
+
+def active_version():
+    """Version named in ACTIVE, or None when nothing has been activated."""
+    try:
+        version = active_path().read_text().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def verify(version) -> dict:
+    """Manifest of a version after checking its artifacts against the recorded checksums."""
+    manifest = read_manifest(version)
+    for name, expected in manifest['checksums'].items():
+        path = version_dir(version) / name
+        if not path.is_file():
+            raise RegistryError(f"Version '{version}' is missing {name}")
+        if file_sha1(path) != expected:
+            raise RegistryError(f"Checksum mismatch for {name} in version '{version}'")
+    return manifest
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Writing
+# ═══════════════════════════════════════════════════════════════════
+def trained_features(model_path, scaler_path=None):
+    """
+    Feature names a model (or its scaler) recorded when it was fitted on a
+    DataFrame — sklearn's feature_names_in_ — or None.
+    """
+    for path in (scaler_path, model_path):
+        if path is None:
+            continue
+        names = getattr(joblib.load(path), 'feature_names_in_', None)
+        if names is not None:
+            return [str(name) for name in names]
+    return None
+
+
+def register(model_path, encoder_path, features, metrics=None, version=None, notes='', scaler_path=None):
+    """
+    Copy a trained model + label encoder (+ feature scaler) into a new registry version.
+
+    Args:
+        model_path:   fitted classifier (.pkl, joblib)
+        encoder_path: LabelEncoder for its classes (.pkl, joblib)
+        features:     feature names, in the column order the model was trained on
+        metrics:      optional dict (accuracy, cv score, ...) stored in the manifest
+        version:      version name (default: UTC timestamp)
+        scaler_path:  optional fitted scaler (.pkl, joblib) applied to the
+                      features before the model, e.g. a StandardScaler
+
+    Returns:
+        the manifest dict
+    """
+    model   = joblib.load(model_path)
+    encoder = joblib.load(encoder_path)
+    features = list(features)
+
+    n_features = getattr(model, 'n_features_in_', None)
+    if n_features is not None and n_features != len(features):
+        raise RegistryError(f'Model expects {n_features} features, {len(features)} names given')
+
+    if scaler_path is not None:
+        scaler = joblib.load(scaler_path)
+        if not hasattr(scaler, 'transform'):
+            raise RegistryError(f'{scaler_path} is not a fitted scaler (no transform())')
+        names = getattr(scaler, 'feature_names_in_', None)
+        if names is not None and [str(name) for name in names] != features:
+            raise RegistryError(f'Scaler was fitted on {list(names)}, the features given are {features}')
+        if getattr(scaler, 'n_features_in_', len(features)) != len(features):
+            raise RegistryError(f'Scaler expects {scaler.n_features_in_} features, {len(features)} names given')
+
+    version = version or datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+    target  = version_dir(version)
+    if target.exists():
+        raise RegistryError(f"Version '{version}' already exists")
+
+    registry_dir().mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(dir=registry_dir(), prefix=f'.{version}.'))
+    try:
+        shutil.copyfile(model_path, staging / MODEL_FILE)
+        shutil.copyfile(encoder_path, staging / ENCODER_FILE)
+        artifacts = [MODEL_FILE, ENCODER_FILE]
+        if scaler_path is not None:
+            shutil.copyfile(scaler_path, staging / SCALER_FILE)
+            artifacts.append(SCALER_FILE)
+
+        manifest = {
+            'version':    version,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'model_type': type(model).__name__,
+            'features':   features,
+            'scaler':     SCALER_FILE if scaler_path is not None else None,
+            'classes':    [str(label) for label in encoder.inverse_transform(model.classes_)],
+            'metrics':    metrics or {},
+            'checksums':  {name: file_sha1(staging / name) for name in artifacts},
+            'notes':      notes,
+        }
+        (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+        os.chmod(staging, 0o755)   # mkdtemp creates 0700
+        os.rename(staging, target)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return manifest
+
+
+def activate(version) -> dict:
+    """Point ACTIVE at a (verified) version. Serving workers pick it up on their next check."""
+    manifest = verify(version)
+    _write_atomic(active_path(), version + '\n')
+    return manifest
+
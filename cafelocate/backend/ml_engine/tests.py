@@ -1,3 +1,46 @@
-from django.test import TestCase
+import warnings
+from pathlib import Path
 
-# Create your tests here.
+import joblib
+import numpy as np
+import pandas as pd
+from django.test import SimpleTestCase
+
+from .forest import FlatForest
+from .predictor import MODEL_PATH
+
+REPO_DIR = Path(__file__).resolve().parents[2]
+
+
+def _load(path):
+    # The committed pickles come from a newer sklearn than some installs
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return joblib.load(path)
+
+
+class FlatForestParityTests(SimpleTestCase):
+    """FlatForest.predict_proba() against sklearn's, for the committed models."""
+
+    def assert_parity(self, model, X):
+        expected = model.predict_proba(X)
+        actual = FlatForest.from_sklearn(model).predict_proba(X)
+        np.testing.assert_allclose(actual, expected, rtol=1e-12, atol=1e-12)
+
+    def test_served_model(self):
+        model = _load(MODEL_PATH)
+        rng = np.random.default_rng(0)
+        X = np.column_stack([
+            rng.integers(0, 40, 2000),            # competitor_count
+            rng.uniform(0, 5, 2000),              # avg_competitor_rating
+            rng.uniform(0, 20000, 2000),          # road_length_m
+            rng.uniform(0, 60000, 2000),          # population_density
+        ])
+        self.assert_parity(model, pd.DataFrame(X, columns=model.feature_names_in_))
+
+    def test_suitability_model_with_scaler(self):
+        model = _load(REPO_DIR / 'ml' / 'models' / 'suitability_rf_model.pkl')
+        scaler = _load(REPO_DIR / 'ml' / 'models' / 'suitability_scaler.pkl')
+        data = pd.read_csv(REPO_DIR / 'data' / 'cafe_location_training_dataset.csv')
+        X = scaler.transform(data[list(scaler.feature_names_in_)])
+        self.assert_parity(model, X)
@@ -5,4 +5,13 @@ urlpatterns = [
     # POST /api/predict/
     # Direct access to ML prediction without full analysis
     path('predict/', views.PredictView.as_view(), name='predict'),
-]
\ No newline at end of file
+
+    # GET /api/ready/
+    # Readiness probe: 200 once the ML model is loaded, 503 before
+    path('ready/', views.ReadinessView.as_view(), name='ready'),
+
+    # GET /api/model/  — registered versions + the active one (admin)
+    # POST /api/model/activate/  — activate a version and hot-swap it (admin)
+    path('model/', views.ModelRegistryView.as_view(), name='model-registry'),
+    path('model/activate/', views.ModelActivateView.as_view(), name='model-activate'),
+]
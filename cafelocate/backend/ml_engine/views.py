@@ -1,6 +1,9 @@
+from rest_framework.permissions import IsAdminUser
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .predictor import get_prediction
+
+from . import registry
+from .predictor import check_compatible, get_prediction, model_status, prediction_cache_stats, reload_model
 
 
 # POST /api/predict/
@@ -10,13 +13,69 @@ class PredictView(APIView):
 
     def post(self, request):
         # Expect: { "features": [8, 4.2, 1200, 5000] }
+        #     or: { "features": {"competitors_within_500m": 8, ...} } — the served model's features by name
         features = request.data.get('features')
 
-        if not features or len(features) != 4:
+        if not (isinstance(features, dict) and features) and not (isinstance(features, list) and len(features) == 4):
             return Response(
-                {'error': 'Send features: [competitor_count, avg_rating, road_m, pop_density]'},
+                {'error': 'Send features: [competitor_count, avg_rating, road_m, pop_density] '
+                          'or {feature name: value} for the served model'},
                 status=400
             )
 
-        result = get_prediction(features)
-        return Response(result)
\ No newline at end of file
+        try:
+            result = get_prediction(features)
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=400)
+        return Response(result)
+
+
+# GET /api/ready/
+# Readiness probe — 200 once the ML model is loaded, 503 while it is loading
+# (or missing), so load balancers only route traffic to warm workers
+class ReadinessView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        result = model_status()
+        return Response(result, status=200 if result['ready'] else 503)
+
+
+# GET /api/model/
+# Registered model versions, the one being served and prediction cache
+# statistics (admin only)
+class ModelRegistryView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        versions = [registry.read_manifest(version) for version in registry.list_versions()]
+        return Response({
+            'active':   registry.active_version(),
+            'status':   model_status(),
+            'cache':    prediction_cache_stats(),
+            'versions': versions,
+        })
+
+
+# POST /api/model/activate/
+# Make a registered version the active one and swap it in without a restart.
+# { "version": "20261017-142501" } — omit the version to just reload ACTIVE.
+# Other worker processes pick the change up within ML_RELOAD_INTERVAL seconds.
+class ModelActivateView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        version = request.data.get('version')
+        if version:
+            try:
+                check_compatible(registry.read_manifest(version))
+                registry.activate(version)
+            except registry.RegistryError as e:
+                return Response({'error': str(e)}, status=400)
+
+        swapped = reload_model()
+        result = model_status()
+        if version and result.get('version') != version:
+            return Response({'error': f"Version '{version}' is active but failed to load", **result}, status=500)
+        return Response({'swapped': swapped, **result})
@@ -57,6 +57,21 @@ class APIManager {
         });
     }
 
+    /**
+     * Precomputed suitability grid inside the map viewport: [[lat, lng, value], ...]
+     */
+    async getHeatmap(bounds, layer = 'score', cafeType = null) {
+        const params = new URLSearchParams({
+            south: bounds.getSouth(),
+            west: bounds.getWest(),
+            north: bounds.getNorth(),
+            east: bounds.getEast(),
+            layer: layer
+        });
+        if (cafeType) params.set('cafe_type', cafeType);
+        return this.makeRequest(`/heatmap/?${params}`);
+    }
+
     /**
      * Format errors for user display
      */
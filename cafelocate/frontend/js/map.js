@@ -52,6 +52,25 @@ class MapManager {
             [27.90, 85.55]
         );
         this.map.setMaxBounds(kathmanduBounds);
+
+        this.addOverlayLayers();
+    }
+
+    addOverlayLayers() {
+        // PNG tiles rendered by the backend from the precomputed grids (/api/tiles/)
+        const baseURL = window.apiManager ? window.apiManager.baseURL : 'http://localhost:8000/api';
+        const tileLayer = (layer) => L.tileLayer(`${baseURL}/tiles/${layer}/{z}/{x}/{y}.png`, {
+            opacity: 0.6,
+            maxZoom: 19,
+            attribution: 'CafeLocate analysis',
+        });
+
+        this.overlayLayers = {
+            'Suitability': tileLayer('suitability'),
+            'Competitor density': tileLayer('competitors'),
+            'Population': tileLayer('population'),
+        };
+        L.control.layers(null, this.overlayLayers, { collapsed: true }).addTo(this.map);
     }
 
     setupEventListeners() {
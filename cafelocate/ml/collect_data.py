@@ -73,6 +73,7 @@ def get_osm_cafes():
     """
     Get café data from OpenStreetMap using Overpass API
     This provides more comprehensive local data
+    (offline: import_osm_extract.py reads the cafés from a local OSM extract)
     """
     overpass_url = "http://overpass-api.de/api/interpreter"
 
@@ -1,5 +1,8 @@
 """
 Download Kathmandu road network from OpenStreetMap
+
+Needs the live Overpass API; import_osm_extract.py writes the same GeoJSON
+offline from a local OSM extract.
 """
 
 import requests
@@ -0,0 +1,418 @@
+"""
+Import cafés, amenities and roads from a local OpenStreetMap extract
+
+    python import_osm_extract.py --extract ../data/nepal-latest.osm.pbf
+    python import_osm_extract.py --extract ../data/kathmandu.osm.bz2 --load
+    python import_osm_extract.py --extract ../data/nepal-latest.osm.pbf --highway all --bbox 27.6 85.2 27.8 85.5
+
+Offline replacement for the Overpass queries of collect_data.get_osm_cafes()
+and download_roads.py: the extract (.osm / .osm.bz2 / .osm.gz, or .osm.pbf
+with pyosmium) is read ONCE, element by element (api/osm.py), and
+
+    amenity=cafe              → kathmandu_cafes.csv        (collect_data.py columns)
+    amenity=*, bus stops      → osm_amenities_kathmandu.csv (combined_amenities_clean.csv columns)
+    highway=* ways            → kathmandu_roads.geojson     (download_roads.py features)
+
+or, with --load, straight into the Cafe / Amenity / Road tables with bulk
+upserts in one transaction. Memory stays constant: node coordinates go
+into the memory-mapped NodeStore while the nodes are read (and it is kept
+for load_osm_roads.py), ways are resolved against it in batches, and the
+centroids of all ways go into a second, temporary store for the
+multipolygon relations. Ways and relations are represented by their
+centroid in the café / amenity outputs, like Overpass' `out center`.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from itertools import groupby
+from operator import itemgetter
+
+import django
+import numpy as np
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cafelocate.settings')
+django.setup()
+
+from django.db import transaction
+
+from api.bulk import BATCH_SIZE, batched, delete_missing, refresh_spatial_indexes, upsert
+from api.management.commands.load_amenities import AMENITY_FIELDS, parse_row
+from api.models import Amenity, Cafe, Road
+from api.osm import CHUNK_NODES, NodeStore, iter_elements, node_store_path
+from api.roads import road_extent
+from api.serializers import KATHMANDU_LAT_RANGE, KATHMANDU_LNG_RANGE
+from api.taxonomy import categorize
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
+DEFAULT_CAFES_CSV     = os.path.join(DATA_DIR, 'kathmandu_cafes.csv')
+DEFAULT_AMENITIES_CSV = os.path.join(DATA_DIR, 'osm_amenities_kathmandu.csv')
+DEFAULT_ROADS_GEOJSON = os.path.join(DATA_DIR, 'kathmandu_roads.geojson')
+
+# Road types of the download_roads.py query (--highway all keeps every highway way)
+ROAD_TYPES = ('primary', 'secondary', 'tertiary', 'residential', 'unclassified')
+
+CAFE_COLUMNS = ['place_id', 'name', 'lat', 'lng', 'type', 'rating', 'review_count',
+                'price_level', 'is_operational', 'source']
+
+# combined_amenities_clean.csv column → OSM tag
+AMENITY_TAGS = {
+    'amenity':          'amenity',
+    'building':         'building',
+    'phone':            'phone',
+    'operator':         'operator',
+    'operator_type':    'operator:type',
+    'student_count':    'student:count',
+    'capacity_persons': 'capacity:persons',
+    'capacity_beds':    'capacity:beds',
+    'opening_hours':    'opening_hours',
+    'wheelchair':       'wheelchair',
+    'addr_street':      'addr:street',
+    'addr_city':        'addr:city',
+    'addr_ward':        'addr:ward',
+    'website':          'website',
+}
+AMENITY_COLUMNS = ['type', 'name', 'latitude', 'longitude', 'geometry_type', 'osm_id', *AMENITY_TAGS]
+
+# Columns written on insert AND on conflict (as in load_cafes.py / load_roads.py)
+CAFE_UPDATE_FIELDS = ['name', 'cafe_type', 'latitude', 'longitude', 'location', 'rating', 'review_count', 'is_open', 'collected_at']
+ROAD_UPDATE_FIELDS = ['road_type', 'geometry', 'min_lng', 'min_lat', 'max_lng', 'max_lat', 'length_m']
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Output rows
+# ═══════════════════════════════════════════════════════════════════
+def cafe_row(osm_id, lat, lng, tags):
+    """kathmandu_cafes.csv row (same values as collect_data.parse_osm_cafes)."""
+    return {
+        'place_id': f"osm_{osm_id}",
+        'name': tags.get('name', 'Unknown Cafe'),
+        'lat': lat,
+        'lng': lng,
+        'type': 'cafe',
+        'rating': None,  # OSM doesn't have ratings
+        'review_count': None,
+        'price_level': None,
+        'is_operational': True,
+        'source': 'openstreetmap'
+    }
+
+
+def amenity_row(kind, osm_id, lat, lng, tags, geometry_type):
+    """combined_amenities_clean.csv row."""
+    if kind == 'relation':
+        amenity_type = tags.get('type', 'multipolygon')
+    else:
+        amenity_type = tags.get('amenity') or 'bus_stop'
+    return {
+        'type': amenity_type,
+        'name': tags.get('name'),
+        'latitude': lat,
+        'longitude': lng,
+        'geometry_type': geometry_type,
+        'osm_id': f"{kind}/{osm_id}",
+        **{column: tags.get(tag) for column, tag in AMENITY_TAGS.items()},
+    }
+
+
+def road_feature(osm_id, coordinates, tags):
+    """kathmandu_roads.geojson feature (same properties as download_roads.py)."""
+    return {
+        "type": "Feature",
+        "properties": {
+            "osm_id": osm_id,
+            "highway": tags.get('highway', 'unclassified'),
+            "name": tags.get('name', ''),
+            "lanes": tags.get('lanes', ''),
+            "maxspeed": tags.get('maxspeed', ''),
+        },
+        "geometry": {
+            "type": "LineString",
+            "coordinates": coordinates
+        }
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Sinks: where the extracted rows go
+# ═══════════════════════════════════════════════════════════════════
+class FileSink:
+    """Streams the rows into the CSV / GeoJSON files (written to .part files, renamed at the end)."""
+
+    def __init__(self, cafes_csv, amenities_csv, roads_geojson):
+        self.paths = [cafes_csv, amenities_csv, roads_geojson]
+        for path in self.paths:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.files = [open(f'{path}.part', 'w', encoding='utf-8', newline='') for path in self.paths]
+
+        self.cafes = csv.DictWriter(self.files[0], CAFE_COLUMNS)
+        self.cafes.writeheader()
+        self.amenities = csv.DictWriter(self.files[1], AMENITY_COLUMNS)
+        self.amenities.writeheader()
+        self.roads = self.files[2]
+        self.roads.write('{\n  "type": "FeatureCollection",\n  "features": [\n')
+        self.counts = {'cafes': 0, 'amenities': 0, 'roads': 0}
+
+    def cafe(self, row):
+        self.cafes.writerow(row)
+        self.counts['cafes'] += 1
+
+    def amenity(self, row):
+        self.amenities.writerow(row)
+        self.counts['amenities'] += 1
+
+    def road(self, feature):
+        separator = ',\n' if self.counts['roads'] else ''
+        self.roads.write(separator + '    ' + json.dumps(feature, ensure_ascii=False))
+        self.counts['roads'] += 1
+
+    def close(self):
+        self.roads.write('\n  ]\n}\n')
+        for f, path in zip(self.files, self.paths):
+            f.close()
+            os.replace(f'{path}.part', path)
+            print(f"  Saved to {path}")
+
+    def abort(self):
+        for f, path in zip(self.files, self.paths):
+            f.close()
+            os.unlink(f'{path}.part')
+
+
+class DatabaseSink:
+    """Buffers the rows as model objects and upserts them BATCH_SIZE at a time."""
+
+    def __init__(self, delete_others=False):
+        self.delete_others = delete_others
+        self.buffers = {Cafe: [], Amenity: [], Road: []}
+        self.seen = {Cafe: set(), Amenity: set(), Road: set()}
+        self.counts = {'cafes': 0, 'amenities': 0, 'roads': 0}
+        self.deleted = {}
+
+    def cafe(self, row):
+        lat, lng = row['lat'], row['lng']
+        self._add(Cafe(
+            place_id=row['place_id'],
+            name=row['name'],
+            cafe_type=row['type'],
+            latitude=lat,
+            longitude=lng,
+            location={'type': 'Point', 'coordinates': [lng, lat]},
+            rating=None,
+            review_count=0,
+            is_open=True,
+        ))
+        self.counts['cafes'] += 1
+
+    def amenity(self, row):
+        try:
+            osm_id, fields = parse_row(row)
+        except (ValueError, KeyError):
+            return
+        # bulk writes skip Amenity.save(), so the category is set here
+        fields['category'] = categorize(fields['amenity_type'])
+        self._add(Amenity(osm_id=osm_id, **fields))
+        self.counts['amenities'] += 1
+
+    def road(self, feature):
+        geometry = feature['geometry']
+        self._add(Road(
+            osm_id=feature['properties']['osm_id'],
+            road_type=feature['properties']['highway'] or '',
+            geometry=geometry,
+            **road_extent(geometry),
+        ))
+        self.counts['roads'] += 1
+
+    def _add(self, obj):
+        buffer = self.buffers[type(obj)]
+        buffer.append(obj)
+        if len(buffer) >= BATCH_SIZE:
+            self._flush(type(obj))
+
+    def _flush(self, model):
+        key, update_fields = {
+            Cafe:    ('place_id', CAFE_UPDATE_FIELDS),
+            Amenity: ('osm_id', [*AMENITY_FIELDS, 'location']),
+            Road:    ('osm_id', ROAD_UPDATE_FIELDS),
+        }[model]
+        for batch in upsert(model, self.buffers[model], key, update_fields):
+            self.seen[model].update(getattr(obj, key) for obj in batch)
+        self.buffers[model] = []
+
+    def close(self):
+        for model in self.buffers:
+            self._flush(model)
+        if self.delete_others:
+            self.deleted = {
+                model.__name__: delete_missing(model, 'place_id' if model is Cafe else 'osm_id', self.seen[model])
+                for model in self.buffers
+            }
+        refresh_spatial_indexes('Cafe', 'Amenity', 'Road')
+
+    def abort(self):
+        pass   # the surrounding transaction is rolled back
+
+
+# ═══════════════════════════════════════════════════════════════════
+# The scan
+# ═══════════════════════════════════════════════════════════════════
+def in_bbox(lats, lngs, bbox):
+    south, west, north, east = bbox
+    return (lats >= south) & (lats <= north) & (lngs >= west) & (lngs <= east)
+
+
+def emit_place(sink, kind, osm_id, lat, lng, tags, geometry_type):
+    """Cafés and amenities (incl. bus stops) at one point / centroid."""
+    amenity = tags.get('amenity')
+    if amenity or tags.get('highway') == 'bus_stop':
+        sink.amenity(amenity_row(kind, osm_id, lat, lng, tags, geometry_type))
+    if amenity == 'cafe':
+        sink.cafe(cafe_row(osm_id, lat, lng, tags))
+
+
+def scan_nodes(nodes, sink, bbox):
+    """(node_id, lat, lon) of every node for the NodeStore; tagged nodes are emitted on the way."""
+    for _, osm_id, (lat, lon), tags in nodes:
+        yield osm_id, lat, lon
+        if tags and in_bbox(lat, lon, bbox):
+            emit_place(sink, 'node', osm_id, lat, lon, tags, 'Point')
+
+
+def scan_ways(ways, sink, store, bbox, highway_types):
+    """
+    (way_id, lat, lon) centroid of every way for the way store; roads and
+    tagged areas inside the bbox are emitted on the way. The node ids of a
+    batch of ways are resolved in ONE store lookup; nodes missing from the
+    extract are left out.
+    """
+    for batch in batched(ways, BATCH_SIZE):
+        lengths = [len(refs) for _, _, refs, _ in batch]
+        coords = store.lookup(np.fromiter((ref for _, _, refs, _ in batch for ref in refs), dtype=np.int64, count=sum(lengths)))
+        for (_, osm_id, refs, tags), line in zip(batch, np.split(coords, np.cumsum(lengths)[:-1])):
+            line = line[~np.isnan(line[:, 0])]
+            if not len(line):
+                continue
+
+            closed = len(refs) >= 4 and refs[0] == refs[-1]
+            lat, lon = (line[:-1] if closed and len(line) > 1 else line).mean(axis=0)
+            yield osm_id, lat, lon
+
+            if not (tags and in_bbox(line[:, 0], line[:, 1], bbox).any()):
+                continue
+            highway = tags.get('highway')
+            if highway and len(line) >= 2 and (highway_types is None or highway in highway_types):
+                # The store's fixed-point coordinates are exact: 7 decimals, like the extract
+                sink.road(road_feature(osm_id, np.round(line[:, ::-1], 7).tolist(), tags))
+            emit_place(sink, 'way', osm_id, round(float(lat), 7), round(float(lon), 7), tags,
+                       'Polygon' if closed else 'LineString')
+
+
+def scan_relations(relations, sink, way_store, bbox):
+    """Tagged (multipolygon) relations at the centroid of their outer ways."""
+    for _, osm_id, members, tags in relations:
+        if not (tags.get('amenity') or tags.get('highway') == 'bus_stop'):
+            continue
+        outer = [ref for member_type, ref, role in members if member_type == 'way' and role in ('outer', '')]
+        centroids = way_store.lookup(outer)
+        centroids = centroids[~np.isnan(centroids[:, 0])]
+        if not len(centroids):
+            continue
+        lat, lon = centroids.mean(axis=0)
+        if in_bbox(lat, lon, bbox):
+            emit_place(sink, 'relation', osm_id, round(float(lat), 7), round(float(lon), 7), tags, 'Polygon')
+
+
+def scan_extract(extract_path, sink, bbox, highway_types=ROAD_TYPES, node_store=None, chunk_nodes=CHUNK_NODES):
+    """
+    One pass over the extract. The elements come grouped by kind (nodes,
+    ways, relations); each group is consumed lazily as it is read.
+    """
+    store = way_store = NodeStore.empty()
+    done = set()
+
+    with tempfile.TemporaryDirectory(prefix='osm_ways.') as way_dir:
+        for kind, elements in groupby(iter_elements(extract_path), key=itemgetter(0)):
+            if kind in done:
+                raise ValueError(f'{extract_path} is not sorted (nodes, ways, relations); '
+                                 f'sort it first, e.g. with `osmium sort`')
+            done.add(kind)
+            started = time.time()
+
+            if kind == 'node':
+                store = NodeStore.build(scan_nodes(elements, sink, bbox), node_store, chunk_nodes, source=extract_path)
+                print(f"  {len(store)} nodes ({time.time() - started:.1f}s)")
+            elif kind == 'way':
+                way_store = NodeStore.build(scan_ways(elements, sink, store, bbox, highway_types), way_dir, chunk_nodes)
+                print(f"  {len(way_store)} ways ({time.time() - started:.1f}s)")
+            else:
+                scan_relations(elements, sink, way_store, bbox)
+                print(f"  relations ({time.time() - started:.1f}s)")
+
+
+def import_osm_extract(extract_path, load=False, delete_others=False, bbox=None, highway_types=ROAD_TYPES,
+                       node_store=None, chunk_nodes=CHUNK_NODES,
+                       cafes_csv=DEFAULT_CAFES_CSV, amenities_csv=DEFAULT_AMENITIES_CSV, roads_geojson=DEFAULT_ROADS_GEOJSON):
+    if not os.path.exists(extract_path):
+        print(f"Error: OSM extract not found at {extract_path}")
+        return
+
+    bbox = bbox or (KATHMANDU_LAT_RANGE[0], KATHMANDU_LNG_RANGE[0], KATHMANDU_LAT_RANGE[1], KATHMANDU_LNG_RANGE[1])
+    print(f"Reading {extract_path} (bbox {bbox})...")
+    started = time.time()
+
+    if load:
+        with transaction.atomic():
+            sink = DatabaseSink(delete_others)
+            scan_extract(extract_path, sink, bbox, highway_types, node_store, chunk_nodes)
+            sink.close()
+    else:
+        sink = FileSink(cafes_csv, amenities_csv, roads_geojson)
+        try:
+            scan_extract(extract_path, sink, bbox, highway_types, node_store, chunk_nodes)
+        except BaseException:
+            sink.abort()
+            raise
+        sink.close()
+
+    deleted = ''
+    if getattr(sink, 'deleted', None):
+        deleted = ' (removed: ' + ', '.join(f'{n} {model}' for model, n in sink.deleted.items()) + ')'
+    print(f"✓ {sink.counts['cafes']} cafes, {sink.counts['amenities']} amenities, "
+          f"{sink.counts['roads']} road segments in {time.time() - started:.1f}s{deleted}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract cafés, amenities and roads from a local OSM extract in one pass.')
+    parser.add_argument('--extract', required=True, help='.osm, .osm.bz2, .osm.gz or .osm.pbf file')
+    parser.add_argument('--load', action='store_true', help='upsert into the database instead of writing the CSV / GeoJSON files')
+    parser.add_argument('--delete-missing', action='store_true',
+                        help='with --load: delete cafés, amenities and roads that are not in the extract')
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'),
+                        help='area to keep (default: the analysis area)')
+    parser.add_argument('--highway', default=','.join(ROAD_TYPES),
+                        help='comma-separated highway types to keep as roads, or "all"')
+    parser.add_argument('--node-store', default=str(node_store_path()), help='node store directory (reused by load_osm_roads.py)')
+    parser.add_argument('--chunk-nodes', type=int, default=CHUNK_NODES, help='nodes sorted in memory at a time')
+    parser.add_argument('--cafes-csv', default=DEFAULT_CAFES_CSV)
+    parser.add_argument('--amenities-csv', default=DEFAULT_AMENITIES_CSV)
+    parser.add_argument('--roads-geojson', default=DEFAULT_ROADS_GEOJSON)
+    args = parser.parse_args()
+
+    highway_types = None if args.highway == 'all' else set(args.highway.split(','))
+    import_osm_extract(
+        args.extract, args.load, args.delete_missing, args.bbox, highway_types,
+        args.node_store, args.chunk_nodes, args.cafes_csv, args.amenities_csv, args.roads_geojson,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,143 @@
 """
 Load café data into Django/PostGIS database
+
+    python load_cafes.py
+    python load_cafes.py --csv ../data/more_cafes.csv --keep-missing
+
+The CSV is read in chunks; each chunk is validated and converted with
+vectorised pandas operations and upserted on place_id with bulk.upsert()
+(bulk_create with update_conflicts), BATCH_SIZE rows per statement group.
+Cafés that are not in the file are deleted afterwards with
+bulk.delete_missing() (unless --keep-missing). Everything runs in
+ONE transaction, so readers see either the old table or the new one —
+never an empty or half-loaded one.
 """
 
+import argparse
 import os
+import sys
+import time
+
 import django
+import numpy as np
 import pandas as pd
 
 # Setup Django environment
-import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'backend'))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cafelocate.settings')
 django.setup()
 
+from django.db import transaction
+
+from api.bulk import delete_missing, refresh_spatial_indexes, upsert
 from api.models import Cafe
 
-def load_cafe_data():
+CHUNK_ROWS = 20000   # CSV rows read (and validated) at a time
+
+DEFAULT_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'kathmandu_cafes.csv')
+
+# Columns written on insert AND on conflict (everything except place_id)
+UPDATE_FIELDS = ['name', 'cafe_type', 'latitude', 'longitude', 'location', 'rating', 'review_count', 'is_open', 'collected_at']
+
+
+def clean_chunk(df):
     """
-    Load café data from CSV into the database
+    Validated, converted copy of one CSV chunk.
+
+    Returns:
+        (clean DataFrame, number of rows dropped)
     """
-    csv_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'kathmandu_cafes.csv')
+    df = df.copy()
+    df['place_id'] = df['place_id'].astype('string').str.strip()
+    df['lat'] = pd.to_numeric(df['lat'], errors='coerce')
+    df['lng'] = pd.to_numeric(df['lng'], errors='coerce')
+
+    valid = (
+        df['place_id'].notna() & (df['place_id'] != '') &
+        df['lat'].between(-90, 90) & df['lng'].between(-180, 180)
+    )
+    dropped = int((~valid).sum())
+    # The last row wins when a place_id appears twice in one chunk
+    df = df[valid].drop_duplicates('place_id', keep='last')
+
+    df['name'] = df['name'].fillna('').astype(str) if 'name' in df else ''
+    df['type'] = df['type'].fillna('cafe').astype(str) if 'type' in df else 'cafe'
+
+    rating = pd.to_numeric(df['rating'], errors='coerce') if 'rating' in df else pd.Series(np.nan, index=df.index)
+    df['rating'] = rating.astype(object).where(rating.notna(), None)  # NaN → NULL
+
+    reviews = pd.to_numeric(df['review_count'], errors='coerce') if 'review_count' in df else pd.Series(0, index=df.index)
+    df['review_count'] = reviews.fillna(0).astype(int)
 
+    if 'is_operational' in df:
+        is_open = df['is_operational'].map(lambda v: str(v).strip().lower() not in ('false', '0', 'no'), na_action='ignore')
+        df['is_open'] = is_open.fillna(True).astype(bool)
+    else:
+        df['is_open'] = True
+    return df, dropped
+
+
+def cafes_from_chunk(df):
+    for place_id, name, cafe_type, lat, lng, rating, reviews, is_open in zip(
+        df['place_id'], df['name'], df['type'], df['lat'].tolist(), df['lng'].tolist(),
+        df['rating'], df['review_count'].tolist(), df['is_open'].tolist(),
+    ):
+        yield Cafe(
+            place_id=place_id,
+            name=name,
+            cafe_type=cafe_type,
+            latitude=lat,
+            longitude=lng,
+            location={'type': 'Point', 'coordinates': [lng, lat]},
+            rating=rating,
+            review_count=reviews,
+            is_open=is_open,
+        )
+
+
+def load_cafe_data(csv_path=DEFAULT_CSV, keep_missing=False, chunk_rows=CHUNK_ROWS):
+    """
+    Upsert every café in the CSV (on place_id) and, unless keep_missing,
+    delete the cafés the CSV no longer contains.
+    """
     if not os.path.exists(csv_path):
         print(f"Error: Cafe CSV not found at {csv_path}")
         print("Run collect_data.py first to collect the data")
         return
 
     print("Loading café data...")
+    started = time.time()
+    seen, loaded, skipped, deleted = set(), 0, 0, 0
+
+    with transaction.atomic():
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, dtype={'place_id': str}):
+            df, dropped = clean_chunk(chunk)
+            skipped += dropped
+
+            for batch in upsert(Cafe, cafes_from_chunk(df), 'place_id', UPDATE_FIELDS):
+                seen.update(cafe.place_id for cafe in batch)
+            loaded += len(df)
+            print(f"  {loaded} cafes upserted ({time.time() - started:.1f}s)")
+
+        if not keep_missing:
+            deleted = delete_missing(Cafe, 'place_id', seen)
+
+        refresh_spatial_indexes('Cafe')
+
+    print(f"Successfully loaded {len(seen)} cafes "
+          f"({skipped} invalid rows skipped, {deleted} cafés no longer in the file removed) "
+          f"in {time.time() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load cafés from a CSV into the database.')
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--keep-missing', action='store_true', help='keep cafés that are not in the CSV')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_ROWS, help='CSV rows read at a time')
+    args = parser.parse_args()
+
+    load_cafe_data(args.csv, args.keep_missing, args.chunk_size)
 
-    # Read CSV
-    df = pd.read_csv(csv_path)
-    print(f"Found {len(df)} cafes in CSV")
-
-    # Clear existing data
-    Cafe.objects.all().delete()
-    print("Cleared existing café data")
-
-    loaded_count = 0
-    for _, row in df.iterrows():
-        try:
-            # Create Point geometry
-            lat = float(row['lat'])
-            lng = float(row['lng'])
-            location = {
-                'type': 'Point',
-                'coordinates': [lng, lat]
-            }
-
-            # Create Cafe object
-            cafe = Cafe(
-                place_id=row['place_id'],
-                name=row['name'],
-                cafe_type=row.get('type', 'cafe'),  # Default to 'cafe' if not specified
-                latitude=lat,
-                longitude=lng,
-                location=location,
-                rating=row.get('rating') if pd.notna(row.get('rating')) else None,  # Handle NaN
-                review_count=int(row.get('review_count', 0)) if pd.notna(row.get('review_count')) else 0,
-                is_open=row.get('is_operational', True)
-            )
-            cafe.save()
-            loaded_count += 1
-
-        except Exception as e:
-            print(f"Error loading cafe {row.get('name', 'unknown')}: {e}")
-            continue
-
-    print(f"Successfully loaded {loaded_count} cafes")
 
 if __name__ == "__main__":
-    load_cafe_data()
\ No newline at end of file
+    main()
@@ -0,0 +1,149 @@
+"""
+Load the roads of osm_roads_kathmandu.csv (node ids only) into Django/SQLite
+
+    python load_osm_roads.py --extract ../data/nepal-latest.osm.pbf
+    python load_osm_roads.py                       # reuse the node store built before
+    python load_osm_roads.py --csv ../data/other_roads.csv --keep-missing
+
+The CSV lists every way as a list of OSM node ids. Their coordinates come
+from a local OSM extract (.osm / .osm.bz2 / .osm.gz, or .osm.pbf with
+pyosmium), read once into the memory-mapped NodeStore of api/osm.py:
+sorted int64 ids + exact fixed-point coordinates, built with an external sort, so
+neither building nor querying it needs memory in proportion to the
+extract. The CSV is then streamed BATCH_SIZE roads at a time: one
+vectorised lookup resolves all node ids of a batch, and the LineStrings
+are upserted on osm_id with bulk_create, with the extent columns filled
+in. Nodes missing from the extract (ways clipped at its edge) are left
+out; roads with fewer than two known nodes are skipped. Roads that are not
+in the CSV are deleted afterwards (unless --keep-missing); everything runs
+in one transaction.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import django
+import numpy as np
+
+# Add the backend directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cafelocate.settings')
+django.setup()
+
+from django.db import transaction
+
+from api.bulk import BATCH_SIZE, batched, delete_missing, refresh_spatial_indexes, upsert
+from api.models import Road
+from api.osm import CHUNK_NODES, NodeStore, node_store_path
+from api.roads import road_extent
+
+DEFAULT_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'osm_roads_kathmandu.csv')
+
+# Columns written on insert AND on conflict (everything except osm_id)
+UPDATE_FIELDS = ['road_type', 'geometry', 'min_lng', 'min_lat', 'max_lng', 'max_lat', 'length_m']
+
+
+def roads_from_rows(rows, store, counts):
+    """
+    Unsaved Roads for one batch of CSV rows, with every node id of the
+    batch resolved in ONE store lookup. counts['skipped'] / counts['partial']
+    are incremented for unusable rows / roads with unknown nodes.
+    """
+    parsed = []
+    for row in rows:
+        try:
+            parsed.append((int(row['osm_id']), row.get('highway_type') or '', json.loads(row['nodes'])))
+        except (KeyError, TypeError, ValueError):
+            counts['skipped'] += 1
+
+    if not parsed:
+        return []
+
+    lengths = [len(nodes) for _, _, nodes in parsed]
+    coords = store.lookup(np.fromiter((n for _, _, nodes in parsed for n in nodes), dtype=np.int64, count=sum(lengths)))
+    # GeoJSON order is (lng, lat); the store keeps OSM's 7 decimals exactly
+    coords = np.round(coords[:, ::-1], 7)
+    known = ~np.isnan(coords[:, 0])
+
+    roads = []
+    for (osm_id, road_type, _), line, line_known in zip(
+        parsed, np.split(coords, np.cumsum(lengths)[:-1]), np.split(known, np.cumsum(lengths)[:-1])
+    ):
+        if line_known.sum() < 2:
+            counts['skipped'] += 1
+            continue
+        if not line_known.all():
+            counts['partial'] += 1
+
+        geometry = {'type': 'LineString', 'coordinates': line[line_known].tolist()}
+        roads.append(Road(osm_id=osm_id, road_type=road_type, geometry=geometry, **road_extent(geometry)))
+    return roads
+
+
+def load_osm_roads(csv_path=DEFAULT_CSV, store=None, keep_missing=False):
+    """
+    Upsert every road of the CSV (on osm_id) with its geometry resolved
+    through the node store and, unless keep_missing, delete the roads the
+    CSV no longer contains.
+    """
+    if not os.path.exists(csv_path):
+        print(f"Error: Road CSV not found at {csv_path}")
+        return
+
+    print(f"Loading roads from {csv_path} ({len(store)} nodes in the store)...")
+    started = time.time()
+    counts = {'skipped': 0, 'partial': 0}
+    seen, deleted = set(), 0
+
+    def roads(reader):
+        for rows in batched(reader, BATCH_SIZE):
+            yield from roads_from_rows(rows, store, counts)
+
+    with transaction.atomic():
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            for batch in upsert(Road, roads(csv.DictReader(f)), 'osm_id', UPDATE_FIELDS):
+                seen.update(road.osm_id for road in batch)
+                print(f"  {len(seen)} roads ({time.time() - started:.1f}s)")
+
+        if not keep_missing:
+            deleted = delete_missing(Road, 'osm_id', seen)
+
+        refresh_spatial_indexes('Road')
+
+    print(f"Successfully loaded {len(seen)} road segments "
+          f"({counts['partial']} with nodes missing from the extract, {counts['skipped']} skipped, "
+          f"{deleted} roads no longer in the file removed) in {time.time() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load roads given as OSM node ids, resolving the nodes from a local OSM extract.')
+    parser.add_argument('--csv', default=DEFAULT_CSV)
+    parser.add_argument('--extract', help='OSM extract (.osm, .osm.bz2, .osm.gz, .osm.pbf) to (re)build the node store from')
+    parser.add_argument('--node-store', default=str(node_store_path()), help='node store directory')
+    parser.add_argument('--chunk-nodes', type=int, default=CHUNK_NODES, help='nodes sorted in memory at a time while building the store')
+    parser.add_argument('--keep-missing', action='store_true', help='keep roads that are not in the CSV')
+    args = parser.parse_args()
+
+    if args.extract:
+        print(f"Building the node store from {args.extract}...")
+        started = time.time()
+        store = NodeStore.from_extract(args.extract, args.node_store, args.chunk_nodes)
+        print(f"  {len(store)} nodes in {time.time() - started:.1f}s")
+    else:
+        store = NodeStore.load(args.node_store)
+        if store is None:
+            print(f"Error: no node store at {args.node_store}")
+            print("Run with --extract <file.osm.pbf> first to build it")
+            return
+
+    load_osm_roads(args.csv, store, args.keep_missing)
+
+
+if __name__ == "__main__":
+    main()
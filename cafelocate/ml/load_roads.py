@@ -1,11 +1,24 @@
 """
 Load road network data into Django/SQLite database
+
+    python load_roads.py
+    python load_roads.py --geojson ../data/other_roads.geojson --keep-missing
+
+The GeoJSON is parsed incrementally — one feature at a time from a small
+read buffer — so memory does not grow with the file. Roads are upserted on
+osm_id with bulk_create in batches, with the geometry stored as a GeoJSON
+object (not a JSON string) and the bounding box / length columns filled in.
+Roads that are not in the file are deleted afterwards (unless
+--keep-missing); everything runs in one transaction.
 """
 
+import argparse
+import json
 import os
 import sys
+import time
+
 import django
-import json
 
 # Add the backend directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
@@ -14,59 +27,140 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cafelocate.settings')
 django.setup()
 
+from django.db import transaction
+
+from api.bulk import BATCH_SIZE, delete_missing, refresh_spatial_indexes, upsert
 from api.models import Road
+from api.roads import road_extent
+
+READ_SIZE = 1 << 16   # bytes read from the file at a time
 
-def load_road_network():
+DEFAULT_GEOJSON = os.path.join(os.path.dirname(__file__), '..', 'data', 'kathmandu_roads.geojson')
+
+# Columns written on insert AND on conflict (everything except osm_id)
+UPDATE_FIELDS = ['road_type', 'geometry', 'min_lng', 'min_lat', 'max_lng', 'max_lat', 'length_m']
+
+
+def iter_features(path, read_size=READ_SIZE):
     """
-    Load road network data from GeoJSON into the database
+    Yield the features of a GeoJSON FeatureCollection one by one without
+    loading the whole file: the text is scanned for the "features" array
+    and each element is decoded with raw_decode() as soon as it is complete
+    in the buffer.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, eof = '', False
+
+        def fill():
+            nonlocal buffer, eof
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer += chunk
+
+        # Find the opening bracket of the "features" array
+        while True:
+            key = buffer.find('"features"')
+            if key >= 0:
+                bracket = buffer.find('[', key)
+                if bracket >= 0:
+                    buffer = buffer[bracket + 1:]
+                    break
+                buffer = buffer[key:]
+            else:
+                # keep a tail in case the key is split across reads
+                buffer = buffer[-len('"features"'):]
+            if eof:
+                return
+            fill()
+
+        while True:
+            position = 0
+            while True:
+                # Skip whitespace and separators between features
+                while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                    position += 1
+                if position < len(buffer) and buffer[position] == ']':
+                    return
+                try:
+                    feature, end = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    break   # incomplete feature: read more
+                yield feature
+                position = end
+
+            buffer = buffer[position:]
+            if eof:
+                if buffer.strip():
+                    raise ValueError(f'Truncated GeoJSON in {path}')
+                return
+            fill()
+
+
+def road_from_feature(feature):
+    """Unsaved Road for one GeoJSON feature (KeyError / ValueError when unusable)."""
+    properties = feature['properties']
+    geometry = feature['geometry']
+    extent = road_extent(geometry)
+    if extent['length_m'] is None:
+        raise ValueError('no line geometry')
+
+    return Road(
+        osm_id=int(properties['osm_id']),
+        road_type=properties.get('highway') or '',
+        geometry=geometry,   # the GeoJSON object itself (JSONField)
+        **extent,
+    )
+
+
+def load_road_network(geojson_path=DEFAULT_GEOJSON, keep_missing=False):
+    """
+    Upsert every road in the GeoJSON (on osm_id) and, unless keep_missing,
+    delete the roads the file no longer contains.
     """
-    geojson_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'kathmandu_roads.geojson')
-
     if not os.path.exists(geojson_path):
         print(f"Error: Road GeoJSON not found at {geojson_path}")
         print("Run download_roads.py first to get the data")
         return
 
     print("Loading road network data...")
+    started = time.time()
+    seen, loaded, skipped, deleted = set(), 0, 0, 0
 
-    # Load GeoJSON
-    with open(geojson_path, 'r', encoding='utf-8') as f:
-        geojson = json.load(f)
+    def roads():
+        nonlocal skipped
+        for feature in iter_features(geojson_path):
+            try:
+                yield road_from_feature(feature)
+            except (KeyError, TypeError, ValueError) as e:
+                skipped += 1
+                print(f"Error loading road {(feature.get('properties') or {}).get('osm_id', 'unknown')}: {e}")
 
-    print(f"Found {len(geojson['features'])} road features in GeoJSON")
+    with transaction.atomic():
+        for batch in upsert(Road, roads(), 'osm_id', UPDATE_FIELDS):
+            seen.update(road.osm_id for road in batch)
+            loaded += len(batch)
+            if loaded % (BATCH_SIZE * 10) == 0:
+                print(f"  {loaded} roads ({time.time() - started:.1f}s)")
 
-    # Clear existing data
-    Road.objects.all().delete()
-    print("Cleared existing road data")
+        if not keep_missing:
+            deleted = delete_missing(Road, 'osm_id', seen)
 
-    loaded_count = 0
-    for feature in geojson['features']:
-        try:
-            properties = feature['properties']
-            geometry = feature['geometry']
+        refresh_spatial_indexes('Road')
 
-            osm_id = properties['osm_id']
-            road_type = properties['highway']
-            name = properties.get('name', '')
+    print(f"Successfully loaded {len(seen)} road segments "
+          f"({skipped} skipped, {deleted} roads no longer in the file removed) "
+          f"in {time.time() - started:.1f}s")
 
-            # Store geometry as JSON for SQLite compatibility
-            # (instead of using GeoDjango's spatial fields)
-            geometry_json = json.dumps(geometry)
 
-            # Create Road object
-            road = Road(
-                osm_id=osm_id,
-                road_type=road_type,
-                geometry=geometry_json  # Store as JSON string
-            )
-            road.save()
-            loaded_count += 1
+def main():
+    parser = argparse.ArgumentParser(description='Load roads from a GeoJSON FeatureCollection into the database.')
+    parser.add_argument('--geojson', default=DEFAULT_GEOJSON)
+    parser.add_argument('--keep-missing', action='store_true', help='keep roads that are not in the file')
+    args = parser.parse_args()
 
-        except Exception as e:
-            print(f"Error loading road {properties.get('osm_id', 'unknown')}: {e}")
-            continue
+    load_road_network(args.geojson, args.keep_missing)
 
-    print(f"Successfully loaded {loaded_count} road segments")
 
 if __name__ == "__main__":
-    load_road_network()
\ No newline at end of file
+    main()
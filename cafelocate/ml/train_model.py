@@ -9,16 +9,25 @@ from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.metrics import classification_report, confusion_matrix
 import joblib
+import argparse
 import os
+import sys
 
-def load_training_data():
+# Shared feature schema (backend/ml_engine/features.py)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+from ml_engine.features import LOCATION_FEATURES
+
+# Rows written by build_training_dataset.py: features from ml_engine/features.py,
+# the same code that computes them when the model is served
+DEFAULT_DATA = os.path.join(os.path.dirname(__file__), '..', 'data', 'generated_training_dataset.csv')
+
+def load_training_data(data_path=DEFAULT_DATA):
     """
-    Load the real training data for location suitability prediction
+    Load the training data for location suitability prediction
     """
-    data_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'cafe_location_training_dataset.csv')
-
     if not os.path.exists(data_path):
         print(f"Training data not found at {data_path}")
+        print("Build it with: python build_training_dataset.py --output " + data_path)
         print("Falling back to synthetic data generation...")
         return create_synthetic_training_data()
 
@@ -110,22 +119,15 @@ def create_synthetic_training_data():
 
     return pd.DataFrame(data)
 
-def train_suitability_model():
+def train_suitability_model(data_path=DEFAULT_DATA):
     """
     Train and save the location suitability ML model
     """
     print("Loading training data...")
-    df = load_training_data()
+    df = load_training_data(data_path)
 
     # Prepare features and target
-    feature_cols = [
-        'competitors_within_500m', 'competitors_within_200m', 'competitors_min_distance', 'competitors_avg_distance',
-        'roads_within_500m', 'roads_avg_distance',
-        'schools_within_500m', 'schools_within_200m', 'schools_min_distance',
-        'hospitals_within_500m', 'hospitals_min_distance',
-        'bus_stops_within_500m', 'bus_stops_min_distance',
-        'population_density_proxy', 'accessibility_score', 'foot_traffic_score', 'competition_pressure'
-    ]
+    feature_cols = LOCATION_FEATURES
 
     X = df[feature_cols]
     y = df['suitability']
@@ -185,8 +187,20 @@ def train_suitability_model():
     print(f"\nModel saved to: {model_path}")
     print(f"Encoder saved to: {encoder_path}")
     print(f"Scaler saved to: {scaler_path}")
+    print("\nServe it with (from backend/):")
+    print(f"  python manage.py register_model {model_path} {encoder_path} --scaler {scaler_path} --activate")
 
     return model, label_encoder, scaler
 
+def main():
+    parser = argparse.ArgumentParser(description='Train the café location suitability model.')
+    parser.add_argument('--data', default=DEFAULT_DATA,
+                        help='training CSV (default: data/generated_training_dataset.csv, '
+                             'written by build_training_dataset.py)')
+    args = parser.parse_args()
+
+    train_suitability_model(os.path.abspath(args.data))
+
+
 if __name__ == "__main__":
-    train_suitability_model()
\ No newline at end of file
+    main()